@@ -5,22 +5,64 @@ Endpoints:
   - POST /mcp: Main MCP server endpoint (Streamable HTTP protocol)
   - POST /compress: Compress conversation context
   - POST /handoff: Generate handoff.json
+  - GET /handoffs: Latest handoffs per agent / pair / day (manifest index)
   - GET /mcp/health: Health check
 
+Batches: POST /mcp also accepts a JSON-RPC 2.0 batch array; calls run
+concurrently and results come back in request order (see batch_handler).
+
+Queue: queue_handler consumes SQS batches of compress / handoff jobs,
+writes a manifest per batch and reports partial batch failures.
+
+Handoff index: stored handoffs are appended to per-pair and per-day
+manifest objects (manifests/handoffs/), so GET /handoffs answers with one
+or two GETs instead of a LIST; rebuild_handoff_index.py regenerates them.
+
+Bodies: requests may be gzip/zstd compressed (Content-Encoding, raw or
+base64 from API Gateway); responses are compressed per Accept-Encoding.
+MAX_BODY_BYTES limits the decompressed request size.
+
+Persistence: results are written to S3 per PERSIST_MODE (sync, background
+or batch; durability of each mode in ResultPersister). Requests with
+"persist": false skip storage and return s3_location null.
+
 Version: 1.0
 Author: Claude Code + zycaskevin
 Based on: MCP Streamable HTTP Protocol (2025-03-26)
 """
 
+import time
+
+_INIT_START = time.perf_counter()
+
 import json
 import os
-import boto3
-from datetime import datetime
-from typing import Dict, List, Any
+import re
+import sys
+import threading
+import uuid
+import atexit
+import base64
+import codecs
+import io
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from contextlib import contextmanager
 import hashlib
+import inspect
+from collections import OrderedDict
+
+# Optional zstd body encoding (gzip is always available)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
 
-# Initialize S3 client
-s3 = boto3.client('s3')
 BUCKET_NAME = os.environ.get('BUCKET_NAME', 'mcp-compression-dev')
 
 # Configuration
@@ -28,17 +70,579 @@ TOKEN_THRESHOLD = int(os.environ.get('TOKEN_THRESHOLD', 70))
 CONTEXT_WINDOW = int(os.environ.get('CONTEXT_WINDOW', 200000))
 
 
+# ============================================================
+# S3 Client (lazy: boto3 import + client setup only when first needed)
+# ============================================================
+_s3_client = None
+_s3_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Shared S3 client, created on first use and reused across warm invocations"""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                import boto3
+                _s3_client = boto3.client('s3')
+    return _s3_client
+
+
+def set_s3_client(client) -> None:
+    """Replace the S3 client (local stand-ins, tests)"""
+    global _s3_client
+    _s3_client = client
+
+
+# Error codes of a read on a missing key. S3 only reveals that a key is
+# missing to callers allowed s3:ListBucket (serverless.yml grants it);
+# everyone else gets AccessDenied / 403 instead.
+MISSING_KEY_CODES = ('NoSuchKey', '404')
+DENIED_CODES = ('AccessDenied', '403')
+_denied_warned = False
+
+
+def is_missing_key(e: Exception) -> bool:
+    """
+    Whether an S3 read error means the key does not exist
+
+    AccessDenied counts as missing (it is what S3 answers without
+    s3:ListBucket) and is logged once per container.
+    """
+    global _denied_warned
+    code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+    if code in DENIED_CODES:
+        if not _denied_warned:
+            _denied_warned = True
+            log_warning("S3 denied a read, treating the key as missing; "
+                        "grant s3:ListBucket on the bucket", code=code)
+        return True
+    return code in MISSING_KEY_CODES
+
+
+# ============================================================
+# Logging & Metrics (JSON log lines; timing reports in CloudWatch EMF)
+# ============================================================
+# Timing reports use the Embedded Metric Format: CloudWatch turns each
+# line into metrics (p50/p95/p99 per Route) without API calls. Locally,
+# METRICS_FILE redirects every log line to a file instead of stdout.
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'MCPAutoCompression')
+METRICS_FILE = os.environ.get('METRICS_FILE', '')
+
+# Phase name -> metric name (milliseconds)
+PHASE_METRICS = {
+    'parse': 'ParseMs',
+    'head': 'HeadMs',
+    'hash': 'HashMs',
+    'lookup': 'LookupMs',
+    'compress': 'CompressMs',
+    's3': 'S3WriteMs',
+    'respond': 'RespondMs',
+    'flush': 'FlushMs',
+    'batch': 'BatchMs',
+    'index': 'IndexMs',
+}
+
+# Report field -> (metric name, unit)
+FIELD_METRICS = {
+    'bytesIn': ('BytesIn', 'Bytes'),
+    'wireBytesIn': ('WireBytesIn', 'Bytes'),
+    'wireBytesOut': ('WireBytesOut', 'Bytes'),
+    'compressionRate': ('CompressionRate', 'None'),
+    'items': ('BatchItems', 'Count'),
+    'errors': ('BatchErrors', 'Count'),
+    'manifestsRead': ('ManifestsRead', 'Count'),
+}
+
+try:
+    import resource
+except ImportError:  # Windows (local runs only)
+    resource = None
+
+_cold_start = True
+
+
+class StdoutSink:
+    """Log lines to stdout (CloudWatch Logs in Lambda)"""
+
+    def emit(self, line: str) -> None:
+        print(line)
+
+
+class FileSink:
+    """Log lines appended to a local file (tests, local load runs)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, line: str) -> None:
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+_log_sink = FileSink(METRICS_FILE) if METRICS_FILE else StdoutSink()
+
+
+def set_log_sink(sink) -> Any:
+    """Replace the log sink (anything with emit(line)); returns the previous one"""
+    global _log_sink
+    previous, _log_sink = _log_sink, sink
+    return previous
+
+
+def log_event(event: str, **fields) -> None:
+    """Write one structured log line (CloudWatch parses JSON lines)"""
+    _log_sink.emit(json.dumps({"event": event, **fields}, default=str))
+
+
+def log_warning(message: str, **fields) -> None:
+    log_event("warning", message=message, **fields)
+
+
+def _max_rss_mb() -> Optional[float]:
+    """Peak resident memory of this container (for memorySize tuning)"""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KB on Linux
+
+
+def emf_metrics(route: str, values: Dict[str, Any]) -> Dict:
+    """Embedded Metric Format envelope for numeric metric values"""
+    metrics = []
+    for name, value in values.items():
+        if name.endswith('Ms'):
+            unit = 'Milliseconds'
+        elif name.endswith('MB'):
+            unit = 'Megabytes'
+        else:
+            unit = next((u for n, u in FIELD_METRICS.values() if n == name), 'None')
+        metrics.append({"Name": name, "Unit": unit})
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Route"]],
+                "Metrics": metrics,
+            }],
+        },
+        "Route": route,
+        **values,
+    }
+
+
+class PhaseTimer:
+    """Collect per-phase durations of one invocation"""
+
+    def __init__(self, route: str):
+        global _cold_start
+        self.route = route
+        self.cold_start = _cold_start
+        _cold_start = False
+        self.phases: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()  # batch items time phases concurrently
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def report(self, **fields) -> Dict:
+        """Log (as an EMF line) and return the timing report"""
+        report = {
+            "route": self.route,
+            "coldStart": self.cold_start,
+            "phasesMs": {name: round(ms, 3) for name, ms in self.phases.items()},
+            "totalMs": round((time.perf_counter() - self._start) * 1000, 3),
+            **fields,
+        }
+
+        values = {PHASE_METRICS.get(name, name.title() + 'Ms'): ms
+                  for name, ms in report["phasesMs"].items()}
+        values['TotalMs'] = report["totalMs"]
+        for field, (name, _) in FIELD_METRICS.items():
+            if isinstance(fields.get(field), (int, float)):
+                values[name] = fields[field]
+        max_rss = _max_rss_mb()
+        if max_rss is not None:
+            values['MaxRssMB'] = max_rss
+
+        log_event("timing", **emf_metrics(self.route, values), **report)
+        return report
+
+
+# ============================================================
+# Body Encoding (Content-Encoding / Accept-Encoding: gzip, zstd)
+# ============================================================
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', 10 * 1024 * 1024))
+MIN_COMPRESS_BYTES = int(os.environ.get('MIN_COMPRESS_BYTES', 1024))
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+class BodyError(Exception):
+    """Request body that cannot be accepted (carries the HTTP status)"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _header(event: Dict, name: str) -> str:
+    """Header value, case-insensitive (REST API keeps the client's casing)"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+
+def _inflate(data: bytes, encoding: str, limit: int) -> bytes:
+    """Decompress at most limit bytes; larger payloads raise BodyError(413)"""
+    try:
+        if encoding in ('gzip', 'x-gzip'):
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            out = inflater.decompress(data, limit + 1)
+            if len(out) <= limit and not inflater.eof and not inflater.unconsumed_tail:
+                raise BodyError(400, "Truncated gzip body")
+        elif encoding == 'zstd':
+            if not ZSTD_AVAILABLE:
+                raise BodyError(415, "zstd bodies need the zstandard package")
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+                out = reader.read(limit + 1)
+        else:
+            raise BodyError(415, f"Unsupported Content-Encoding: {encoding}")
+    except (zlib.error, getattr(zstandard, 'ZstdError', zlib.error)) as e:
+        raise BodyError(400, f"Invalid {encoding} body: {e}")
+    if len(out) > limit:
+        raise BodyError(413, f"Decompressed body exceeds {limit} bytes")
+    return out
+
+
+def read_body(event: Dict, limit: Optional[int] = None) -> bytes:
+    """Raw request body: base64 and Content-Encoding removed, size-checked"""
+    limit = MAX_BODY_BYTES if limit is None else limit
+    body = event.get('body') or b''
+    data = body.encode('utf-8') if isinstance(body, str) else body
+    if event.get('isBase64Encoded'):
+        try:
+            data = base64.b64decode(data, validate=True)
+        except ValueError as e:
+            raise BodyError(400, f"Invalid base64 body: {e}")
+
+    encoding = _header(event, 'content-encoding').strip().lower()
+    if encoding and encoding != 'identity':
+        return _inflate(data, encoding, limit)
+    if len(data) > limit:
+        raise BodyError(413, f"Body exceeds {limit} bytes")
+    return data
+
+
+def parse_json_body(event: Dict) -> Any:
+    """Decoded JSON request body ({} when empty; a list for JSON-RPC batches)"""
+    data = read_body(event)
+    if not data.strip():
+        return {}
+    try:
+        return json.loads(data.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise BodyError(400, f"Invalid JSON body: {e}")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred response encoding from Accept-Encoding (zstd > gzip), or None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    wildcard = accepted.get('*', 0.0)
+    if ZSTD_AVAILABLE and accepted.get('zstd', wildcard) > 0:
+        return 'zstd'
+    if accepted.get('gzip', accepted.get('x-gzip', wildcard)) > 0:
+        return 'gzip'
+    return None
+
+
+def json_response(event: Dict, status_code: int, payload: Any) -> Dict:
+    """API Gateway response; compressed + base64 when the client accepts it"""
+    text = json.dumps(payload)
+    headers = {'Content-Type': 'application/json'}
+    encoding = choose_encoding(_header(event or {}, 'accept-encoding'))
+    if encoding is None or len(text) < MIN_COMPRESS_BYTES:
+        return {'statusCode': status_code, 'headers': headers, 'body': text}
+
+    data = text.encode('utf-8')
+    if encoding == 'zstd':
+        data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        data = zlib.compress(data, GZIP_LEVEL, wbits=16 + zlib.MAX_WBITS)
+    headers['Content-Encoding'] = encoding
+    headers['Vary'] = 'Accept-Encoding'
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': base64.b64encode(data).decode('ascii'),
+        'isBase64Encoded': True,
+    }
+
+
+# ============================================================
+# Result Persistence (PERSIST_MODE: sync | background | batch)
+# ============================================================
+PERSIST_MODES = ('sync', 'background', 'batch')
+PERSIST_MODE = os.environ.get('PERSIST_MODE', 'sync')
+PERSIST_BATCH_SIZE = int(os.environ.get('PERSIST_BATCH_SIZE', 50))
+PERSIST_BATCH_MAX_AGE = float(os.environ.get('PERSIST_BATCH_MAX_AGE', 60))
+PERSIST_WORKERS = int(os.environ.get('PERSIST_WORKERS', 4))
+
+# Distinguishes batch objects written by concurrent containers
+CONTAINER_ID = uuid.uuid4().hex[:8]
+
+# store() callback: receives the s3:// location once the write is confirmed
+OnStored = Callable[[str], Any]
+
+
+class ResultPersister:
+    """
+    Store handler results in S3 in one of three modes
+
+    sync        put_object runs before the handler returns (default).
+                Stored once the response is sent.
+    background  put_object runs on a worker thread while the handler
+                builds its response; flush() waits for it before the
+                invocation ends (Lambda freezes the container after the
+                handler returns, so a thread cannot outlive it). Same
+                durability as sync; concurrent writes overlap each other
+                and the response serialization.
+    batch       results are appended to an in-memory NDJSON batch that is
+                written as one object (batches/<date>/...ndjson) when it
+                holds batch_size records or its oldest record is older
+                than max_age seconds, checked by flush() at the end of each
+                invocation. Only the flushing invocation waits on S3.
+                Records not yet written (at most batch_size - 1, or
+                max_age seconds' worth) are lost if the container is
+                recycled or crashes; flush(force=True) runs at interpreter
+                exit, which Lambda does not guarantee.
+
+    In every mode write errors are logged, never returned to the caller,
+    and a request with "persist": false skips storage entirely. Work that
+    must only follow a confirmed write (caching the location, indexing a
+    handoff) goes in store()'s on_stored callback, which runs after the
+    put: inline in sync mode, on the writer thread in background mode and
+    in the flush() that writes the batch in batch mode.
+    """
+
+    def __init__(self, mode: str = 'sync', bucket: Optional[str] = None,
+                 batch_size: int = PERSIST_BATCH_SIZE,
+                 max_age: float = PERSIST_BATCH_MAX_AGE,
+                 workers: int = PERSIST_WORKERS):
+        if mode not in PERSIST_MODES:
+            raise ValueError(f"Unknown persist mode: {mode!r} (choose from {', '.join(PERSIST_MODES)})")
+        self.mode = mode
+        self.bucket = bucket or BUCKET_NAME
+        self.batch_size = max(1, batch_size)
+        self.max_age = max_age
+        self.workers = max(1, workers)
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Future] = []
+        self._batch: List[str] = []
+        self._batch_callbacks: List[Tuple[OnStored, str]] = []
+        self._batch_key = ''
+        self._batch_started = 0.0
+        self._batch_seq = 0
+        self._failed: List[str] = []
+
+    def store(self, key: str, record: Any, indent: Optional[int] = None,
+              batchable: bool = True,
+              on_stored: Optional[OnStored] = None) -> Optional[str]:
+        """
+        Persist a JSON-serializable record under key; returns its s3:// location
+
+        A failed sync write returns None. Background and batch writes are
+        not confirmed when store returns: on_stored(location) runs once the
+        record is in S3, and never for a failed or dropped write.
+
+        batchable=False: the record must exist under key itself, so batch
+        mode writes it synchronously instead of adding it to a batch.
+        """
+        if self.mode == 'batch' and batchable:
+            return self._append(key, record, on_stored)
+        location = f"s3://{self.bucket}/{key}"
+        body = json.dumps(record, indent=indent)
+        if self.mode == 'background':
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='persist')
+                self._pending.append(self._executor.submit(
+                    self._put, key, body, on_stored=on_stored, location=location))
+            return location
+        return location if self._put(key, body, on_stored=on_stored, location=location) else None
+
+    def _put(self, key: str, body: str, content_type: str = 'application/json',
+             on_stored: Optional[OnStored] = None, location: str = '') -> bool:
+        try:
+            get_s3_client().put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+        except Exception as e:
+            log_warning(f"Failed to store {key} in S3: {e}")
+            with self._lock:
+                self._failed.append(key)
+            return False
+        if on_stored is not None:
+            self._notify([(on_stored, location)])
+        return True
+
+    @staticmethod
+    def _notify(callbacks: List[Tuple[OnStored, str]]) -> None:
+        """Run on_stored callbacks; their errors are logged, the write stands"""
+        for callback, location in callbacks:
+            try:
+                callback(location)
+            except Exception as e:
+                log_warning(f"Post-store step failed for {location}: {e}")
+
+    def _append(self, key: str, record: Any, on_stored: Optional[OnStored] = None) -> str:
+        line = json.dumps({"key": key, "storedAt": datetime.utcnow().isoformat() + "Z", "record": record})
+        with self._lock:
+            if not self._batch:
+                self._batch_seq += 1
+                self._batch_started = time.monotonic()
+                self._batch_key = (f"batches/{datetime.utcnow():%Y%m%d/%H%M%S}"
+                                   f"-{CONTAINER_ID}-{self._batch_seq:06d}.ndjson")
+            self._batch.append(line)
+            # Fragment = 1-based line number inside the batch object
+            location = f"s3://{self.bucket}/{self._batch_key}#{len(self._batch)}"
+            if on_stored is not None:
+                self._batch_callbacks.append((on_stored, location))
+            return location
+
+    def _take_batch(self, force: bool) -> Optional[Tuple[str, List[str], List[Tuple[OnStored, str]]]]:
+        with self._lock:
+            if not self._batch:
+                return None
+            due = (force or len(self._batch) >= self.batch_size
+                   or time.monotonic() - self._batch_started >= self.max_age)
+            if not due:
+                return None
+            batch = (self._batch_key, self._batch, self._batch_callbacks)
+            self._batch = []
+            self._batch_callbacks = []
+            return batch
+
+    def flush(self, force: bool = False) -> int:
+        """
+        End-of-invocation flush: wait for background writes and write the
+        batch if it is due (or force), then run its records' on_stored
+        callbacks. Returns the number of objects written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        written = sum(1 for future in pending if future.result())
+
+        batch = self._take_batch(force)
+        if batch:
+            key, lines, callbacks = batch
+            if self._put(key, '\n'.join(lines) + '\n', 'application/x-ndjson'):
+                written += 1
+                self._notify(callbacks)
+            else:
+                log_warning(f"Dropped {len(lines)} batched records", key=key)
+        return written
+
+    def take_failures(self) -> List[str]:
+        """Keys whose writes failed since the last call (queue jobs retry these)"""
+        with self._lock:
+            failed, self._failed = self._failed, []
+        return failed
+
+    def pending(self) -> int:
+        """Records accepted but not yet written"""
+        with self._lock:
+            return len(self._batch) + sum(1 for future in self._pending if not future.done())
+
+
+def _create_persister() -> ResultPersister:
+    try:
+        return ResultPersister(PERSIST_MODE)
+    except ValueError as e:
+        log_warning(f"{e}; using sync persistence")
+        return ResultPersister('sync')
+
+
+PERSISTER = _create_persister()
+# Best effort: Lambda may freeze or stop the container without running atexit
+atexit.register(lambda: PERSISTER.flush(force=True))
+
+
 # ============================================================
 # Token Estimation
 # ============================================================
-def estimate_tokens(text: str) -> int:
-    """Estimate token count (4 chars ≈ 1 token)"""
-    return len(text) // 4
+# Shared estimator: scripts/token_estimator.py (copied next to handler.py
+# by the package:initialize hook in serverless.yml; repo path used for
+# local runs)
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / 'scripts'))
+try:
+    from token_estimator import estimate_tokens, get_estimator
+
+    def new_token_counter():
+        """Incremental counter whose total equals estimate_tokens(whole text)"""
+        return get_estimator().counter()
+except ImportError:
+    # Token counts (and cached results) would differ from local runs
+    log_warning("token_estimator not found, falling back to len(text) // 4 "
+                "(package scripts/token_estimator.py with the function)")
+
+    def estimate_tokens(text: str) -> int:
+        """Estimate token count (fallback: 4 chars ≈ 1 token)"""
+        return len(text) // 4
+
+    class _CharCounter:
+        def __init__(self):
+            self.chars = 0
+
+        def add(self, text: str) -> None:
+            self.chars += len(text)
+
+        def total(self) -> int:
+            return self.chars // 4
+
+    def new_token_counter():
+        return _CharCounter()
 
 
 # ============================================================
 # Context Compression (Factory.ai 2025 Strategy)
 # ============================================================
+MAX_INTENTS = 3
+MAX_ACTIONS = 20
+MAX_BREADCRUMBS = 30
+
+ACTION_KEYWORDS = ['created', 'modified', 'deleted', 'fixed', 'implemented', 'commit']
+ARTIFACT_EXTENSIONS = ['.py', '.js', '.ts', '.md', '.json', '.yaml', '.sh']
+BREADCRUMB_PATTERNS = ['def ', 'class ', 'function ', 'const ']
+
+# Compiled once per container; every request reuses them
+ACTION_RE = re.compile('|'.join(map(re.escape, ACTION_KEYWORDS)))
+BREADCRUMB_RE = re.compile('|'.join(map(re.escape, BREADCRUMB_PATTERNS)))
+
+
 class ContextCompressor:
     """
     Compress context based on Factory.ai 2025 best practices:
@@ -46,219 +650,851 @@ class ContextCompressor:
     - High-level play-by-play (key steps taken)
     - Artifact trails (files created/modified)
     - Breadcrumbs (file paths, function names, identifiers)
+
+    All four extractors share one pass over the lines (the text is split
+    once) and the instance holds no per-request state, so one compressor
+    serves every warm invocation.
     """
 
     def compress(self, conversation: str) -> Dict:
         """Compress conversation into essential components"""
+        result = self.compress_lines(conversation.split('\n'))
+        result["metadata"]["originalTokens"] = estimate_tokens(conversation)
+        return self._finish_metadata(result)
+
+    def compress_lines(self, lines: Iterable[str]) -> Dict:
+        """
+        Single pass over lines (no trailing newlines required)
 
-        # Extract session intent (simplified for Lambda)
-        session_intent = self._extract_intent(conversation)
+        Returns the compress() dictionary without originalTokens /
+        compressionRate (see compress()). State stays bounded for
+        streamed input: only the first MAX_ACTIONS actions and the first
+        MAX_BREADCRUMBS breadcrumbs per pattern can reach the output, and
+        artifacts are deduplicated as they are found.
+        """
+        intents: List[str] = []
+        actions: Dict[str, None] = {}
+        artifacts: Dict[str, Dict[str, None]] = {ext: {} for ext in ARTIFACT_EXTENSIONS}
+        breadcrumbs: Dict[str, Dict[str, None]] = {pattern: {} for pattern in BREADCRUMB_PATTERNS}
+
+        for line in lines:
+            lowered = line.lower()
 
-        # Extract key actions
-        play_by_play = self._extract_actions(conversation)
+            # Session intent: first user messages
+            if len(intents) < MAX_INTENTS and 'user:' in lowered and ':' in line:
+                intents.append(line.split(':', 1)[1].strip())
 
-        # Extract artifacts
-        artifacts = self._extract_artifacts(conversation)
+            # Key actions
+            if len(actions) < MAX_ACTIONS and ACTION_RE.search(lowered):
+                actions[line.strip()[:100]] = None
 
-        # Extract breadcrumbs
-        breadcrumbs = self._extract_breadcrumbs(conversation)
+            # Artifacts: words with a path separator and a known extension
+            if '/' in line or '\\' in line:
+                for word in line.split():
+                    if '/' in word or '\\' in word:
+                        for ext in ARTIFACT_EXTENSIONS:
+                            if ext in word:
+                                artifacts[ext][word.strip(',:;()[]{}"\' ')] = None
+
+            # Breadcrumbs
+            if BREADCRUMB_RE.search(line):
+                for pattern in BREADCRUMB_PATTERNS:
+                    if pattern in line and len(breadcrumbs[pattern]) < MAX_BREADCRUMBS:
+                        identifier = line.split(pattern, 1)[1].split('(')[0].strip()
+                        if identifier:
+                            breadcrumbs[pattern][f"{pattern.strip()}: {identifier}"] = None
 
-        original_tokens = estimate_tokens(conversation)
         compressed_data = {
-            "sessionIntent": session_intent,
-            "playByPlay": play_by_play,
-            "artifacts": artifacts,
-            "breadcrumbs": breadcrumbs
+            "sessionIntent": intents,
+            "playByPlay": list(actions)[:MAX_ACTIONS],  # Top 20, deduplicated
+            "artifacts": list(dict.fromkeys(a for ext in ARTIFACT_EXTENSIONS for a in artifacts[ext])),
+            "breadcrumbs": list(dict.fromkeys(
+                b for pattern in BREADCRUMB_PATTERNS for b in breadcrumbs[pattern]))[:MAX_BREADCRUMBS],
         }
-        compressed_tokens = estimate_tokens(json.dumps(compressed_data))
-
         return {
             "compressed": compressed_data,
             "metadata": {
-                "originalTokens": original_tokens,
-                "compressedTokens": compressed_tokens,
-                "compressionRate": 1.0 - (compressed_tokens / original_tokens) if original_tokens > 0 else 0.0,
+                "originalTokens": 0,
+                "compressedTokens": estimate_tokens(json.dumps(compressed_data)),
+                "compressionRate": 0.0,
                 "timestamp": datetime.utcnow().isoformat() + "Z"
             }
         }
 
-    def _extract_intent(self, text: str) -> List[str]:
-        """Extract session intent"""
-        lines = text.split('\n')
-        user_messages = [line for line in lines if 'user:' in line.lower()][:3]
-        return [msg.split(':', 1)[1].strip() for msg in user_messages if ':' in msg]
-
-    def _extract_actions(self, text: str) -> List[str]:
-        """Extract key actions"""
-        keywords = ['created', 'modified', 'deleted', 'fixed', 'implemented', 'commit']
-        lines = text.split('\n')
-        actions = []
-        for line in lines:
-            if any(kw in line.lower() for kw in keywords):
-                actions.append(line.strip()[:100])
-        return list(dict.fromkeys(actions))[:20]  # Top 20, deduplicated
-
-    def _extract_artifacts(self, text: str) -> List[str]:
-        """Extract file artifacts"""
-        extensions = ['.py', '.js', '.ts', '.md', '.json', '.yaml', '.sh']
-        artifacts = []
-        for ext in extensions:
-            if ext in text:
-                words = text.split()
-                for word in words:
-                    if ext in word and ('/' in word or '\\' in word):
-                        artifacts.append(word.strip(',:;()[]{}"\' '))
-        return list(dict.fromkeys(artifacts))
-
-    def _extract_breadcrumbs(self, text: str) -> List[str]:
-        """Extract code breadcrumbs"""
-        patterns = ['def ', 'class ', 'function ', 'const ']
-        breadcrumbs = []
-        for pattern in patterns:
-            if pattern in text:
-                lines = text.split('\n')
-                for line in lines:
-                    if pattern in line:
-                        identifier = line.split(pattern, 1)[1].split('(')[0].strip()
-                        if identifier:
-                            breadcrumbs.append(f"{pattern.strip()}: {identifier}")
-        return list(dict.fromkeys(breadcrumbs))[:30]
+    @staticmethod
+    def _finish_metadata(result: Dict) -> Dict:
+        metadata = result["metadata"]
+        original_tokens = metadata["originalTokens"]
+        metadata["compressionRate"] = (
+            1.0 - (metadata["compressedTokens"] / original_tokens) if original_tokens > 0 else 0.0
+        )
+        return result
+
+
+# Reused by every warm invocation
+COMPRESSOR = ContextCompressor()
 
 
 # ============================================================
-# Lambda Handlers
+# Content-Addressed Results (S3 key = conversation hash + compressor version)
 # ============================================================
-def health_handler(event, context):
-    """Health check endpoint"""
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json'},
-        'body': json.dumps({
-            'status': 'healthy',
-            'service': 'mcp-auto-compression',
-            'version': '1.0',
-            'timestamp': datetime.utcnow().isoformat() + 'Z'
-        })
-    }
+RESULT_CACHE_ITEMS = int(os.environ.get('RESULT_CACHE_ITEMS', 256))
+_compressor_version: Optional[str] = None
+
+
+def compressor_version() -> str:
+    """
+    SHA-256 over the compressor source, its limits and the token
+    estimator source, so stored results are never served across changes
+    """
+    global _compressor_version
+    if _compressor_version is None:
+        digest = hashlib.sha256()
+        digest.update(inspect.getsource(ContextCompressor).encode('utf-8'))
+        digest.update(repr((MAX_INTENTS, MAX_ACTIONS, MAX_BREADCRUMBS, ACTION_KEYWORDS,
+                            ARTIFACT_EXTENSIONS, BREADCRUMB_PATTERNS)).encode('utf-8'))
+        estimator = sys.modules.get(estimate_tokens.__module__)
+        source = getattr(estimator, '__file__', None)
+        digest.update(Path(source).read_bytes() if source else b'len//4')
+        _compressor_version = digest.hexdigest()
+    return _compressor_version
+
+
+def result_key(conversation: str) -> str:
+    """S3 key of a conversation's compressed result"""
+    content = hashlib.sha256(conversation.encode('utf-8')).hexdigest()
+    return f"compressed/{compressor_version()[:16]}/{content}.json"
+
+
+class ResultLRU:
+    """
+    In-process LRU of compressed results, kept across warm invocations
+
+    Values are (result, s3_location) - location is None until the result
+    has been stored, so a later persisting request still writes it.
+    """
+
+    def __init__(self, max_items: int = RESULT_CACHE_ITEMS):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[Dict, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Dict, Optional[str]]]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, result: Dict, location: Optional[str]) -> None:
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._items[key] = (result, location)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+RESULT_CACHE = ResultLRU()
+
 
+def load_stored_result(key: str) -> Optional[Dict]:
+    """
+    Stored result for key, or None
 
-def compress_handler(event, context):
-    """Handle /compress endpoint"""
+    One GET doubles as the existence check (a HEAD first would cost a
+    second round trip on every hit). Errors other than a missing key are
+    logged and treated as a miss (see is_missing_key for AccessDenied).
+    """
     try:
-        # Parse request body
-        body = json.loads(event.get('body', '{}'))
-        conversation = body.get('conversation', '')
-
-        if not conversation:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Missing conversation field'})
-            }
+        response = get_s3_client().get_object(Bucket=PERSISTER.bucket, Key=key)
+        return json.loads(response['Body'].read())
+    except Exception as e:
+        if not is_missing_key(e):
+            log_warning(f"Failed to read {key} from S3: {e}")
+        return None
 
-        # Compress context
-        compressor = ContextCompressor()
-        result = compressor.compress(conversation)
 
-        # Store compressed result in S3 (optional)
-        timestamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
-        s3_key = f"compressed/{timestamp}.json"
+# ============================================================
+# Object-Key Compression (stored conversations, read in ranged chunks)
+# ============================================================
+OBJECT_CHUNK_BYTES = int(os.environ.get('OBJECT_CHUNK_BYTES', 1024 * 1024))
+MAX_OBJECT_BYTES = int(os.environ.get('MAX_OBJECT_BYTES', 1024 * 1024 * 1024))
+MAX_LINE_CHARS = 1024 * 1024  # longer lines are split so memory stays bounded
+
 
+class ObjectLineReader:
+    """
+    Lines of a stored conversation, fetched with ranged GETs
+
+    Only one chunk (plus one partial line) is held at a time. gzip objects
+    (Content-Encoding gzip or a .gz key) are inflated on the fly. While
+    iterating it accumulates the decoded size, SHA-256 and token count, so
+    compress_lines() output can be completed like compress() does.
+    """
+
+    def __init__(self, bucket: str, key: str, size: int, gzipped: bool = False,
+                 chunk_bytes: Optional[int] = None, limit: Optional[int] = None):
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.gzipped = gzipped
+        self.chunk_bytes = max(1, OBJECT_CHUNK_BYTES if chunk_bytes is None else chunk_bytes)
+        self.limit = MAX_OBJECT_BYTES if limit is None else limit
+        self.chunks = 0
+        self.bytes = 0  # decoded (decompressed) bytes
+        self.sha256 = hashlib.sha256()
+        self.tokens = new_token_counter()
+
+    def _ranges(self) -> Iterator[bytes]:
+        offset = 0
+        while offset < self.size:
+            last = min(offset + self.chunk_bytes, self.size) - 1
+            response = get_s3_client().get_object(
+                Bucket=self.bucket, Key=self.key, Range=f"bytes={offset}-{last}")
+            data = response['Body'].read()
+            if not data:
+                raise IOError(f"Empty range {offset}-{last} of s3://{self.bucket}/{self.key}")
+            offset += len(data)
+            self.chunks += 1
+            yield data
+
+    def _decoded(self) -> Iterator[bytes]:
+        if not self.gzipped:
+            yield from self._ranges()
+            return
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            for raw in self._ranges():
+                data = inflater.decompress(raw, self.chunk_bytes)
+                while True:
+                    yield data
+                    if not inflater.unconsumed_tail:
+                        break
+                    data = inflater.decompress(inflater.unconsumed_tail, self.chunk_bytes)
+            yield inflater.flush()
+        except zlib.error as e:
+            raise BodyError(400, f"Invalid gzip object {self.key}: {e}")
+        if not inflater.eof:
+            raise BodyError(400, f"Truncated gzip object {self.key}")
+
+    def __iter__(self) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        carry = ''
+        for data in self._decoded():
+            self.bytes += len(data)
+            if self.bytes > self.limit:
+                raise BodyError(413, f"Object exceeds {self.limit} bytes")
+            self.sha256.update(data)
+            text = decoder.decode(data)
+            self.tokens.add(text)
+
+            lines = (carry + text).split('\n')
+            carry = lines.pop()
+            yield from lines
+            while len(carry) > MAX_LINE_CHARS:
+                yield carry[:MAX_LINE_CHARS]
+                carry = carry[MAX_LINE_CHARS:]
+
+        text = decoder.decode(b'', final=True)
+        self.tokens.add(text)
+        yield carry + text
+
+
+def object_result_key(key: str) -> str:
+    """Derived key for the compressed result of a stored conversation"""
+    return f"compressed/{compressor_version()[:16]}/objects/{key}.json"
+
+
+def _run_compress_object(body: Dict, timer: PhaseTimer) -> Tuple[int, Dict]:
+    """Compress the conversation stored at body['conversation_key'] (same bucket)"""
+    key = body['conversation_key']
+    if not isinstance(key, str) or not key or key.startswith('/'):
+        return 400, {'error': 'conversation_key must be an object key in the bucket'}
+    bucket = PERSISTER.bucket
+    persist = body.get('persist', True)
+
+    with timer.phase('head'):
         try:
-            s3.put_object(
-                Bucket=BUCKET_NAME,
-                Key=s3_key,
-                Body=json.dumps(result),
-                ContentType='application/json'
-            )
+            head = get_s3_client().head_object(Bucket=bucket, Key=key)
         except Exception as e:
-            print(f"Warning: Failed to store in S3: {e}")
+            # S3 cannot tell a missing key from an unreadable one on a 403 HEAD
+            if is_missing_key(e):
+                return 404, {'error': f"No object at s3://{bucket}/{key} (not found or not readable)"}
+            raise
+    size = head['ContentLength']
+    etag = head.get('ETag', '')
+    gzipped = head.get('ContentEncoding') == 'gzip' or key.endswith('.gz')
+    if not gzipped and size > MAX_OBJECT_BYTES:
+        return 413, {'error': f"Object exceeds {MAX_OBJECT_BYTES} bytes"}
 
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({
-                'compressed': result['compressed'],
-                'metadata': result['metadata'],
-                's3_location': f"s3://{BUCKET_NAME}/{s3_key}"
-            })
+    # A stored result for this object version (same ETag) is reused
+    s3_key = object_result_key(key)
+    cache_key = f"{s3_key}#{etag}"
+    cached = RESULT_CACHE.get(cache_key)
+    source = 'memory'
+    if cached is None and etag:
+        with timer.phase('lookup'):
+            stored = load_stored_result(s3_key)
+        if stored is not None and stored['metadata'].get('source', {}).get('etag') == etag:
+            cached = (stored, f"s3://{bucket}/{s3_key}")
+            source = 's3'
+
+    if cached is None:
+        reader = ObjectLineReader(bucket, key, size, gzipped)
+        with timer.phase('compress'):
+            result = COMPRESSOR.compress_lines(reader)
+        metadata = result['metadata']
+        metadata['originalTokens'] = reader.tokens.total()
+        metadata['source'] = {
+            'key': key,
+            'etag': etag,
+            'bytes': reader.bytes,
+            'objectBytes': size,
+            'chunks': reader.chunks,
+            'sha256': reader.sha256.hexdigest(),
         }
+        result = ContextCompressor._finish_metadata(result)
+        s3_location = None
+        source = 'miss'
+    else:
+        result, s3_location = cached
+
+    # Written under the derived key itself (never batched): callers address it by key
+    RESULT_CACHE.put(cache_key, result, s3_location)
+    if persist and s3_location is None:
+        with timer.phase('s3'):
+            s3_location = PERSISTER.store(
+                s3_key, result, batchable=False,
+                on_stored=lambda location: RESULT_CACHE.put(cache_key, result, location))
+
+    return 200, {
+        'compressed': result['compressed'],
+        'metadata': result['metadata'],
+        's3_location': s3_location if persist else None,
+        'cache': source
+    }
+
+
+# ============================================================
+# Handoff Index (per-pair / per-day manifests: listing without LIST)
+# ============================================================
+# Each stored handoff is appended to two small manifest objects, so the
+# latest handoffs of a pair, or of a time range, cost one or two GETs
+# instead of a LIST over handoffs/ that grows with the bucket:
+#   manifests/handoffs/pairs/<from>-to-<to>.json   newest HANDOFF_PAIR_MAX_ENTRIES
+#   manifests/handoffs/days/<YYYYMMDD>.json        every handoff of that day
+# Updates are read-merge-write with conditional puts (If-Match on the
+# ETag read, If-None-Match for a new manifest): a container that loses a
+# race re-reads and merges again instead of dropping the other entry.
+# Entries are appended only after the handoff itself was written (the
+# persister's on_stored callback, so in background and batch mode the
+# manifest round trips happen on the writer thread / in the flush). A
+# failed update is only logged; rebuild_handoff_index.py regenerates the
+# manifests from the handoff objects.
+HANDOFF_INDEX = os.environ.get('HANDOFF_INDEX', 'true').lower() not in ('0', 'false', 'no')
+HANDOFF_INDEX_PREFIX = 'manifests/handoffs/'
+HANDOFF_PAIR_MAX_ENTRIES = int(os.environ.get('HANDOFF_PAIR_MAX_ENTRIES', 500))
+HANDOFF_LOOKBACK_DAYS = int(os.environ.get('HANDOFF_LOOKBACK_DAYS', 7))
+HANDOFF_MAX_RANGE_DAYS = 31
+HANDOFF_LIST_MAX = 500
+HANDOFF_INDEX_ATTEMPTS = 8
+HANDOFF_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# handoffs/<from>-to-<to>-<YYYYMMDD>-<HHMMSS>.json
+HANDOFF_KEY_RE = re.compile(r'^handoffs/(?P<pair>.+)-(?P<day>\d{8})-(?P<time>\d{6})\.json$')
+CONFLICT_CODES = ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409')
 
+
+def handoff_pair_key(from_agent: str, to_agent: str) -> str:
+    return f"{HANDOFF_INDEX_PREFIX}pairs/{from_agent}-to-{to_agent}.json"
+
+
+def handoff_day_key(day: str) -> str:
+    """Manifest of one UTC day (day: YYYYMMDD)"""
+    return f"{HANDOFF_INDEX_PREFIX}days/{day}.json"
+
+
+def handoff_entry(from_agent: str, to_agent: str, at: datetime, location: str) -> Dict:
+    """Manifest entry of one stored handoff (at: UTC, second resolution like the key)"""
+    return {'at': at.strftime(HANDOFF_TIME_FORMAT), 'from': from_agent, 'to': to_agent,
+            'location': location}
+
+
+def parse_handoff_key(key: str) -> Optional[Dict]:
+    """
+    (from, to, time) of a handoffs/ key, or None
+
+    None also when the agent pair is ambiguous (an agent name containing
+    "-to-"): the caller reads the object instead.
+    """
+    match = HANDOFF_KEY_RE.match(key)
+    if not match or match.group('pair').count('-to-') != 1:
+        return None
+    from_agent, to_agent = match.group('pair').split('-to-')
+    at = datetime.strptime(match.group('day') + match.group('time'), '%Y%m%d%H%M%S')
+    return {'from': from_agent, 'to': to_agent, 'at': at}
+
+
+def merge_handoff_entries(*groups: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+    """Newest-first union of entry lists (one entry per location)"""
+    merged = {}
+    for entries in groups:
+        for entry in entries:
+            merged[entry['location']] = entry
+    ordered = sorted(merged.values(), key=lambda e: (e['at'], e['location']), reverse=True)
+    return ordered[:limit] if limit else ordered
+
+
+def read_handoff_manifest(key: str) -> Tuple[List[Dict], Optional[str]]:
+    """(entries, ETag) of a manifest; ([], None) if it does not exist"""
+    try:
+        response = get_s3_client().get_object(Bucket=PERSISTER.bucket, Key=key)
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': str(e)})
+        if is_missing_key(e):
+            return [], None
+        raise
+    return json.loads(response['Body'].read())['entries'], response.get('ETag')
+
+
+def update_handoff_manifest(key: str, merge: Callable[[List[Dict]], List[Dict]]) -> bool:
+    """
+    Conditionally replace a manifest with merge(current entries)
+
+    Retries with the fresh manifest when another writer got there first;
+    other errors are logged. Returns whether the manifest was written.
+    """
+    client = get_s3_client()
+    for attempt in range(HANDOFF_INDEX_ATTEMPTS):
+        try:
+            current, etag = read_handoff_manifest(key)
+            entries = merge(current)
+            body = json.dumps({'schemaVersion': 1,
+                               'updatedAt': datetime.utcnow().strftime(HANDOFF_TIME_FORMAT),
+                               'count': len(entries),
+                               'entries': entries}, separators=(',', ':'))
+            condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+            client.put_object(Bucket=PERSISTER.bucket, Key=key, Body=body,
+                              ContentType='application/json', **condition)
+            return True
+        except Exception as e:
+            if type(e).__name__ == 'ParamValidationError':
+                # botocore predates conditional writes: no manifest can ever be written
+                log_event("error", message=f"S3 client rejected the conditional put of {key}; "
+                          f"conditional writes need boto3>=1.35.69 (requirements.txt): {e}")
+                return False
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if code not in CONFLICT_CODES:
+                log_warning(f"Failed to update handoff manifest {key}: {e}")
+                return False
+            time.sleep(0.01 * (attempt + 1))
+    log_warning(f"Gave up updating handoff manifest {key} after {HANDOFF_INDEX_ATTEMPTS} conflicts")
+    return False
+
+
+def index_handoff(entry: Dict) -> int:
+    """Append one stored handoff to its pair and day manifests; returns manifests written"""
+    day = entry['at'][:10].replace('-', '')
+    pair_key = handoff_pair_key(entry['from'], entry['to'])
+    return (update_handoff_manifest(pair_key, lambda current: merge_handoff_entries(
+                current, [entry], limit=HANDOFF_PAIR_MAX_ENTRIES))
+            + update_handoff_manifest(handoff_day_key(day), lambda current: merge_handoff_entries(
+                current, [entry])))
+
+
+def list_handoffs(agent: Optional[str] = None, from_agent: Optional[str] = None,
+                  to_agent: Optional[str] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, limit: int = 20) -> Tuple[List[Dict], int]:
+    """
+    Newest-first handoffs from the manifests -> (entries, manifests read)
+
+    from_agent and to_agent together read the pair manifest (one GET).
+    Otherwise the day manifests are read from until back to since
+    (default: HANDOFF_LOOKBACK_DAYS days), stopping once limit entries
+    match; agent matches either side of a handoff. A query that matches
+    fewer than limit entries (e.g. agent= alone for an agent with no
+    recent handoffs) reads every day of the range: up to
+    HANDOFF_LOOKBACK_DAYS + 1 manifests without since, or
+    HANDOFF_MAX_RANGE_DAYS + 1 with it.
+    """
+    until = until or datetime.utcnow()
+    lower = since.strftime(HANDOFF_TIME_FORMAT) if since else ''
+    upper = until.strftime(HANDOFF_TIME_FORMAT)
+
+    def matches(entry: Dict) -> bool:
+        return (lower <= entry['at'] <= upper
+                and (agent is None or agent in (entry['from'], entry['to']))
+                and (from_agent is None or entry['from'] == from_agent)
+                and (to_agent is None or entry['to'] == to_agent))
+
+    if from_agent is not None and to_agent is not None:
+        entries, _ = read_handoff_manifest(handoff_pair_key(from_agent, to_agent))
+        return [e for e in entries if matches(e)][:limit], 1
+
+    first_day = (since or until - timedelta(days=HANDOFF_LOOKBACK_DAYS)).date()
+    day = until.date()
+    found: List[Dict] = []
+    reads = 0
+    while day >= first_day and len(found) < limit:
+        entries, _ = read_handoff_manifest(handoff_day_key(day.strftime('%Y%m%d')))
+        reads += 1
+        found.extend(e for e in entries if matches(e))
+        day -= timedelta(days=1)
+    return found[:limit], reads
+
+
+# ============================================================
+# Lambda Handlers
+# ============================================================
+def health_handler(event, context):
+    """Health check endpoint"""
+    return json_response(event, 200, {
+        'status': 'healthy',
+        'service': 'mcp-auto-compression',
+        'version': '1.0',
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    })
+
+
+def _request_object(body: Any) -> Dict:
+    if not isinstance(body, dict):
+        raise BodyError(400, "Request body must be a JSON object")
+    return body
+
+
+def _run_compress(body: Dict, timer: PhaseTimer) -> Tuple[int, Dict]:
+    """Compress route logic: (status code, payload); no response encoding or flush"""
+    conversation = body.get('conversation', '')
+    if not conversation and body.get('conversation_key'):
+        return _run_compress_object(body, timer)
+    if not conversation:
+        return 400, {'error': 'Missing conversation field'}
+
+    persist = body.get('persist', True)
+    with timer.phase('hash'):
+        s3_key = result_key(conversation)
+
+    # Identical conversations: warm-container LRU, then the stored object
+    # (batch mode writes NDJSON batches, so only the LRU can hit there)
+    cached = RESULT_CACHE.get(s3_key)
+    source = 'memory'
+    if cached is None and persist and PERSISTER.mode != 'batch':
+        with timer.phase('lookup'):
+            stored = load_stored_result(s3_key)
+        if stored is not None:
+            cached = (stored, f"s3://{PERSISTER.bucket}/{s3_key}")
+            source = 's3'
+
+    if cached is None:
+        # Compress context
+        with timer.phase('compress'):
+            result = COMPRESSOR.compress(conversation)
+        s3_location = None
+        source = 'miss'
+    else:
+        result, s3_location = cached
+
+    # Store compressed result in S3 (skipped with "persist": false); the
+    # LRU only records the location once the write is confirmed, so a
+    # failed write is retried by the next persisting request
+    RESULT_CACHE.put(s3_key, result, s3_location)
+    if persist and s3_location is None:
+        with timer.phase('s3'):
+            s3_location = PERSISTER.store(
+                s3_key, result, on_stored=lambda location: RESULT_CACHE.put(s3_key, result, location))
+
+    return 200, {
+        'compressed': result['compressed'],
+        'metadata': result['metadata'],
+        's3_location': s3_location if persist else None,
+        'cache': source
+    }
+
+
+def _run_handoff(body: Dict, timer: PhaseTimer) -> Tuple[int, Dict]:
+    """Handoff route logic: (status code, payload); no response encoding or flush"""
+    from_agent = body.get('from_agent')
+    to_agent = body.get('to_agent')
+    compressed_context = body.get('compressed_context', {})
+
+    if not from_agent or not to_agent:
+        return 400, {'error': 'Missing from_agent or to_agent'}
+
+    # Generate handoff template
+    handoff = {
+        "schemaVersion": "2.0.0",
+        "from": {
+            "agentType": from_agent,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "stageType": "planning"
+        },
+        "to": {
+            "agentType": to_agent,
+            "requiredContext": [],
+            "expectedOutputs": []
+        },
+        "summary": {
+            "keyFindings": compressed_context.get("sessionIntent", []),
+            "compressedContext": compressed_context
+        },
+        "metadata": {
+            "tokensUsed": compressed_context.get("compressedTokens", 0),
+            "compressionRate": compressed_context.get("compressionRate", 0.0)
         }
+    }
+
+    # Store handoff in S3 (skipped with "persist": false)
+    s3_location = None
+    if body.get('persist', True):
+        now = datetime.utcnow()
+        s3_key = f"handoffs/{from_agent}-to-{to_agent}-{now:%Y%m%d-%H%M%S}.json"
+        # Indexed once the write is confirmed, off the request in background
+        # and batch mode (see ResultPersister)
+        on_stored = None
+        if HANDOFF_INDEX:
+            def on_stored(location: str) -> None:
+                index_handoff(handoff_entry(from_agent, to_agent, now, location))
+        with timer.phase('s3'):
+            s3_location = PERSISTER.store(s3_key, handoff, indent=2, on_stored=on_stored)
+
+    return 200, {
+        'handoff': handoff,
+        's3_location': s3_location
+    }
+
+
+def compress_handler(event, context, body: Optional[Dict] = None):
+    """Handle /compress endpoint (body: already-parsed request, from mcp_handler)"""
+    timer = PhaseTimer('compress')
+    try:
+        # Parse request body (base64 / gzip / zstd decoded)
+        with timer.phase('parse'):
+            body = _request_object(parse_json_body(event) if body is None else body)
+
+        status_code, payload = _run_compress(body, timer)
+        if status_code != 200:
+            return json_response(event, status_code, payload)
+
+        with timer.phase('respond'):
+            response = json_response(event, status_code, payload)
+
+        with timer.phase('flush'):
+            PERSISTER.flush()
+        source = payload['metadata'].get('source')
+        bytes_in = source['bytes'] if source else len(body['conversation'].encode('utf-8'))
+        timer.report(bytesIn=bytes_in,
+                     wireBytesIn=len(event.get('body') or ''),
+                     wireBytesOut=len(response['body']),
+                     compressionRate=round(payload['metadata']['compressionRate'], 4),
+                     cache=payload['cache'],
+                     persistMode=PERSISTER.mode)
+
+        return response
+
+    except BodyError as e:
+        return json_response(event, e.status_code, {'error': str(e)})
+    except Exception as e:
+        return json_response(event, 500, {'error': str(e)})
 
 
-def handoff_handler(event, context):
+def handoff_handler(event, context, body: Optional[Dict] = None):
     """Handle /handoff endpoint - Generate handoff.json"""
+    timer = PhaseTimer('handoff')
     try:
-        body = json.loads(event.get('body', '{}'))
-        from_agent = body.get('from_agent')
-        to_agent = body.get('to_agent')
-        compressed_context = body.get('compressed_context', {})
-
-        if not from_agent or not to_agent:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Missing from_agent or to_agent'})
-            }
+        with timer.phase('parse'):
+            body = _request_object(parse_json_body(event) if body is None else body)
+
+        status_code, payload = _run_handoff(body, timer)
+        if status_code != 200:
+            return json_response(event, status_code, payload)
+
+        with timer.phase('respond'):
+            response = json_response(event, status_code, payload)
+
+        with timer.phase('flush'):
+            PERSISTER.flush()
+        timer.report(wireBytesIn=len(event.get('body') or ''),
+                     wireBytesOut=len(response['body']),
+                     persistMode=PERSISTER.mode)
+
+        return response
+
+    except BodyError as e:
+        return json_response(event, e.status_code, {'error': str(e)})
+    except Exception as e:
+        return json_response(event, 500, {'error': str(e)})
 
-        # Generate handoff template
-        handoff = {
-            "schemaVersion": "2.0.0",
-            "from": {
-                "agentType": from_agent,
-                "timestamp": datetime.utcnow().isoformat() + "Z",
-                "stageType": "planning"
-            },
-            "to": {
-                "agentType": to_agent,
-                "requiredContext": [],
-                "expectedOutputs": []
-            },
-            "summary": {
-                "keyFindings": compressed_context.get("sessionIntent", []),
-                "compressedContext": compressed_context
-            },
-            "metadata": {
-                "tokensUsed": compressed_context.get("compressedTokens", 0),
-                "compressionRate": compressed_context.get("compressionRate", 0.0)
-            }
-        }
 
-        # Store handoff in S3
-        timestamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
-        s3_key = f"handoffs/{from_agent}-to-{to_agent}-{timestamp}.json"
+def _query_time(value: Optional[str], end_of_day: bool = False) -> Optional[datetime]:
+    """ISO date or timestamp from a query string as naive UTC ('Z' or an offset optional)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.rstrip('Z'))
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1, seconds=-1)
+    if parsed.tzinfo is not None:
+        # Manifests hold naive UTC times: shift offsets like +08:00 to UTC first
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.replace(tzinfo=None)
 
+
+def handoffs_handler(event, context):
+    """
+    Handle GET /handoffs - latest handoffs from the manifests (no LIST)
+
+    Query: from_agent + to_agent (pair), or agent (either side) and/or
+    since / until (ISO dates or timestamps, inclusive), limit.
+    """
+    timer = PhaseTimer('handoffs')
+    query = event.get('queryStringParameters') or {}
+    try:
         try:
-            s3.put_object(
-                Bucket=BUCKET_NAME,
-                Key=s3_key,
-                Body=json.dumps(handoff, indent=2),
-                ContentType='application/json'
-            )
-        except Exception as e:
-            print(f"Warning: Failed to store handoff in S3: {e}")
+            limit = int(query.get('limit', 20))
+            since = _query_time(query.get('since'))
+            until = _query_time(query.get('until'), end_of_day=True)
+        except ValueError as e:
+            return json_response(event, 400, {'error': f"Invalid query: {e}"})
+        if not 1 <= limit <= HANDOFF_LIST_MAX:
+            return json_response(event, 400, {'error': f"limit must be 1-{HANDOFF_LIST_MAX}"})
+        if since and since > (until or datetime.utcnow()):
+            return json_response(event, 400, {'error': 'since is after until'})
+        if since and (until or datetime.utcnow()) - since > timedelta(days=HANDOFF_MAX_RANGE_DAYS):
+            return json_response(event, 400, {'error': f"Range exceeds {HANDOFF_MAX_RANGE_DAYS} days"})
 
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({
-                'handoff': handoff,
-                's3_location': f"s3://{BUCKET_NAME}/{s3_key}"
+        with timer.phase('lookup'):
+            entries, reads = list_handoffs(agent=query.get('agent'),
+                                           from_agent=query.get('from_agent'),
+                                           to_agent=query.get('to_agent'),
+                                           since=since, until=until, limit=limit)
+
+        with timer.phase('respond'):
+            response = json_response(event, 200, {
+                'handoffs': entries,
+                'count': len(entries),
+                'manifestsRead': reads
             })
-        }
+        timer.report(items=len(entries), manifestsRead=reads,
+                     wireBytesOut=len(response['body']))
+        return response
 
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return json_response(event, 500, {'error': str(e)})
+
+
+# ============================================================
+# JSON-RPC Batches (array body: items run concurrently, results in order)
+# ============================================================
+MAX_BATCH_ITEMS = int(os.environ.get('MAX_BATCH_ITEMS', 100))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 8))
+
+# JSON-RPC 2.0 error codes
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+BATCH_METHODS = {
+    'compress': _run_compress,
+    'handoff': _run_handoff,
+    'ping': lambda params, timer: (200, 'pong'),
+}
+
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_lock = threading.Lock()
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    """Worker pool shared by warm invocations (created on the first batch)"""
+    global _batch_executor
+    if _batch_executor is None:
+        with _batch_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(
+                    max_workers=max(1, BATCH_WORKERS), thread_name_prefix='mcp-batch')
+    return _batch_executor
+
+
+def _rpc_error(request_id: Any, code: int, message: str) -> Dict:
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def _run_batch_item(item: Any, timer: PhaseTimer) -> Optional[Dict]:
+    """
+    One JSON-RPC call -> response object (None for notifications)
+
+    Arguments come from "params", or from the item itself like the
+    single-request form ({"method": "compress", "conversation": ...}).
+    """
+    if not isinstance(item, dict) or not isinstance(item.get('method'), str):
+        return _rpc_error(None, INVALID_REQUEST, 'Invalid Request')
+
+    request_id = item.get('id')
+    is_notification = 'id' not in item
+    method = BATCH_METHODS.get(item['method'])
+    if method is None:
+        response = _rpc_error(request_id, METHOD_NOT_FOUND, f"Unknown method: {item['method']}")
+    else:
+        params = item.get('params', item)
+        try:
+            if not isinstance(params, dict):
+                raise BodyError(400, 'params must be an object')
+            status_code, payload = method(params, timer)
+            if status_code == 200:
+                response = {'jsonrpc': '2.0', 'id': request_id, 'result': payload}
+            else:
+                response = _rpc_error(request_id, INVALID_PARAMS, payload['error'])
+        except BodyError as e:
+            response = _rpc_error(request_id, INVALID_PARAMS, str(e))
+        except Exception as e:
+            response = _rpc_error(request_id, INTERNAL_ERROR, str(e))
+    return None if is_notification else response
+
+
+def batch_handler(event, context, items: List[Any]):
+    """
+    JSON-RPC batch: run items concurrently, return their responses in request order
+
+    Per-item failures become JSON-RPC error objects; the batch itself only
+    fails when it is empty or larger than MAX_BATCH_ITEMS. Compression is
+    CPU-bound (the GIL serializes it); the concurrency overlaps S3 writes,
+    and one invocation replaces one per call. Persistence is flushed once
+    for the whole batch.
+    """
+    timer = PhaseTimer('mcp-batch')
+    if not items:
+        return json_response(event, 400, _rpc_error(None, INVALID_REQUEST, 'Empty batch'))
+    if len(items) > MAX_BATCH_ITEMS:
+        return json_response(event, 413, _rpc_error(
+            None, INVALID_REQUEST, f"Batch of {len(items)} exceeds {MAX_BATCH_ITEMS} items"))
+
+    with timer.phase('batch'):
+        if len(items) == 1:
+            responses = [_run_batch_item(items[0], timer)]
+        else:
+            responses = list(_get_batch_executor().map(lambda item: _run_batch_item(item, timer), items))
+    results = [response for response in responses if response is not None]
+
+    with timer.phase('respond'):
+        if results:
+            response = json_response(event, 200, results)
+        else:
+            response = {'statusCode': 202, 'headers': {}, 'body': ''}  # notifications only
+
+    with timer.phase('flush'):
+        PERSISTER.flush()
+    timer.report(items=len(items), errors=sum(1 for r in results if 'error' in r),
+                 wireBytesIn=len(event.get('body') or ''),
+                 wireBytesOut=len(response['body']),
+                 persistMode=PERSISTER.mode)
+    return response
 
 
 def mcp_handler(event, context):
@@ -269,31 +1505,145 @@ def mcp_handler(event, context):
         return health_handler(event, context)
 
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = parse_json_body(event)
+
+        # JSON-RPC batch
+        if isinstance(body, list):
+            return batch_handler(event, context, body)
+
+        body = _request_object(body)
         method = body.get('method')
         params = body.get('params', {})
 
-        # MCP Protocol: Handle different methods
+        # MCP Protocol: Handle different methods (body decoded once, passed on)
         if method == 'compress':
-            return compress_handler(event, context)
+            return compress_handler(event, context, body)
         elif method == 'handoff':
-            return handoff_handler(event, context)
+            return handoff_handler(event, context, body)
         elif method == 'ping':
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'result': 'pong'})
-            }
+            return json_response(event, 200, {'result': 'pong'})
         else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': f'Unknown method: {method}'})
-            }
+            return json_response(event, 400, {'error': f'Unknown method: {method}'})
 
+    except BodyError as e:
+        return json_response(event, e.status_code, {'error': str(e)})
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return json_response(event, 500, {'error': str(e)})
+
+
+# ============================================================
+# Queue Worker (SQS batches: concurrent jobs, manifest, partial failures)
+# ============================================================
+QUEUE_METHODS = ('compress', 'handoff')
+
+
+def _run_queue_job(record: Dict, timer: PhaseTimer) -> Dict:
+    """
+    Run one queued job -> manifest entry
+
+    Body: {"job_id": ..., "method": "compress" | "handoff", "params": {...}}
+    status is 'ok', 'rejected' (invalid job: retrying cannot help) or
+    'retry' (server-side failure: the message is reported as failed).
+    """
+    entry = {'messageId': record.get('messageId'), 'jobId': None, 'method': None}
+    try:
+        job = json.loads(record.get('body') or '')
+    except ValueError as e:
+        return {**entry, 'status': 'rejected', 'error': f"Invalid JSON job: {e}"}
+    if not isinstance(job, dict) or job.get('method') not in QUEUE_METHODS:
+        method = job.get('method') if isinstance(job, dict) else None
+        return {**entry, 'status': 'rejected', 'error': f"Unknown method: {method}"}
+
+    entry.update(jobId=job.get('job_id', entry['messageId']), method=job['method'])
+    params = job.get('params', {})
+    if not isinstance(params, dict):
+        return {**entry, 'status': 'rejected', 'error': 'params must be an object'}
+
+    try:
+        # Queue results exist only in S3, so they are always stored
+        status_code, payload = BATCH_METHODS[job['method']]({**params, 'persist': True}, timer)
+    except BodyError as e:
+        return {**entry, 'status': 'rejected' if e.status_code < 500 else 'retry', 'error': str(e)}
+    except Exception as e:
+        return {**entry, 'status': 'retry', 'error': str(e)}
+
+    if status_code != 200:
+        status = 'rejected' if status_code < 500 else 'retry'
+        return {**entry, 'status': status, 'statusCode': status_code, 'error': payload.get('error')}
+    if payload['s3_location'] is None:
+        return {**entry, 'status': 'retry', 'error': 'Result write failed'}
+    return {**entry, 'status': 'ok', 's3_location': payload['s3_location'], 'cache': payload.get('cache')}
+
+
+def _location_key(location: Optional[str]) -> Optional[str]:
+    """Object key of an s3://bucket/key[#line] location"""
+    if not location:
+        return None
+    return location.split('/', 3)[3].split('#', 1)[0]
+
+
+def queue_handler(event, context):
+    """
+    SQS worker: run a batch of compress / handoff jobs concurrently
+
+    Results are stored like synchronous requests (content-addressed
+    compressed results, handoffs/...), then every buffered write is
+    flushed and a manifest of the batch is written to
+    manifests/queue/<date>/<time>-<container>-<batch>.json.
+
+    Returns SQS partial batch failures ({"batchItemFailures": [...]},
+    needs functionResponseType ReportBatchItemFailures): jobs whose
+    processing or result write failed are retried; rejected jobs (bad
+    JSON, unknown method, missing fields) are recorded in the manifest and
+    not retried. If the manifest cannot be written, the whole batch is
+    retried - compress jobs whose results were written then hit the
+    stored results; results whose write failed are compressed and stored
+    again (only confirmed writes are cached).
+    """
+    timer = PhaseTimer('queue')
+    records = event.get('Records') or []
+    PERSISTER.take_failures()  # failures of earlier invocations are not ours
+
+    with timer.phase('batch'):
+        if len(records) > 1:
+            entries = list(_get_batch_executor().map(lambda r: _run_queue_job(r, timer), records))
+        else:
+            entries = [_run_queue_job(record, timer) for record in records]
+
+    # Acknowledging a message means its result is durable: write everything now
+    with timer.phase('flush'):
+        PERSISTER.flush(force=True)
+    failed_keys = set(PERSISTER.take_failures())
+    for entry in entries:
+        if entry['status'] == 'ok' and _location_key(entry.get('s3_location')) in failed_keys:
+            entry.update(status='retry', error='Result write failed')
+
+    batch_id = getattr(context, 'aws_request_id', None) or uuid.uuid4().hex
+    counts = {status: sum(1 for e in entries if e['status'] == status)
+              for status in ('ok', 'rejected', 'retry')}
+    manifest = {
+        'batchId': batch_id,
+        'createdAt': datetime.utcnow().isoformat() + 'Z',
+        'counts': counts,
+        'jobs': entries,
+    }
+    manifest_key = (f"manifests/queue/{datetime.utcnow():%Y%m%d/%H%M%S}"
+                    f"-{CONTAINER_ID}-{batch_id}.json")
+    with timer.phase('s3'):
+        PERSISTER.store(manifest_key, manifest, indent=2, batchable=False)
+        PERSISTER.flush()
+    manifest_written = manifest_key not in PERSISTER.take_failures()
+
+    if manifest_written:
+        failures = [e['messageId'] for e in entries if e['status'] == 'retry']
+    else:
+        failures = [e['messageId'] for e in entries]
+    timer.report(items=len(records), errors=len(failures), rejected=counts['rejected'],
+                 manifest=manifest_key if manifest_written else None,
+                 persistMode=PERSISTER.mode)
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
+
+
+# Module init (imports, matcher compilation) - paid once per container
+INIT_DURATION_MS = round((time.perf_counter() - _INIT_START) * 1000, 3)
+log_event("init", durationMs=INIT_DURATION_MS)
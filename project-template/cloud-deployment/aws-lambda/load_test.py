@@ -0,0 +1,310 @@
+"""
+Load Generator for the Lambda MCP Server
+
+Purpose: Measure throughput and latency percentiles of the handlers for
+given payload sizes and concurrency levels - against the local runner
+(default, started in-process, no network) or any deployed URL.
+
+Features:
+  - Synthetic conversations of the requested sizes (user requests,
+    file actions, code definitions - the lines the compressor extracts)
+  - Routes: compress, mcp (single call), batch (JSON-RPC array), handoff, health
+  - Optional gzip request bodies and Accept-Encoding responses
+  - Unique conversations per request (default) or one repeated payload
+    (--repeat, measures the result cache)
+  - Report per (payload size, concurrency): requests, errors,
+    requests/s, MB/s uploaded, p50/p95/p99/max latency
+  - --metrics-file (local runner): handler timing metrics written to a
+    file, then summarized per route and phase (p50/p95/p99)
+
+Usage:
+  python load_test.py                                   # in-process local server
+  python load_test.py --sizes 10k,100k,1m --concurrency 1,8 --requests 200
+  python load_test.py --url http://127.0.0.1:8787 --route mcp --gzip
+  python load_test.py --json results.json
+  python load_test.py --metrics-file metrics.ndjson
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import math
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+ROUTES = ('compress', 'mcp', 'batch', 'handoff', 'health')
+BATCH_ITEMS = 10
+
+CONVERSATION_LINES = (
+    "User: Implement step {i} of the authentication flow",
+    "Assistant: Reading the existing middleware before changing it",
+    "Created file src/auth/step_{i}.py",
+    "def handle_step_{i}(request):",
+    "Modified tests/test_step_{i}.py (added edge cases)",
+    "const STEP_{i} = loadConfig('step-{i}.json')",
+    "Fixed off-by-one in pagination for request {i}",
+)
+
+
+# ============================================================
+# Payloads
+# ============================================================
+def parse_size(text: str) -> int:
+    """'10k' / '1m' / '2048' -> bytes"""
+    text = text.strip().lower()
+    units = {'k': 1024, 'm': 1024 * 1024}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def make_conversation(size: int, seed: int = 0) -> str:
+    """Synthetic conversation of about size bytes (seed makes it unique)"""
+    lines = [f"User: load test conversation {seed}"]
+    total = len(lines[0]) + 1
+    i = 0
+    while total < size:
+        line = CONVERSATION_LINES[i % len(CONVERSATION_LINES)].format(i=f"{seed}-{i}")
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    return '\n'.join(lines) + '\n'
+
+
+def make_request(route: str, size: int, seed: int) -> Tuple[str, str, Optional[dict]]:
+    """(method, path, JSON body) for one request"""
+    if route == 'health':
+        return 'GET', '/mcp/health', None
+    if route == 'handoff':
+        return 'POST', '/handoff', {'from_agent': 'research', 'to_agent': 'product',
+                                    'compressed_context': {'sessionIntent': [f"task {seed}"]}}
+    if route == 'mcp':
+        return 'POST', '/mcp', {'method': 'compress', 'conversation': make_conversation(size, seed)}
+    if route == 'batch':
+        item_size = max(1, size // BATCH_ITEMS)
+        return 'POST', '/mcp', [
+            {'jsonrpc': '2.0', 'id': n, 'method': 'compress',
+             'params': {'conversation': make_conversation(item_size, seed * BATCH_ITEMS + n)}}
+            for n in range(BATCH_ITEMS)
+        ]
+    return 'POST', '/compress', {'conversation': make_conversation(size, seed)}
+
+
+# ============================================================
+# Statistics
+# ============================================================
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list (0.0 when empty)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, bytes_sent: int) -> Dict:
+    """Aggregate one scenario (latencies in seconds)"""
+    ordered = sorted(latencies)
+    count = len(ordered) + errors
+    return {
+        'requests': count,
+        'errors': errors,
+        'elapsedS': round(elapsed, 3),
+        'requestsPerS': round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        'uploadMBPerS': round(bytes_sent / elapsed / 1e6, 2) if elapsed > 0 else 0.0,
+        'p50Ms': round(percentile(ordered, 50) * 1000, 2),
+        'p95Ms': round(percentile(ordered, 95) * 1000, 2),
+        'p99Ms': round(percentile(ordered, 99) * 1000, 2),
+        'maxMs': round((ordered[-1] if ordered else 0.0) * 1000, 2),
+    }
+
+
+# ============================================================
+# Runner
+# ============================================================
+def send(base_url: str, method: str, path: str, body: Optional[dict],
+         use_gzip: bool, timeout: float) -> Tuple[float, int, int]:
+    """One request -> (latency seconds, status, bytes sent); status 0 = transport error"""
+    data = None
+    headers = {'Accept-Encoding': 'gzip'} if use_gzip else {}
+    if body is not None:
+        data = json.dumps(body).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+        if use_gzip:
+            data = gzip.compress(data, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+
+    request = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return time.perf_counter() - start, status, len(data or b'')
+
+
+def run_scenario(base_url: str, route: str, size: int, concurrency: int, requests: int,
+                 use_gzip: bool = False, repeat: bool = False, timeout: float = 30.0,
+                 seed_offset: int = 0) -> Dict:
+    """Send requests at the given concurrency and summarize them"""
+    bodies = [make_request(route, size, 0 if repeat else seed_offset + n) for n in range(requests)]
+
+    def one(request):
+        method, path, body = request
+        return send(base_url, method, path, body, use_gzip, timeout)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, bodies))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, status, _ in results if 200 <= status < 300]
+    errors = len(results) - len(latencies)
+    report = summarize(latencies, errors, elapsed, sum(sent for _, _, sent in results))
+    return {'route': route, 'payloadBytes': size, 'concurrency': concurrency, **report}
+
+
+def aggregate_metrics(path: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Percentiles of the handler's EMF timing lines in a metrics file
+
+    Returns:
+        {route: {metric: {"count", "p50", "p95", "p99"}}}
+    """
+    values: Dict[str, Dict[str, List[float]]] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('event') != 'timing' or '_aws' not in record:
+                continue
+            route_values = values.setdefault(record['Route'], {})
+            for directive in record['_aws']['CloudWatchMetrics']:
+                for metric in directive['Metrics']:
+                    value = record.get(metric['Name'])
+                    if isinstance(value, (int, float)):
+                        route_values.setdefault(metric['Name'], []).append(value)
+
+    summary = {}
+    for route, metrics in values.items():
+        summary[route] = {}
+        for name, samples in metrics.items():
+            ordered = sorted(samples)
+            summary[route][name] = {
+                'count': len(ordered),
+                'p50': round(percentile(ordered, 50), 3),
+                'p95': round(percentile(ordered, 95), 3),
+                'p99': round(percentile(ordered, 99), 3),
+            }
+    return summary
+
+
+def print_metrics(summary: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    print(f"\n{'route':<11} {'metric':<16} {'count':>6} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for route in sorted(summary):
+        for name in sorted(summary[route]):
+            stats = summary[route][name]
+            print(f"{route:<11} {name:<16} {stats['count']:>6} {stats['p50']:>10} "
+                  f"{stats['p95']:>10} {stats['p99']:>10}")
+
+
+def print_report(rows: List[Dict]) -> None:
+    header = (f"{'route':<9} {'payload':>9} {'conc':>5} {'reqs':>6} {'err':>4} {'req/s':>8} "
+              f"{'MB/s up':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['route']:<9} {row['payloadBytes']:>9} {row['concurrency']:>5} "
+              f"{row['requests']:>6} {row['errors']:>4} {row['requestsPerS']:>8} "
+              f"{row['uploadMBPerS']:>8} {row['p50Ms']:>8} {row['p95Ms']:>8} "
+              f"{row['p99Ms']:>8} {row['maxMs']:>8}")
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the Lambda MCP handlers')
+    parser.add_argument('--url', help='Base URL (default: start the local runner in-process)')
+    parser.add_argument('--route', choices=ROUTES, default='compress', help='Route to exercise (default: compress)')
+    parser.add_argument('--sizes', default='10k,100k', help='Payload sizes, e.g. 10k,100k,1m (default: 10k,100k)')
+    parser.add_argument('--concurrency', default='1,4', help='Concurrency levels (default: 1,4)')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per scenario (default: 50)')
+    parser.add_argument('--warmup', type=int, default=2, help='Unreported warm-up requests (default: 2)')
+    parser.add_argument('--gzip', action='store_true', help='gzip request bodies and accept gzip responses')
+    parser.add_argument('--repeat', action='store_true', help='Send one repeated payload (cache hits)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='Local runner only: write handler metrics here and summarize them')
+    args = parser.parse_args()
+
+    try:
+        sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+        levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    except ValueError as e:
+        print(f"[ERROR] Invalid --sizes/--concurrency: {e}")
+        return 1
+
+    if args.metrics_file and args.url:
+        print("[ERROR] --metrics-file needs the in-process local runner (omit --url)")
+        return 1
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        import handler
+        import local_server
+        if args.metrics_file:
+            open(args.metrics_file, 'w').close()
+            handler.set_log_sink(handler.FileSink(args.metrics_file))
+        server, base_url = local_server.start_in_thread()
+        print(f"[INFO] Started local runner at {base_url}")
+    base_url = base_url.rstrip('/')
+
+    rows = []
+    seed = 0
+    # In-process handlers log one JSON line per request; keep the report readable
+    quiet = contextlib.redirect_stdout(io.StringIO()) if server else contextlib.nullcontext()
+    try:
+        with quiet:
+            for size in sizes:
+                for concurrency in levels:
+                    if args.warmup:
+                        run_scenario(base_url, args.route, size, 1, args.warmup, args.gzip,
+                                     args.repeat, args.timeout, seed_offset=10 ** 9 + seed)
+                    rows.append(run_scenario(base_url, args.route, size, concurrency, args.requests,
+                                             args.gzip, args.repeat, args.timeout, seed_offset=seed))
+                    seed += args.requests
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print_report(rows)
+    if args.metrics_file:
+        print_metrics(aggregate_metrics(args.metrics_file))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+        print(f"[OK] Results written to {args.json}")
+    return 1 if any(row['errors'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
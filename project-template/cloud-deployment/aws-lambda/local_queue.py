@@ -0,0 +1,137 @@
+"""
+Local Queue Stand-in
+
+Purpose: Drive handler.queue_handler locally and in tests the way the
+SQS event source mapping does - without AWS.
+
+Behaviour (SQS standard queue, simplified):
+  - receive() returns an SQS-shaped event ({"Records": [...]}) of up to
+    batch_size visible messages; they stay in flight until acknowledged
+  - ack(event, response) deletes every message except those listed in
+    response["batchItemFailures"], which become visible again
+  - after max_receives failed receives a message moves to dead_letters
+  - drain(handler) repeats receive -> handler -> ack until the queue is empty
+
+Usage:
+  from local_queue import LocalQueue
+  queue = LocalQueue()
+  queue.send({"method": "compress", "params": {"conversation": "..."}})
+  queue.drain(handler.queue_handler)
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_MAX_RECEIVES = 3
+QUEUE_ARN = "arn:aws:sqs:local:000000000000:local-queue"
+
+
+class LocalQueue:
+    """In-memory SQS stand-in with partial batch failure handling"""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_receives: int = DEFAULT_MAX_RECEIVES):
+        self.batch_size = batch_size
+        self.max_receives = max_receives
+        self._visible: "OrderedDict[str, Dict]" = OrderedDict()
+        self._in_flight: Dict[str, Dict] = {}
+        self.dead_letters: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def send(self, body: Any, message_id: Optional[str] = None) -> str:
+        """Enqueue a message (dicts/lists are JSON-encoded); returns its id"""
+        text = body if isinstance(body, str) else json.dumps(body)
+        message = {
+            "messageId": message_id or str(uuid.uuid4()),
+            "body": text,
+            "md5OfBody": hashlib.md5(text.encode("utf-8")).hexdigest(),
+            "receiveCount": 0,
+            "sentTimestamp": str(int(time.time() * 1000)),
+        }
+        with self._lock:
+            self._visible[message["messageId"]] = message
+        return message["messageId"]
+
+    def send_batch(self, bodies: List[Any]) -> List[str]:
+        return [self.send(body) for body in bodies]
+
+    def receive(self, batch_size: Optional[int] = None) -> Dict:
+        """SQS event with up to batch_size messages (moved in flight)"""
+        limit = batch_size or self.batch_size
+        records = []
+        with self._lock:
+            while self._visible and len(records) < limit:
+                _, message = self._visible.popitem(last=False)
+                message["receiveCount"] += 1
+                self._in_flight[message["messageId"]] = message
+                records.append({
+                    "messageId": message["messageId"],
+                    "receiptHandle": uuid.uuid4().hex,
+                    "body": message["body"],
+                    "attributes": {
+                        "ApproximateReceiveCount": str(message["receiveCount"]),
+                        "SentTimestamp": message["sentTimestamp"],
+                    },
+                    "messageAttributes": {},
+                    "md5OfBody": message["md5OfBody"],
+                    "eventSource": "aws:sqs",
+                    "eventSourceARN": QUEUE_ARN,
+                    "awsRegion": "local",
+                })
+        return {"Records": records}
+
+    def ack(self, event: Dict, response: Optional[Dict]) -> List[str]:
+        """
+        Apply a handler response: delete successes, requeue reported failures
+
+        A response that is not a dict (handler crashed) fails the whole
+        batch, like Lambda does. Returns the requeued message ids.
+        """
+        ids = [record["messageId"] for record in event.get("Records", [])]
+        if isinstance(response, dict):
+            failed = {item["itemIdentifier"] for item in response.get("batchItemFailures", [])}
+        else:
+            failed = set(ids)
+
+        requeued = []
+        with self._lock:
+            for message_id in ids:
+                message = self._in_flight.pop(message_id, None)
+                if message is None or message_id not in failed:
+                    continue
+                if message["receiveCount"] >= self.max_receives:
+                    self.dead_letters.append(message)
+                else:
+                    self._visible[message_id] = message
+                    requeued.append(message_id)
+        return requeued
+
+    def drain(self, handler: Callable[[Dict, Any], Dict], context: Any = None,
+              max_batches: int = 10000) -> int:
+        """Deliver batches to handler until the queue is empty; returns batches run"""
+        batches = 0
+        while batches < max_batches:
+            event = self.receive()
+            if not event["Records"]:
+                break
+            try:
+                response = handler(event, context)
+            except Exception:
+                response = None
+            self.ack(event, response)
+            batches += 1
+        return batches
+
+    def __len__(self) -> int:
+        """Visible + in-flight messages"""
+        with self._lock:
+            return len(self._visible) + len(self._in_flight)
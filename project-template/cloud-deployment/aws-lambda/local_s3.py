@@ -0,0 +1,183 @@
+"""
+Local S3 Stand-in
+
+Purpose: Run handler.py locally and in tests without AWS credentials or
+boto3. Implements the subset of the boto3 S3 client the handlers use,
+with the same call signatures and response shapes.
+
+Storage: in memory, or under a directory (<root>/<bucket>/<key>) when
+root is given so objects survive restarts of a local server.
+
+Usage:
+  from local_s3 import LocalS3
+  import handler
+  handler.set_s3_client(LocalS3())            # in memory
+  handler.set_s3_client(LocalS3(".local-s3"))  # on disk
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+
+def _etag(data: bytes) -> str:
+    """Single-part upload ETag (quoted MD5), as S3 returns it"""
+    return '"%s"' % hashlib.md5(data).hexdigest()
+
+
+class LocalS3Error(Exception):
+    """Mimics botocore ClientError: e.response['Error']['Code']"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"{code}: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class LocalS3:
+    """In-memory (or directory-backed) S3 client stand-in"""
+
+    def __init__(self, root: Optional[str] = None, put_delay: float = 0.0,
+                 deny_missing: bool = False):
+        """
+        Args:
+            root: Directory to keep objects in (default: memory only)
+            put_delay: Seconds each put_object sleeps (simulates S3 latency)
+            deny_missing: Answer reads of missing keys with AccessDenied / 403,
+                          as S3 does for callers without s3:ListBucket
+        """
+        self.root = Path(root) if root else None
+        self.put_delay = put_delay
+        self.deny_missing = deny_missing
+        self._objects: Dict[Tuple[str, str], Tuple[bytes, Dict[str, str]]] = {}
+        self._lock = threading.RLock()  # put_object reads under it for conditional writes
+        self.calls: Dict[str, int] = {}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def _read(self, bucket: str, key: str) -> Tuple[bytes, Dict[str, str]]:
+        """(data, headers); directory-backed objects only keep their ETag"""
+        if self.root is None:
+            with self._lock:
+                found = self._objects.get((bucket, key))
+        else:
+            path = self._path(bucket, key)
+            data = path.read_bytes() if path.is_file() else None
+            found = None if data is None else (data, {"ETag": _etag(data)})
+        if found is None:
+            if self.deny_missing:
+                raise LocalS3Error("AccessDenied", "Access Denied")
+            raise LocalS3Error("NoSuchKey", f"s3://{bucket}/{key} does not exist")
+        return found
+
+    # ------------------------------------------------------------
+    # boto3 S3 client subset
+    # ------------------------------------------------------------
+    def put_object(self, Bucket: str, Key: str, Body: Union[str, bytes],
+                   ContentType: str = "binary/octet-stream",
+                   ContentEncoding: Optional[str] = None,
+                   IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None,
+                   **kwargs) -> Dict:
+        self._count("put_object")
+        if self.put_delay:
+            time.sleep(self.put_delay)
+        data = Body.encode("utf-8") if isinstance(Body, str) else bytes(Body)
+        headers = {"ContentType": ContentType, "ETag": _etag(data)}
+        if ContentEncoding:
+            headers["ContentEncoding"] = ContentEncoding
+        # Conditional writes: check and write atomically, as S3 does
+        with self._lock:
+            if IfMatch is not None or IfNoneMatch is not None:
+                try:
+                    current = self._read(Bucket, Key)[1]["ETag"]
+                except LocalS3Error:
+                    current = None
+                if (IfMatch is not None and current != IfMatch) or (IfNoneMatch == "*" and current):
+                    raise LocalS3Error("PreconditionFailed",
+                                       "At least one of the pre-conditions you specified did not hold")
+            if self.root is None:
+                self._objects[(Bucket, Key)] = (data, headers)
+            else:
+                path = self._path(Bucket, Key)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(path.name + ".tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+        return {"ETag": headers["ETag"]}
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **kwargs) -> Dict:
+        self._count("get_object")
+        data, headers = self._read(Bucket, Key)
+        size = len(data)
+        response = dict(headers)
+        if Range:
+            # "bytes=start-end" (inclusive), as sent by boto3 callers
+            start, _, end = Range.replace("bytes=", "").partition("-")
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+            if first >= size:
+                raise LocalS3Error("InvalidRange", f"Range {Range} outside object of {size} bytes")
+            data = data[first:last + 1]
+            response["ContentRange"] = f"bytes {first}-{last}/{size}"
+        response["ContentLength"] = len(data)
+        response["Body"] = io.BytesIO(data)
+        return response
+
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        self._count("head_object")
+        try:
+            data, headers = self._read(Bucket, Key)
+        except LocalS3Error:
+            if self.deny_missing:
+                raise LocalS3Error("403", "Forbidden")
+            raise LocalS3Error("404", "Not Found")
+        return {"ContentLength": len(data), **headers}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> Dict:
+        self._count("delete_object")
+        if self.root is None:
+            with self._lock:
+                self._objects.pop((Bucket, Key), None)
+        else:
+            path = self._path(Bucket, Key)
+            if path.is_file():
+                path.unlink()
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", **kwargs) -> Dict:
+        self._count("list_objects_v2")
+        if self.root is None:
+            with self._lock:
+                keys = {key: len(data) for (bucket, key), (data, _) in self._objects.items()
+                        if bucket == Bucket and key.startswith(Prefix)}
+        else:
+            base = self.root / Bucket
+            keys = {}
+            if base.is_dir():
+                for path in base.rglob("*"):
+                    key = path.relative_to(base).as_posix()
+                    if path.is_file() and not key.endswith(".tmp") and key.startswith(Prefix):
+                        keys[key] = path.stat().st_size
+        contents = [{"Key": key, "Size": keys[key]} for key in sorted(keys)]
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
+
+    # ------------------------------------------------------------
+    # Test helpers
+    # ------------------------------------------------------------
+    def read(self, bucket: str, key: str) -> bytes:
+        """Object bytes (without counting a get_object call)"""
+        return self._read(bucket, key)[0]
+
+    def keys(self, bucket: str, prefix: str = "") -> list:
+        return [obj["Key"] for obj in self.list_objects_v2(Bucket=bucket, Prefix=prefix)["Contents"]]
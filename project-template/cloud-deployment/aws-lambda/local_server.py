@@ -0,0 +1,183 @@
+"""
+Local HTTP Runner for the Lambda MCP Server
+
+Purpose: Serve handler.py on localhost with the same routes as the
+deployed HTTP API, backed by the local S3 stand-in, so the handlers can
+be exercised and load-tested without AWS or network access.
+
+Routes (as in serverless.yml):
+  POST /mcp          mcp_handler (single calls and JSON-RPC batches)
+  GET  /mcp/health   mcp_handler health check
+  POST /compress     compress_handler
+  POST /handoff      handoff_handler
+  GET  /handoffs     handoffs_handler (manifest index lookups)
+
+Requests are converted to API Gateway HTTP API (payload v2) events:
+lower-cased headers, and binary or Content-Encoding bodies passed as
+base64 with isBase64Encoded, the way API Gateway delivers them.
+
+Usage:
+  python local_server.py                      # http://127.0.0.1:8787
+  python local_server.py --port 9000 --s3-dir .local-s3
+  python load_test.py --url http://127.0.0.1:8787
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import argparse
+import base64
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import handler
+from local_s3 import LocalS3
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8787
+
+ROUTES = {
+    ('POST', '/mcp'): handler.mcp_handler,
+    ('GET', '/mcp/health'): handler.mcp_handler,
+    ('POST', '/compress'): handler.compress_handler,
+    ('POST', '/handoff'): handler.handoff_handler,
+    ('GET', '/handoffs'): handler.handoffs_handler,
+}
+
+
+# ============================================================
+# API Gateway event conversion
+# ============================================================
+def build_event(method: str, path: str, headers: Dict[str, str], body: bytes) -> Dict:
+    """HTTP API payload v2 event for one request"""
+    raw_path, _, query = path.partition('?')
+    event = {
+        'version': '2.0',
+        'routeKey': f"{method} {raw_path}",
+        'rawPath': raw_path,
+        'rawQueryString': query,
+        'headers': {name.lower(): value for name, value in headers.items()},
+        'requestContext': {'http': {'method': method, 'path': raw_path}},
+        'isBase64Encoded': False,
+    }
+    if query:
+        # API Gateway joins repeated parameters with commas
+        params: Dict[str, List[str]] = {}
+        for name, value in parse_qsl(query, keep_blank_values=True):
+            params.setdefault(name, []).append(value)
+        event['queryStringParameters'] = {name: ','.join(values) for name, values in params.items()}
+    if not body:
+        return event
+
+    encoded = 'content-encoding' in event['headers']
+    if not encoded:
+        try:
+            event['body'] = body.decode('utf-8')
+            return event
+        except UnicodeDecodeError:
+            pass
+    event['body'] = base64.b64encode(body).decode('ascii')
+    event['isBase64Encoded'] = True
+    return event
+
+
+def response_bytes(response: Dict) -> Tuple[int, Dict[str, str], bytes]:
+    """(status, headers, body bytes) from a Lambda proxy response"""
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded'):
+        data = base64.b64decode(body)
+    else:
+        data = body.encode('utf-8')
+    return response.get('statusCode', 200), dict(response.get('headers') or {}), data
+
+
+def invoke(method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+    """Route one request to its handler"""
+    route = ROUTES.get((method, path.partition('?')[0]))
+    if route is None:
+        return 404, {'Content-Type': 'application/json'}, b'{"error": "Not Found"}'
+    return response_bytes(route(build_event(method, path, headers, body), None))
+
+
+# ============================================================
+# HTTP server
+# ============================================================
+class LambdaRequestHandler(BaseHTTPRequestHandler):
+    """Forwards requests to the Lambda handlers"""
+
+    protocol_version = 'HTTP/1.1'
+    quiet = True
+
+    def _serve(self, method: str) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, data = invoke(method, self.path, dict(self.headers.items()), body)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def create_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  s3: Optional[LocalS3] = None) -> ThreadingHTTPServer:
+    """Server bound to host:port (port 0 = any free port) using a local S3 stand-in"""
+    handler.set_s3_client(s3 if s3 is not None else LocalS3())
+    server = ThreadingHTTPServer((host, port), LambdaRequestHandler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host: str = DEFAULT_HOST, port: int = 0,
+                    s3: Optional[LocalS3] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a server on a background thread; returns (server, base URL)"""
+    server = create_server(host, port, s3)
+    thread = threading.Thread(target=server.serve_forever, name='local-lambda', daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve the Lambda MCP handlers locally (no AWS required)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Bind address (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--s3-dir', help='Keep S3 objects in this directory (default: in memory)')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    LambdaRequestHandler.quiet = not args.verbose
+    server = create_server(args.host, args.port, LocalS3(args.s3_dir))
+    storage = args.s3_dir or 'memory'
+    print(f"[OK] Serving Lambda handlers on http://{args.host}:{server.server_address[1]} "
+          f"(S3: {storage}, persist mode: {handler.PERSISTER.mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopping")
+    finally:
+        handler.PERSISTER.flush(force=True)
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
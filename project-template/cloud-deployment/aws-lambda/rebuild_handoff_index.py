@@ -0,0 +1,190 @@
+"""
+Handoff Index Rebuild
+
+Purpose: Regenerate the handoff manifests (manifests/handoffs/pairs/ and
+manifests/handoffs/days/) from the stored handoffs - after index updates
+failed, after objects expired, or to create the index for a bucket that
+predates it.
+
+Sources:
+  handoffs/<from>-to-<to>-<YYYYMMDD>-<HHMMSS>.json   one LIST pass; an
+      object is only read when its key does not name the pair unambiguously
+  batches/*.ndjson                                    handoffs stored in
+      batch persistence mode (every batch object is read)
+
+Manifests are replaced with conditional puts and keep entries appended
+by running handlers since the scan started, so a rebuild can run while
+the service takes traffic. Manifests without any handoff are deleted,
+unless a handler appended to them since the scan started. Malformed
+batch lines and handoff objects are skipped with a warning.
+
+Usage:
+  python rebuild_handoff_index.py                          # BUCKET_NAME, boto3
+  python rebuild_handoff_index.py --bucket mcp-compression-prod --dry-run
+  python rebuild_handoff_index.py --s3-dir .local-s3       # local_server data
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import handler
+
+
+# ============================================================
+# Scanning
+# ============================================================
+def list_keys(client, bucket: str, prefix: str) -> Iterator[str]:
+    """Every key under prefix (follows list_objects_v2 pagination)"""
+    kwargs = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        response = client.list_objects_v2(**kwargs)
+        for obj in response.get('Contents', []):
+            yield obj['Key']
+        if not response.get('IsTruncated'):
+            return
+        kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+
+def _record_entry(record: Dict, location: str) -> Optional[Dict]:
+    """Entry from a handoff document (when its key cannot be parsed)"""
+    try:
+        at = datetime.fromisoformat(record['from']['timestamp'].rstrip('Z'))
+        return handler.handoff_entry(record['from']['agentType'], record['to']['agentType'],
+                                     at.replace(microsecond=0), location)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def scan_handoffs(client, bucket: str) -> Iterator[Dict]:
+    """Manifest entries of every stored handoff"""
+    for key in list_keys(client, bucket, 'handoffs/'):
+        location = f"s3://{bucket}/{key}"
+        parsed = handler.parse_handoff_key(key)
+        if parsed:
+            yield handler.handoff_entry(parsed['from'], parsed['to'], parsed['at'], location)
+            continue
+        try:
+            record = json.loads(client.get_object(Bucket=bucket, Key=key)['Body'].read())
+        except ValueError as e:
+            handler.log_warning(f"Skipping unreadable handoff {location}: {e}")
+            continue
+        entry = _record_entry(record, location)
+        if entry:
+            yield entry
+
+    for key in list_keys(client, bucket, 'batches/'):
+        lines = client.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8').splitlines()
+        for number, line in enumerate(lines, 1):
+            location = f"s3://{bucket}/{key}#{number}"
+            try:
+                stored = json.loads(line)
+            except ValueError as e:
+                handler.log_warning(f"Skipping malformed batch line {location}: {e}")
+                continue
+            if not isinstance(stored, dict) or not str(stored.get('key', '')).startswith('handoffs/'):
+                continue
+            parsed = handler.parse_handoff_key(stored['key'])
+            if parsed:
+                yield handler.handoff_entry(parsed['from'], parsed['to'], parsed['at'], location)
+            else:
+                entry = _record_entry(stored.get('record'), location)
+                if entry:
+                    yield entry
+
+
+def group_manifests(entries: List[Dict]) -> Dict[str, List[Dict]]:
+    """Manifest key -> entries (pair and day manifests)"""
+    manifests = defaultdict(list)
+    for entry in entries:
+        manifests[handler.handoff_pair_key(entry['from'], entry['to'])].append(entry)
+        manifests[handler.handoff_day_key(entry['at'][:10].replace('-', ''))].append(entry)
+    return manifests
+
+
+# ============================================================
+# Rebuild
+# ============================================================
+def rebuild(dry_run: bool = False) -> Dict:
+    """
+    Regenerate every handoff manifest in the handler's bucket (PERSISTER.bucket,
+    through get_s3_client()); returns a summary
+    """
+    client = handler.get_s3_client()
+    bucket = handler.PERSISTER.bucket
+
+    # Listed before the scan: manifests created by handlers meanwhile are not stale
+    existing = set(list_keys(client, bucket, handler.HANDOFF_INDEX_PREFIX))
+    started = datetime.utcnow().strftime(handler.HANDOFF_TIME_FORMAT)
+    manifests = group_manifests(list(scan_handoffs(client, bucket)))
+    stale = sorted(existing - set(manifests))
+    summary = {
+        'bucket': bucket,
+        'handoffs': sum(len(entries) for key, entries in manifests.items() if '/days/' in key),
+        'manifests': len(manifests),
+        'stale': len(stale),
+        'failed': 0,
+        'dryRun': dry_run,
+    }
+    if dry_run:
+        return summary
+
+    for key, entries in sorted(manifests.items()):
+        limit = handler.HANDOFF_PAIR_MAX_ENTRIES if '/pairs/' in key else None
+
+        def merge(current, entries=entries, limit=limit):
+            # Keep what handlers appended while the scan ran
+            recent = [entry for entry in current if entry['at'] >= started]
+            return handler.merge_handoff_entries(entries, recent, limit=limit)
+
+        if not handler.update_handoff_manifest(key, merge):
+            summary['failed'] += 1
+    for key in stale:
+        # A handler may have appended since the scan started: keep those entries
+        current, _ = handler.read_handoff_manifest(key)
+        if not any(entry['at'] >= started for entry in current):
+            client.delete_object(Bucket=bucket, Key=key)
+        elif not handler.update_handoff_manifest(
+                key, lambda current: [entry for entry in current if entry['at'] >= started]):
+            summary['failed'] += 1
+    return summary
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(
+        description='Regenerate the handoff manifests from the stored handoffs')
+    parser.add_argument('--bucket', help=f'Bucket (default: {handler.PERSISTER.bucket})')
+    parser.add_argument('--s3-dir', help='Use a local S3 directory (local_server --s3-dir) instead of AWS')
+    parser.add_argument('--dry-run', action='store_true', help='Scan and report, write nothing')
+    args = parser.parse_args()
+
+    if args.s3_dir:
+        from local_s3 import LocalS3
+        handler.set_s3_client(LocalS3(args.s3_dir))
+    if args.bucket:
+        handler.PERSISTER.bucket = args.bucket
+    summary = rebuild(args.dry_run)
+
+    if args.dry_run:
+        print(f"[DRY RUN] {summary['manifests']} manifests for {summary['handoffs']} handoffs "
+              f"in s3://{summary['bucket']}, {summary['stale']} stale manifests")
+        return 0
+    print(f"[OK] Wrote {summary['manifests']} manifests for {summary['handoffs']} handoffs "
+          f"in s3://{summary['bucket']} ({summary['stale']} stale manifests removed)")
+    if summary['failed']:
+        print(f"[WARN] {summary['failed']} manifests could not be written (see warnings)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1023 @@
+"""
+Lambda handler test suite
+
+Runs the handlers in-process against the local S3 stand-in (boto3 not
+required) and checks the warm-path behaviour (one compressor, lazy S3
+client, timing reports) and the persistence modes.
+
+Version: 1.0.0
+"""
+
+import base64
+import gzip
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+import handler
+import rebuild_handoff_index
+from local_queue import LocalQueue
+from local_s3 import LocalS3, LocalS3Error
+
+
+CONVERSATION = (
+    "User: Implement JWT authentication for the API\n"
+    "Created file api/auth.py\n"
+    "def create_token(user_id):\n"
+    "Modified api/main.py (added routes)\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def cold_result_cache():
+    handler.RESULT_CACHE.clear()
+    yield
+    handler.RESULT_CACHE.clear()
+
+
+@pytest.fixture
+def s3():
+    local = LocalS3()
+    handler.set_s3_client(local)
+    yield local
+    handler.set_s3_client(None)
+
+
+@pytest.fixture
+def persister(monkeypatch):
+    """Install a ResultPersister built by the test"""
+    def install(mode, **kwargs):
+        instance = handler.ResultPersister(mode, bucket="test-bucket", **kwargs)
+        monkeypatch.setattr(handler, "PERSISTER", instance)
+        return instance
+    return install
+
+
+def _compress(conversation=CONVERSATION, **fields):
+    response = handler.compress_handler(
+        {"body": json.dumps({"conversation": conversation, **fields})}, None)
+    return json.loads(response["body"])
+
+
+def _timing_reports(output):
+    events = [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+    return [e for e in events if e["event"] == "timing"]
+
+
+class TestWarmPath:
+    """Module-level compressor, lazy S3 client, timing logs"""
+
+    def test_compress_route(self, s3, capsys):
+        response = handler.compress_handler({"body": json.dumps({"conversation": CONVERSATION})}, None)
+        body = json.loads(response["body"])
+
+        assert response["statusCode"] == 200
+        assert body["compressed"]["artifacts"] == ["api/auth.py", "api/main.py"]
+        assert body["compressed"]["breadcrumbs"] == ["def: create_token"]
+        assert len(s3.keys(handler.BUCKET_NAME)) == 1
+
+        report = _timing_reports(capsys.readouterr().out)[-1]
+        assert report["route"] == "compress"
+        assert set(report["phasesMs"]) == {"parse", "hash", "lookup", "compress", "s3", "respond", "flush"}
+
+    def test_single_pass_matches_per_line_rules(self):
+        result = handler.COMPRESSOR.compress(
+            "user: first request here\nsee a/b.json and c\\d.py\nconst x = (1)\nclass Foo(Base):\n")
+        compressed = result["compressed"]
+
+        # '.js' matches inside '.json', so b.json is grouped with .js (legacy order)
+        assert compressed["artifacts"] == ["c\\d.py", "a/b.json"]
+        assert compressed["breadcrumbs"] == ["class: Foo", "const: x ="]
+        assert compressed["sessionIntent"] == ["first request here"]
+
+    def test_only_first_invocation_is_cold(self, s3, capsys):
+        handler._cold_start = True
+        for _ in range(2):
+            handler.handoff_handler({"body": json.dumps({"from_agent": "a", "to_agent": "b"})}, None)
+
+        reports = _timing_reports(capsys.readouterr().out)
+        assert [r["coldStart"] for r in reports] == [True, False]
+
+    def test_s3_client_is_created_lazily_once(self, monkeypatch):
+        created = []
+
+        class FakeBoto3:
+            @staticmethod
+            def client(name):
+                created.append(name)
+                return LocalS3()
+
+        monkeypatch.setitem(__import__("sys").modules, "boto3", FakeBoto3)
+        handler.set_s3_client(None)
+        try:
+            first = handler.get_s3_client()
+            assert handler.get_s3_client() is first
+            assert created == ["s3"]
+        finally:
+            handler.set_s3_client(None)
+
+
+class TestPersistence:
+    """sync / background / batch modes and "persist": false"""
+
+    def test_sync_stores_before_returning(self, s3, persister):
+        persister("sync")
+        body = _compress()
+
+        key = body["s3_location"].replace("s3://test-bucket/", "")
+        stored = json.loads(s3.read("test-bucket", key))
+        assert stored["compressed"] == body["compressed"]
+
+    def test_background_write_overlaps_and_is_flushed(self, s3, persister):
+        s3.put_delay = 0.2
+        instance = persister("background")
+
+        start = time.perf_counter()
+        location = instance.store("handoffs/a-to-b.json", {"ok": True})
+        assert time.perf_counter() - start < 0.1
+        assert s3.keys("test-bucket") == []
+
+        assert instance.flush() == 1
+        assert s3.keys("test-bucket") == ["handoffs/a-to-b.json"]
+        assert location == "s3://test-bucket/handoffs/a-to-b.json"
+        assert instance.pending() == 0
+
+    def test_background_handler_returns_with_object_stored(self, s3, persister):
+        persister("background")
+        body = _compress()
+
+        assert body["s3_location"].replace("s3://test-bucket/", "") in s3.keys("test-bucket")
+
+    def test_batch_groups_results_into_one_ndjson_object(self, s3, persister):
+        instance = persister("batch", batch_size=3, max_age=3600)
+        locations = [_compress(f"User: request {i}\n")["s3_location"] for i in range(2)]
+
+        assert s3.keys("test-bucket") == []
+        assert instance.pending() == 2
+
+        handler.handoff_handler({"body": json.dumps({"from_agent": "a", "to_agent": "b"})}, None)
+        keys = s3.keys("test-bucket", "batches/")  # handoff manifests are written directly
+        assert len(keys) == 1 and keys[0].endswith(".ndjson")
+        assert [loc.rsplit("#", 1) for loc in locations] == [
+            [f"s3://test-bucket/{keys[0]}", "1"], [f"s3://test-bucket/{keys[0]}", "2"]]
+
+        lines = s3.read("test-bucket", keys[0]).decode("utf-8").splitlines()
+        records = [json.loads(line) for line in lines]
+        assert [r["key"].split("/")[0] for r in records] == ["compressed", "compressed", "handoffs"]
+        assert records[0]["record"]["compressed"]["sessionIntent"] == ["request 0"]
+        assert instance.pending() == 0
+
+    def test_batch_flushes_when_oldest_record_expires(self, s3, persister):
+        instance = persister("batch", batch_size=100, max_age=0)
+        _compress()
+
+        assert len(s3.keys("test-bucket")) == 1
+        assert instance.flush(force=True) == 0
+
+    def test_forced_flush_writes_partial_batch(self, s3, persister):
+        instance = persister("batch", batch_size=100, max_age=3600)
+        _compress()
+        assert s3.keys("test-bucket") == []
+
+        assert instance.flush(force=True) == 1
+        assert len(s3.keys("test-bucket")) == 1
+
+    def test_persist_false_skips_storage(self, s3, persister):
+        instance = persister("background")
+        body = _compress(persist=False)
+
+        assert body["s3_location"] is None
+        assert body["compressed"]["artifacts"] == ["api/auth.py", "api/main.py"]
+        assert s3.calls.get("put_object", 0) == 0
+        assert instance.pending() == 0
+
+    def test_only_confirmed_writes_are_cached(self, s3, persister, monkeypatch):
+        persister("sync")
+        put = s3.put_object
+
+        def throttled(**kwargs):
+            raise RuntimeError("throttled")
+
+        monkeypatch.setattr(s3, "put_object", throttled)
+        assert _compress()["s3_location"] is None
+        assert handler.RESULT_CACHE.get(handler.result_key(CONVERSATION))[1] is None
+
+        monkeypatch.setattr(s3, "put_object", put)
+        body = _compress()
+        assert body["cache"] == "memory"
+        assert body["s3_location"] == f"s3://test-bucket/{handler.result_key(CONVERSATION)}"
+        assert handler.result_key(CONVERSATION) in s3.keys("test-bucket")
+
+    def test_write_errors_are_logged_not_returned(self, persister, capsys, monkeypatch):
+        class FailingS3:
+            def put_object(self, **kwargs):
+                raise RuntimeError("access denied")
+
+        monkeypatch.setattr(handler, "_s3_client", FailingS3())
+        persister("sync")
+        body = _compress()
+
+        assert body["compressed"]["playByPlay"]
+        assert "access denied" in capsys.readouterr().out
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            handler.ResultPersister("eventually")
+
+
+def _gzip_event(payload, **headers):
+    data = gzip.compress(json.dumps(payload).encode("utf-8"))
+    return {
+        "headers": {"Content-Encoding": "gzip", **headers},
+        "body": base64.b64encode(data).decode("ascii"),
+        "isBase64Encoded": True,
+    }
+
+
+def _decode_response(response):
+    data = response["body"].encode("ascii") if response.get("isBase64Encoded") else None
+    if data is None:
+        return json.loads(response["body"])
+    data = base64.b64decode(data)
+    if response["headers"].get("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    else:
+        data = pytest.importorskip("zstandard").ZstdDecompressor().decompress(data)
+    return json.loads(data)
+
+
+class TestBodyEncoding:
+    """Content-Encoding requests, Accept-Encoding responses, size limits"""
+
+    def test_gzip_base64_request_and_response(self, s3, monkeypatch):
+        monkeypatch.setattr(handler, "MIN_COMPRESS_BYTES", 0)
+        response = handler.compress_handler(
+            _gzip_event({"conversation": CONVERSATION}, **{"accept-encoding": "gzip, deflate"}), None)
+
+        assert response["statusCode"] == 200
+        assert response["isBase64Encoded"] is True
+        assert response["headers"]["Content-Encoding"] == "gzip"
+        assert _decode_response(response)["compressed"]["breadcrumbs"] == ["def: create_token"]
+
+    def test_raw_gzip_bytes_body(self, s3):
+        event = {"headers": {"content-encoding": "gzip"},
+                 "body": gzip.compress(json.dumps({"conversation": CONVERSATION}).encode("utf-8"))}
+        response = handler.compress_handler(event, None)
+
+        assert response["statusCode"] == 200
+        assert "Content-Encoding" not in response["headers"]
+
+    def test_small_or_unaccepted_responses_stay_plain(self, s3):
+        plain = handler.mcp_handler({"body": json.dumps({"method": "ping"}),
+                                     "headers": {"Accept-Encoding": "gzip"}}, None)
+        refused = handler.choose_encoding("gzip;q=0, identity")
+
+        assert json.loads(plain["body"]) == {"result": "pong"}
+        assert refused is None
+        assert handler.choose_encoding("*") in ("gzip", "zstd")
+        assert handler.choose_encoding("") is None
+
+    def test_mcp_route_decodes_body_once(self, s3, monkeypatch):
+        calls = []
+        original = handler.read_body
+        monkeypatch.setattr(handler, "read_body", lambda event, limit=None: calls.append(1) or original(event, limit))
+
+        response = handler.mcp_handler(
+            _gzip_event({"method": "compress", "conversation": CONVERSATION}), None)
+
+        assert response["statusCode"] == 200
+        assert len(calls) == 1
+
+    def test_decompressed_size_limit(self, monkeypatch):
+        monkeypatch.setattr(handler, "MAX_BODY_BYTES", 4096)
+        bomb = _gzip_event({"conversation": "x" * 1_000_000})
+        assert len(bomb["body"]) < 4096
+
+        response = handler.compress_handler(bomb, None)
+        assert response["statusCode"] == 413
+
+        plain = handler.compress_handler({"body": json.dumps({"conversation": "y" * 5000})}, None)
+        assert plain["statusCode"] == 413
+
+    def test_bad_bodies(self):
+        unsupported = handler.mcp_handler({"headers": {"Content-Encoding": "br"}, "body": "x"}, None)
+        corrupt = handler.mcp_handler({"headers": {"Content-Encoding": "gzip"},
+                                       "body": base64.b64encode(b"not gzip").decode(),
+                                       "isBase64Encoded": True}, None)
+        truncated = handler.mcp_handler({"headers": {"Content-Encoding": "gzip"},
+                                         "body": gzip.compress(b'{"method": "ping"}')[:-12]}, None)
+
+        assert unsupported["statusCode"] == 415
+        assert corrupt["statusCode"] == 400
+        assert truncated["statusCode"] == 400
+
+    def test_zstd_round_trip(self, s3, monkeypatch):
+        zstandard = pytest.importorskip("zstandard")
+        monkeypatch.setattr(handler, "MIN_COMPRESS_BYTES", 0)
+        data = zstandard.ZstdCompressor().compress(json.dumps({"conversation": CONVERSATION}).encode())
+        event = {"headers": {"Content-Encoding": "zstd", "Accept-Encoding": "zstd"},
+                 "body": base64.b64encode(data).decode(), "isBase64Encoded": True}
+
+        response = handler.compress_handler(event, None)
+        assert response["headers"]["Content-Encoding"] == "zstd"
+        assert _decode_response(response)["compressed"]["artifacts"] == ["api/auth.py", "api/main.py"]
+
+
+def _batch(items, **headers):
+    response = handler.mcp_handler({"body": json.dumps(items), "headers": headers}, None)
+    return response, (json.loads(response["body"]) if response["body"] else None)
+
+
+class TestJsonRpcBatch:
+    """Array bodies: concurrent items, ordered results, per-item errors"""
+
+    def test_mixed_batch_keeps_request_order(self, s3, persister):
+        persister("sync")
+        items = [
+            {"jsonrpc": "2.0", "id": 1, "method": "compress", "params": {"conversation": CONVERSATION}},
+            {"jsonrpc": "2.0", "id": "h", "method": "handoff", "params": {"from_agent": "a", "to_agent": "b"}},
+            {"jsonrpc": "2.0", "id": 3, "method": "ping"},
+            {"jsonrpc": "2.0", "id": 4, "method": "compress", "conversation": "User: inline args\n"},
+        ]
+        response, results = _batch(items)
+
+        assert response["statusCode"] == 200
+        assert [r["id"] for r in results] == [1, "h", 3, 4]
+        assert results[0]["result"]["compressed"]["breadcrumbs"] == ["def: create_token"]
+        assert results[1]["result"]["handoff"]["from"]["agentType"] == "a"
+        assert results[2]["result"] == "pong"
+        assert results[3]["result"]["compressed"]["sessionIntent"] == ["inline args"]
+        assert len(s3.keys("test-bucket")) >= 2
+
+    def test_item_errors_do_not_fail_the_batch(self, s3):
+        items = [
+            {"jsonrpc": "2.0", "id": 1, "method": "compress", "params": {}},
+            {"jsonrpc": "2.0", "id": 2, "method": "translate"},
+            "not an object",
+            {"jsonrpc": "2.0", "id": 4, "method": "compress", "params": ["positional"]},
+            {"jsonrpc": "2.0", "id": 5, "method": "ping"},
+        ]
+        response, results = _batch(items)
+
+        assert response["statusCode"] == 200
+        assert [r.get("error", {}).get("code") for r in results] == [
+            handler.INVALID_PARAMS, handler.METHOD_NOT_FOUND, handler.INVALID_REQUEST,
+            handler.INVALID_PARAMS, None]
+        assert results[0]["error"]["message"] == "Missing conversation field"
+        assert results[2]["id"] is None
+        assert results[4]["result"] == "pong"
+
+    def test_internal_errors_are_per_item(self, s3, monkeypatch):
+        def explode(conversation):
+            if "boom" in conversation:
+                raise RuntimeError("compressor failed")
+            return original(conversation)
+
+        original = handler.COMPRESSOR.compress
+        monkeypatch.setattr(handler.COMPRESSOR, "compress", explode)
+        _, results = _batch([
+            {"jsonrpc": "2.0", "id": 1, "method": "compress", "params": {"conversation": "boom"}},
+            {"jsonrpc": "2.0", "id": 2, "method": "compress", "params": {"conversation": CONVERSATION}},
+        ])
+
+        assert results[0]["error"] == {"code": handler.INTERNAL_ERROR, "message": "compressor failed"}
+        assert "result" in results[1]
+
+    def test_items_run_concurrently(self, s3, persister):
+        s3.put_delay = 0.1
+        persister("sync")
+        items = [{"jsonrpc": "2.0", "id": i, "method": "compress",
+                  "params": {"conversation": f"User: task {i}\n"}} for i in range(8)]
+
+        start = time.perf_counter()
+        _, results = _batch(items)
+        elapsed = time.perf_counter() - start
+
+        assert [r["result"]["compressed"]["sessionIntent"] for r in results] == [
+            [f"task {i}"] for i in range(8)]
+        assert elapsed < 0.5  # 8 serial S3 writes would take 0.8s
+
+    def test_notifications_and_batch_limits(self, s3, monkeypatch):
+        response, results = _batch([{"jsonrpc": "2.0", "method": "ping"}])
+        assert response["statusCode"] == 202 and results is None
+
+        response, results = _batch([])
+        assert response["statusCode"] == 400
+        assert results["error"]["code"] == handler.INVALID_REQUEST
+
+        monkeypatch.setattr(handler, "MAX_BATCH_ITEMS", 2)
+        response, _ = _batch([{"jsonrpc": "2.0", "id": i, "method": "ping"} for i in range(3)])
+        assert response["statusCode"] == 413
+
+    def test_batch_response_is_compressed_once(self, s3, monkeypatch):
+        monkeypatch.setattr(handler, "MIN_COMPRESS_BYTES", 0)
+        items = [{"jsonrpc": "2.0", "id": i, "method": "compress",
+                  "params": {"conversation": CONVERSATION, "persist": False}} for i in range(3)]
+        response = handler.mcp_handler(
+            {"body": json.dumps(items), "headers": {"Accept-Encoding": "gzip"}}, None)
+
+        results = _decode_response(response)
+        assert response["headers"]["Content-Encoding"] == "gzip"
+        assert [r["result"]["s3_location"] for r in results] == [None, None, None]
+
+
+class TestContentAddressedResults:
+    """Hash + version keys, stored-result reuse, warm LRU"""
+
+    def test_key_is_conversation_hash_under_compressor_version(self, s3, persister):
+        persister("sync")
+        body = _compress()
+
+        key = handler.result_key(CONVERSATION)
+        assert body["s3_location"] == f"s3://test-bucket/{key}"
+        assert key.split("/")[1] == handler.compressor_version()[:16]
+        assert s3.keys("test-bucket") == [key]
+        assert body["cache"] == "miss"
+
+    def test_repeats_are_served_without_recompressing(self, s3, persister, monkeypatch):
+        persister("sync")
+        first = _compress()
+        monkeypatch.setattr(handler.COMPRESSOR, "compress",
+                            lambda conversation: pytest.fail("recompressed a cached conversation"))
+
+        second = _compress()
+        assert second["cache"] == "memory"
+        assert second["compressed"] == first["compressed"]
+        assert s3.calls["put_object"] == 1
+
+        handler.RESULT_CACHE.clear()  # new container: stored object is the source
+        third = _compress()
+        assert third["cache"] == "s3"
+        assert third["metadata"] == first["metadata"]
+        assert s3.calls["put_object"] == 1
+
+    def test_distinct_conversations_do_not_collide(self, s3, persister):
+        persister("sync")
+        locations = {_compress(f"User: request {i}\n")["s3_location"] for i in range(3)}
+
+        assert len(locations) == 3
+        assert len(s3.keys("test-bucket")) == 3
+
+    def test_persist_false_uses_memory_only(self, s3, persister):
+        persister("sync")
+        assert _compress(persist=False)["cache"] == "miss"
+        assert _compress(persist=False)["cache"] == "memory"
+        assert s3.calls == {}
+
+        # A later persisting request stores the result it found in memory
+        body = _compress()
+        assert body["cache"] == "memory"
+        assert s3.keys("test-bucket") == [handler.result_key(CONVERSATION)]
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = handler.ResultLRU(max_items=2)
+        lru.put("a", {"n": 1}, None)
+        lru.put("b", {"n": 2}, None)
+        lru.get("a")
+        lru.put("c", {"n": 3}, None)
+
+        assert lru.get("b") is None
+        assert lru.get("a") == ({"n": 1}, None)
+        assert len(lru) == 2
+
+    def test_read_errors_fall_back_to_compressing(self, persister, monkeypatch, capsys):
+        class BrokenS3(LocalS3):
+            def get_object(self, **kwargs):
+                raise RuntimeError("throttled")
+
+        monkeypatch.setattr(handler, "_s3_client", BrokenS3())
+        persister("sync")
+
+        assert _compress()["cache"] == "miss"
+        assert "throttled" in capsys.readouterr().out
+
+
+    def test_denied_misses_warn_once(self, persister, monkeypatch, capsys):
+        # Without s3:ListBucket every cache miss is an AccessDenied GET
+        monkeypatch.setattr(handler, "_s3_client", LocalS3(deny_missing=True))
+        monkeypatch.setattr(handler, "_denied_warned", False)
+        persister("sync")
+
+        assert _compress()["cache"] == "miss"
+        handler.RESULT_CACHE.clear()
+        assert _compress(CONVERSATION + "User: one more\n")["cache"] == "miss"
+        warnings = [line for line in capsys.readouterr().out.splitlines() if '"warning"' in line]
+        assert len(warnings) == 1 and "s3:ListBucket" in warnings[0]
+
+@pytest.fixture
+def metrics_file(tmp_path):
+    path = tmp_path / "metrics.ndjson"
+    previous = handler.set_log_sink(handler.FileSink(str(path)))
+    yield path
+    handler.set_log_sink(previous)
+
+
+def _records(path, event=None):
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    return [r for r in records if event is None or r["event"] == event]
+
+
+class TestMetrics:
+    """EMF timing lines and the local file sink"""
+
+    def test_compress_emits_emf_metrics(self, s3, metrics_file, capsys):
+        handler.compress_handler({"body": json.dumps({"conversation": CONVERSATION})}, None)
+
+        (record,) = _records(metrics_file, "timing")
+        directive = record["_aws"]["CloudWatchMetrics"][0]
+        names = {metric["Name"] for metric in directive["Metrics"]}
+
+        assert directive["Namespace"] == handler.METRICS_NAMESPACE
+        assert directive["Dimensions"] == [["Route"]]
+        assert record["Route"] == "compress"
+        assert {"ParseMs", "HashMs", "CompressMs", "S3WriteMs", "TotalMs",
+                "BytesIn", "WireBytesIn", "WireBytesOut", "CompressionRate"} <= names
+        # EMF: every declared metric is a top-level number
+        assert all(isinstance(record[name], (int, float)) for name in names)
+        assert record["BytesIn"] == len(CONVERSATION.encode("utf-8"))
+        assert record["CompressionRate"] < 1
+        units = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+        assert units["ParseMs"] == "Milliseconds" and units["BytesIn"] == "Bytes"
+        # The sink replaces stdout
+        assert capsys.readouterr().out == ""
+
+    def test_batch_and_handoff_report_wire_bytes(self, s3, metrics_file):
+        handler.handoff_handler({"body": json.dumps({"from_agent": "a", "to_agent": "b"})}, None)
+        _batch([{"jsonrpc": "2.0", "id": 1, "method": "ping"}])
+
+        handoff, batch = _records(metrics_file, "timing")
+        assert handoff["Route"] == "handoff" and handoff["WireBytesOut"] > 0
+        assert batch["Route"] == "mcp-batch" and batch["BatchItems"] == 1
+
+    def test_warnings_are_structured(self, metrics_file, monkeypatch, persister):
+        class FailingS3:
+            def put_object(self, **kwargs):
+                raise RuntimeError("access denied")
+
+            def get_object(self, **kwargs):
+                raise LocalS3Error("NoSuchKey", "missing")
+
+        monkeypatch.setattr(handler, "_s3_client", FailingS3())
+        persister("sync")
+        _compress()
+
+        (warning,) = _records(metrics_file, "warning")
+        assert "access denied" in warning["message"]
+
+
+LARGE_CONVERSATION = "".join(
+    f"User: 第 {i} 步：實作 handoff 壓縮\nCreated file src/step_{i}.py\ndef step_{i}(ctx):\n"
+    f"Modified docs/step_{i}.md (更新說明)\n" for i in range(40))
+
+
+def _compress_key(key, **fields):
+    response = handler.compress_handler(
+        {"body": json.dumps({"conversation_key": key, **fields})}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+class TestObjectKeyCompression:
+    """conversation_key: ranged streaming reads, derived result key"""
+
+    @pytest.fixture
+    def small_chunks(self, monkeypatch):
+        # 13-byte ranges split lines and multi-byte UTF-8 characters
+        monkeypatch.setattr(handler, "OBJECT_CHUNK_BYTES", 13)
+
+    def test_streamed_result_matches_inline(self, s3, persister, small_chunks):
+        persister("sync")
+        s3.put_object(Bucket="test-bucket", Key="uploads/session.txt", Body=LARGE_CONVERSATION)
+
+        status, body = _compress_key("uploads/session.txt")
+        inline = handler.ContextCompressor().compress(LARGE_CONVERSATION)
+
+        assert status == 200
+        assert body["compressed"] == inline["compressed"]
+        assert body["metadata"]["originalTokens"] == inline["metadata"]["originalTokens"]
+        assert body["metadata"]["compressionRate"] == inline["metadata"]["compressionRate"]
+
+        size = len(LARGE_CONVERSATION.encode("utf-8"))
+        source = body["metadata"]["source"]
+        assert source["bytes"] == size
+        assert source["chunks"] == -(-size // 13)
+        assert s3.calls["get_object"] == source["chunks"] + 1  # + stored-result lookup
+
+    def test_result_written_under_derived_key(self, s3, persister):
+        persister("batch", batch_size=100, max_age=3600)
+        s3.put_object(Bucket="test-bucket", Key="uploads/a.txt", Body=LARGE_CONVERSATION)
+
+        _, body = _compress_key("uploads/a.txt")
+        derived = handler.object_result_key("uploads/a.txt")
+
+        assert body["s3_location"] == f"s3://test-bucket/{derived}"
+        stored = json.loads(s3.read("test-bucket", derived))
+        assert stored["compressed"] == body["compressed"]
+
+    def test_gzip_objects_are_inflated(self, s3, persister, small_chunks):
+        persister("sync")
+        s3.put_object(Bucket="test-bucket", Key="uploads/session.txt",
+                      Body=gzip.compress(LARGE_CONVERSATION.encode("utf-8")), ContentEncoding="gzip")
+
+        _, body = _compress_key("uploads/session.txt")
+        assert body["compressed"] == handler.ContextCompressor().compress(LARGE_CONVERSATION)["compressed"]
+        assert body["metadata"]["source"]["bytes"] == len(LARGE_CONVERSATION.encode("utf-8"))
+
+    def test_reuses_result_until_object_changes(self, s3, persister, monkeypatch):
+        persister("sync")
+        s3.put_object(Bucket="test-bucket", Key="uploads/s.txt", Body=LARGE_CONVERSATION)
+
+        assert _compress_key("uploads/s.txt")[1]["cache"] == "miss"
+        assert _compress_key("uploads/s.txt")[1]["cache"] == "memory"
+        handler.RESULT_CACHE.clear()
+        assert _compress_key("uploads/s.txt")[1]["cache"] == "s3"
+
+        s3.put_object(Bucket="test-bucket", Key="uploads/s.txt", Body="User: rewritten session\n")
+        _, body = _compress_key("uploads/s.txt")
+        assert body["cache"] == "miss"
+        assert body["compressed"]["sessionIntent"] == ["rewritten session"]
+
+    def test_missing_and_oversized_objects(self, s3, persister, monkeypatch):
+        persister("sync")
+        assert _compress_key("uploads/none.txt")[0] == 404
+        assert _compress_key("/etc/passwd")[0] == 400
+        # HEAD without s3:ListBucket (or read access): 403, reported as not found
+        monkeypatch.setattr(s3, "deny_missing", True)
+        monkeypatch.setattr(handler, "_denied_warned", False)
+        status, body = _compress_key("uploads/none.txt")
+        assert status == 404 and "not readable" in body["error"]
+        monkeypatch.setattr(s3, "deny_missing", False)
+
+        monkeypatch.setattr(handler, "MAX_OBJECT_BYTES", 100)
+        s3.put_object(Bucket="test-bucket", Key="uploads/big.txt", Body=LARGE_CONVERSATION)
+        s3.put_object(Bucket="test-bucket", Key="uploads/big.txt.gz",
+                      Body=gzip.compress(LARGE_CONVERSATION.encode("utf-8")))
+        assert _compress_key("uploads/big.txt")[0] == 413
+        assert _compress_key("uploads/big.txt.gz")[0] == 413
+
+    def test_reader_holds_one_chunk(self, s3):
+        text = "x" * 50 + "\n" + "y" * 10
+        s3.put_object(Bucket="b", Key="k", Body=text)
+        reader = handler.ObjectLineReader("b", "k", len(text), chunk_bytes=8)
+
+        assert list(reader) == text.split("\n")
+        assert reader.chunks == 8
+        assert reader.sha256.hexdigest() == __import__("hashlib").sha256(text.encode()).hexdigest()
+
+
+def _manifests(s3):
+    return [json.loads(s3.read("test-bucket", key)) for key in s3.keys("test-bucket", "manifests/queue/")]
+
+
+class TestQueueWorker:
+    """SQS-shaped batches through the local queue stand-in"""
+
+    def test_batch_writes_results_and_manifest(self, s3, persister):
+        persister("sync")
+        queue = LocalQueue()
+        queue.send_batch([
+            {"job_id": "c1", "method": "compress", "params": {"conversation": CONVERSATION}},
+            {"job_id": "c2", "method": "compress", "params": {"conversation": "User: second\n", "persist": False}},
+            {"job_id": "h1", "method": "handoff", "params": {"from_agent": "a", "to_agent": "b"}},
+            {"job_id": "bad", "method": "translate"},
+            "not json {",
+        ])
+
+        assert queue.drain(handler.queue_handler) == 1
+        assert len(queue) == 0 and queue.dead_letters == []
+
+        (manifest,) = _manifests(s3)
+        assert manifest["counts"] == {"ok": 3, "rejected": 2, "retry": 0}
+        jobs = {job["jobId"]: job for job in manifest["jobs"] if job["jobId"]}
+        assert set(jobs) == {"c1", "c2", "h1"}
+        # Every successful job's result exists, even with "persist": false
+        for job in jobs.values():
+            assert s3.read("test-bucket", job["s3_location"].split("/", 3)[3])
+
+    def test_only_failed_jobs_are_retried(self, s3, persister, monkeypatch):
+        persister("sync")
+        original = handler.COMPRESSOR.compress
+        attempts = []
+
+        def flaky(conversation):
+            if "flaky" in conversation:
+                attempts.append(1)
+                if len(attempts) < 2:
+                    raise RuntimeError("transient failure")
+            if "broken" in conversation:
+                raise RuntimeError("always fails")
+            return original(conversation)
+
+        monkeypatch.setattr(handler.COMPRESSOR, "compress", flaky)
+        queue = LocalQueue(max_receives=3)
+        ids = queue.send_batch([{"method": "compress", "params": {"conversation": text}}
+                                for text in ("User: fine\n", "User: flaky\n", "User: broken\n")])
+
+        first = queue.receive()
+        response = handler.queue_handler(first, None)
+        assert [f["itemIdentifier"] for f in response["batchItemFailures"]] == ids[1:]
+        queue.ack(first, response)
+
+        queue.drain(handler.queue_handler)
+        assert len(attempts) == 2
+        assert [m["messageId"] for m in queue.dead_letters] == [ids[2]]
+        assert sum(m["counts"]["ok"] for m in _manifests(s3)) == 2
+
+    @pytest.mark.parametrize("mode", ["sync", "background", "batch"])
+    def test_failed_result_write_is_retried(self, s3, persister, monkeypatch, mode):
+        persister(mode)
+        failures = {"left": 1}
+        put = s3.put_object
+
+        def failing_put(**kwargs):
+            if kwargs["Key"].startswith(("compressed/", "batches/")) and failures["left"]:
+                failures["left"] -= 1
+                raise RuntimeError("slow down")
+            return put(**kwargs)
+
+        monkeypatch.setattr(s3, "put_object", failing_put)
+        queue = LocalQueue()
+        message_id = queue.send({"method": "compress", "params": {"conversation": CONVERSATION}})
+
+        event = queue.receive()
+        response = handler.queue_handler(event, None)
+        assert response == {"batchItemFailures": [{"itemIdentifier": message_id}]}
+        queue.ack(event, response)
+
+        # The warm container still holds the result, but not as stored
+        queue.drain(handler.queue_handler)
+        (manifest,) = [m for m in _manifests(s3) if m["counts"]["ok"]]
+        key = handler._location_key(manifest["jobs"][0]["s3_location"])
+        assert key in s3.keys("test-bucket")
+        assert key.startswith("batches/" if mode == "batch" else "compressed/")
+
+    def test_manifest_write_failure_retries_batch(self, s3, persister, monkeypatch):
+        persister("sync")
+        put = s3.put_object
+
+        def no_manifests(**kwargs):
+            if kwargs["Key"].startswith("manifests/"):
+                raise RuntimeError("denied")
+            return put(**kwargs)
+
+        monkeypatch.setattr(s3, "put_object", no_manifests)
+        queue = LocalQueue()
+        ids = queue.send_batch([{"method": "handoff", "params": {"from_agent": "a", "to_agent": "b"}},
+                                {"method": "translate"}])
+
+        response = handler.queue_handler(queue.receive(), None)
+        assert [f["itemIdentifier"] for f in response["batchItemFailures"]] == ids
+
+    def test_batch_persist_mode_flushes_before_ack(self, s3, persister):
+        persister("batch", batch_size=100, max_age=3600)
+        queue = LocalQueue()
+        queue.send_batch([{"method": "compress", "params": {"conversation": f"User: job {i}\n"}}
+                          for i in range(3)])
+
+        queue.drain(handler.queue_handler)
+        assert handler.PERSISTER.pending() == 0
+        (batch_key,) = s3.keys("test-bucket", "batches/")
+        assert len(s3.read("test-bucket", batch_key).splitlines()) == 3
+
+    def test_jobs_run_concurrently(self, s3, persister):
+        s3.put_delay = 0.1
+        persister("sync")
+        queue = LocalQueue()
+        queue.send_batch([{"method": "compress", "params": {"conversation": f"User: job {i}\n"}}
+                          for i in range(8)])
+
+        start = time.perf_counter()
+        queue.drain(handler.queue_handler)
+        # 8 result writes overlap; manifest write is the one serial put
+        assert time.perf_counter() - start < 0.6
+
+
+def _handoff(from_agent="a", to_agent="b", **fields):
+    response = handler.handoff_handler(
+        {"body": json.dumps({"from_agent": from_agent, "to_agent": to_agent, **fields})}, None)
+    return json.loads(response["body"])
+
+
+def _handoffs(**query):
+    response = handler.handoffs_handler({"queryStringParameters": query}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def _entry(at, from_agent="a", to_agent="b"):
+    when = datetime.strptime(at, "%Y-%m-%d %H:%M:%S")
+    return handler.handoff_entry(from_agent, to_agent, when,
+                                 f"s3://test-bucket/handoffs/{from_agent}-to-{to_agent}-{when:%Y%m%d-%H%M%S}.json")
+
+
+class TestHandoffIndex:
+    """Per-pair / per-day manifests, lookups and the rebuild command"""
+
+    def test_handoff_appends_to_pair_and_day_manifests(self, s3, persister):
+        persister("sync")
+        locations = [_handoff(f, t)["s3_location"] for f, t in (("a", "b"), ("a", "c"), ("c", "a"))]
+
+        pair, _ = handler.read_handoff_manifest(handler.handoff_pair_key("a", "b"))
+        assert [e["location"] for e in pair] == [locations[0]]
+        (day_key,) = s3.keys("test-bucket", "manifests/handoffs/days/")
+        day, _ = handler.read_handoff_manifest(day_key)
+        assert sorted(e["location"] for e in day) == sorted(locations)
+
+        status, body = _handoffs(from_agent="a", to_agent="b")
+        assert status == 200 and body["manifestsRead"] == 1
+        assert body["handoffs"] == pair
+
+        status, body = _handoffs(agent="c", limit="2")
+        assert status == 200 and body["manifestsRead"] == 1
+        assert {(e["from"], e["to"]) for e in body["handoffs"]} == {("a", "c"), ("c", "a")}
+        assert s3.calls.get("list_objects_v2", 0) == 1  # only the keys() call above
+
+    def test_day_walk_stops_at_limit(self, s3, persister):
+        persister("sync")
+        for at in ("2026-03-01 09:00:00", "2026-03-03 10:00:00", "2026-03-03 11:00:00",
+                   "2026-03-05 08:00:00"):
+            handler.index_handoff(_entry(at))
+
+        status, body = _handoffs(agent="a", until="2026-03-05", limit="3")
+        assert status == 200
+        assert [e["at"] for e in body["handoffs"]] == [
+            "2026-03-05T08:00:00Z", "2026-03-03T11:00:00Z", "2026-03-03T10:00:00Z"]
+        assert body["manifestsRead"] == 3  # 05, 04 (missing), 03
+
+        status, body = _handoffs(since="2026-03-01", until="2026-03-02T23:00:00Z")
+        assert [e["at"] for e in body["handoffs"]] == ["2026-03-01T09:00:00Z"]
+
+        # Offsets are converted to UTC, not dropped
+        status, body = _handoffs(agent="a", since="2026-03-03T18:00:00+08:00",
+                                 until="2026-03-03T19:30:00+08:00")
+        assert [e["at"] for e in body["handoffs"]] == ["2026-03-03T11:00:00Z", "2026-03-03T10:00:00Z"]
+        assert handler._query_time("2026-03-03T02:00:00-05:00") == datetime(2026, 3, 3, 7)
+
+        assert _handoffs(limit="0")[0] == 400
+        assert _handoffs(since="yesterday")[0] == 400
+        assert _handoffs(since="2026-01-01", until="2026-03-01")[0] == 400
+
+    def test_pair_manifest_is_capped(self, s3, persister, monkeypatch):
+        persister("sync")
+        monkeypatch.setattr(handler, "HANDOFF_PAIR_MAX_ENTRIES", 3)
+        for minute in range(5):
+            handler.index_handoff(_entry(f"2026-03-01 09:0{minute}:00"))
+
+        pair, _ = handler.read_handoff_manifest(handler.handoff_pair_key("a", "b"))
+        assert [e["at"][11:16] for e in pair] == ["09:04", "09:03", "09:02"]
+        day, _ = handler.read_handoff_manifest(handler.handoff_day_key("20260301"))
+        assert len(day) == 5
+
+    def test_concurrent_update_is_merged_not_lost(self, s3, persister, monkeypatch):
+        persister("sync")
+        key = handler.handoff_pair_key("a", "b")
+        handler.index_handoff(_entry("2026-03-01 08:00:00"))
+        get = s3.get_object
+        raced = []
+
+        def racing_get(**kwargs):
+            response = get(**kwargs)
+            if kwargs["Key"] == key and not raced:
+                # Another container appends between our read and our write
+                raced.append(1)
+                assert handler.index_handoff(_entry("2026-03-01 09:00:00"))
+            return response
+
+        monkeypatch.setattr(s3, "get_object", racing_get)
+        handler.index_handoff(_entry("2026-03-01 10:00:00"))
+
+        pair, _ = handler.read_handoff_manifest(key)
+        assert [e["at"][11:13] for e in pair] == ["10", "09", "08"]
+        assert s3.calls["put_object"] == 2 + 2 + 3  # seed, racer, pair conflict + retry, day
+
+    def test_index_failure_does_not_fail_handoff(self, s3, persister, monkeypatch, capsys):
+        persister("sync")
+        put = s3.put_object
+
+        def no_manifests(**kwargs):
+            if kwargs["Key"].startswith("manifests/"):
+                raise RuntimeError("denied")
+            return put(**kwargs)
+
+        monkeypatch.setattr(s3, "put_object", no_manifests)
+        body = _handoff()
+        assert body["s3_location"].startswith("s3://test-bucket/handoffs/")
+        assert "Failed to update handoff manifest" in capsys.readouterr().out
+
+    def test_only_written_handoffs_are_indexed(self, s3, persister, monkeypatch):
+        persister("sync")
+        put = s3.put_object
+
+        def no_handoffs(**kwargs):
+            if kwargs["Key"].startswith("handoffs/"):
+                raise RuntimeError("denied")
+            return put(**kwargs)
+
+        monkeypatch.setattr(s3, "put_object", no_handoffs)
+        assert _handoff()["s3_location"] is None
+        assert s3.keys("test-bucket", "manifests/") == []
+
+    def test_batch_handoffs_are_indexed_when_the_batch_is_written(self, s3, persister,
+                                                                   monkeypatch):
+        instance = persister("batch", batch_size=100, max_age=3600)
+        location = _handoff()["s3_location"]
+        assert s3.calls.get("get_object", 0) == 0  # no manifest round trips on the request
+        assert s3.keys("test-bucket") == []
+
+        instance.flush(force=True)
+        pair, _ = handler.read_handoff_manifest(handler.handoff_pair_key("a", "b"))
+        assert [e["location"] for e in pair] == [location]
+
+        # A dropped batch leaves no manifest entries pointing into it
+        put = s3.put_object
+
+        def no_batches(**kwargs):
+            if kwargs["Key"].startswith("batches/"):
+                raise RuntimeError("denied")
+            return put(**kwargs)
+
+        monkeypatch.setattr(s3, "put_object", no_batches)
+        _handoff("c", "d")
+        instance.flush(force=True)
+        assert handler.read_handoff_manifest(handler.handoff_pair_key("c", "d"))[0] == []
+
+    def test_outdated_sdk_is_logged_as_error(self, s3, persister, monkeypatch, metrics_file):
+        class ParamValidationError(Exception):
+            """What botocore raises for parameters its S3 model does not know"""
+
+        put = s3.put_object
+
+        def old_botocore_put(**kwargs):
+            if "IfMatch" in kwargs or "IfNoneMatch" in kwargs:
+                raise ParamValidationError('Unknown parameter in input: "IfNoneMatch"')
+            return put(**kwargs)
+
+        monkeypatch.setattr(s3, "put_object", old_botocore_put)
+        persister("sync")
+        assert _handoff()["s3_location"].startswith("s3://test-bucket/handoffs/")
+
+        errors = _records(metrics_file, "error")
+        assert len(errors) == 2  # pair and day manifest
+        assert "boto3>=1.35.69" in errors[0]["message"]
+        assert _records(metrics_file, "warning") == []
+
+    def test_missing_manifests_without_list_permission(self, persister, monkeypatch,
+                                                       metrics_file):
+        # Without s3:ListBucket, S3 answers reads of missing keys with AccessDenied
+        s3 = LocalS3(deny_missing=True)
+        monkeypatch.setattr(handler, "_s3_client", s3)
+        monkeypatch.setattr(handler, "_denied_warned", False)
+        persister("sync")
+        location = _handoff("a", "b")["s3_location"]
+
+        pair, _ = handler.read_handoff_manifest(handler.handoff_pair_key("a", "b"))
+        assert [e["location"] for e in pair] == [location]
+        status, body = _handoffs(from_agent="x", to_agent="y")
+        assert status == 200 and body["handoffs"] == []
+        (warning,) = _records(metrics_file, "warning")
+        assert "s3:ListBucket" in warning["message"]
+
+    def test_rebuild_restores_manifests(self, s3, persister):
+        persister("sync")
+        _handoff("a", "b")
+        _handoff("planner-to-go", "b")  # ambiguous key: rebuild reads the object
+        persister("batch", batch_size=100, max_age=3600)
+        _handoff("c", "d")
+        handler.PERSISTER.flush(force=True)
+
+        expected = {key: handler.read_handoff_manifest(key)[0]
+                    for key in s3.keys("test-bucket", "manifests/handoffs/")}
+        for key in expected:
+            s3.delete_object(Bucket="test-bucket", Key=key)
+        stale = handler.handoff_pair_key("gone", "away")
+        s3.put_object(Bucket="test-bucket", Key=stale, Body='{"entries": []}')
+
+        summary = rebuild_handoff_index.rebuild()
+        assert summary["handoffs"] == 3 and summary["stale"] == 1 and summary["failed"] == 0
+        rebuilt = {key: handler.read_handoff_manifest(key)[0]
+                   for key in s3.keys("test-bucket", "manifests/handoffs/")}
+        assert rebuilt == expected
+
+    def test_rebuild_keeps_concurrent_appends_and_skips_bad_lines(self, s3, persister,
+                                                                  monkeypatch):
+        persister("sync")
+        _handoff("a", "b")
+        stale = handler.handoff_pair_key("gone", "away")
+        handler.index_handoff(_entry("2020-01-01 00:00:00", "gone", "away"))
+        s3.put_object(Bucket="test-bucket", Key="batches/broken.ndjson",
+                      Body='{"key": "handoffs/x-to-y-20260101-000000.json"\n[1, 2]\n')
+
+        scan = rebuild_handoff_index.scan_handoffs
+
+        def racing_scan(client, bucket):
+            yield from scan(client, bucket)
+            # A handler appends to the stale manifest while the rebuild runs
+            handler.index_handoff(handler.handoff_entry(
+                "gone", "away", datetime.utcnow(), "s3://test-bucket/handoffs/new.json"))
+
+        monkeypatch.setattr(rebuild_handoff_index, "scan_handoffs", racing_scan)
+        summary = rebuild_handoff_index.rebuild()
+
+        assert summary["handoffs"] == 1 and summary["failed"] == 0
+        kept, _ = handler.read_handoff_manifest(stale)
+        assert [e["location"] for e in kept] == ["s3://test-bucket/handoffs/new.json"]
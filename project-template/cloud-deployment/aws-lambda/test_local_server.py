@@ -0,0 +1,140 @@
+"""
+Local runner and load generator test suite
+
+Starts the local HTTP runner on a free port (local S3 stand-in, no
+network beyond loopback) and checks routing, API Gateway event
+conversion and the load generator statistics.
+
+Version: 1.0.0
+"""
+
+import gzip
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import handler
+import load_test
+import local_server
+from local_s3 import LocalS3
+
+
+@pytest.fixture
+def server():
+    s3 = LocalS3()
+    srv, base_url = local_server.start_in_thread(s3=s3)
+    yield base_url, s3
+    srv.shutdown()
+    srv.server_close()
+    handler.set_s3_client(None)
+
+
+def _request(url, body=None, headers=None, method=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+class TestLocalServer:
+    """Routes served over HTTP with the local S3 stand-in"""
+
+    def test_health_and_unknown_route(self, server):
+        base_url, _ = server
+        status, _, body = _request(base_url + "/mcp/health")
+        assert status == 200
+        assert json.loads(body)["status"] == "healthy"
+
+        assert _request(base_url + "/nowhere", method="GET")[0] == 404
+
+    def test_compress_stores_in_local_s3(self, server):
+        base_url, s3 = server
+        status, _, body = _request(base_url + "/compress",
+                                   {"conversation": "User: run locally\nCreated src/app.py\n"})
+        result = json.loads(body)
+
+        assert status == 200
+        assert result["compressed"]["artifacts"] == ["src/app.py"]
+        assert s3.keys(handler.PERSISTER.bucket) == [result["s3_location"].split("/", 3)[3]]
+
+    def test_handoff_listing(self, server):
+        base_url, _ = server
+        _request(base_url + "/handoff", {"from_agent": "research", "to_agent": "product"})
+        status, _, body = _request(base_url + "/handoffs?from_agent=research&to_agent=product&limit=5")
+        result = json.loads(body)
+
+        assert status == 200 and result["count"] == 1 and result["manifestsRead"] == 1
+        assert result["handoffs"][0]["from"] == "research"
+
+    def test_gzip_bodies_round_trip(self, server, monkeypatch):
+        monkeypatch.setattr(handler, "MIN_COMPRESS_BYTES", 0)
+        base_url, _ = server
+        data = gzip.compress(json.dumps({"method": "ping"}).encode("utf-8"))
+        request = urllib.request.Request(base_url + "/mcp", data=data, headers={
+            "Content-Encoding": "gzip", "Accept-Encoding": "gzip"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert json.loads(gzip.decompress(response.read())) == {"result": "pong"}
+
+    def test_event_shape(self):
+        event = local_server.build_event("POST", "/compress?x=1", {"Content-Type": "application/json"},
+                                         b'{"conversation": "hi"}')
+        assert event["rawPath"] == "/compress"
+        assert event["rawQueryString"] == "x=1"
+        assert event["queryStringParameters"] == {"x": "1"}
+        assert event["headers"] == {"content-type": "application/json"}
+        assert event["isBase64Encoded"] is False
+
+        binary = local_server.build_event("POST", "/mcp", {"Content-Encoding": "gzip"}, b"\x1f\x8b")
+        assert binary["isBase64Encoded"] is True
+
+
+class TestLoadGenerator:
+    """Payload sizes, percentiles and a small end-to-end run"""
+
+    def test_payload_sizes(self):
+        assert load_test.parse_size("10k") == 10240
+        assert load_test.parse_size("1m") == 1048576
+        conversation = load_test.make_conversation(5000, seed=3)
+        assert 5000 <= len(conversation) < 5200
+        assert conversation != load_test.make_conversation(5000, seed=4)
+
+    def test_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)]
+        assert load_test.percentile(values, 50) == 0.05
+        assert load_test.percentile(values, 99) == 0.099
+        assert load_test.percentile([], 95) == 0.0
+
+        report = load_test.summarize(values, errors=2, elapsed=2.0, bytes_sent=4_000_000)
+        assert report["requests"] == 102
+        assert report["p95Ms"] == 95.0
+        assert report["uploadMBPerS"] == 2.0
+
+    @pytest.mark.parametrize("route", ["compress", "batch"])
+    def test_scenario_against_local_server(self, server, route):
+        base_url, _ = server
+        row = load_test.run_scenario(base_url, route, size=2048, concurrency=3, requests=6,
+                                     use_gzip=True)
+
+        assert row["requests"] == 6 and row["errors"] == 0
+        assert 0 < row["p50Ms"] <= row["p95Ms"] <= row["p99Ms"] <= row["maxMs"]
+
+    def test_metrics_file_summary(self, server, tmp_path):
+        base_url, _ = server
+        path = tmp_path / "metrics.ndjson"
+        previous = handler.set_log_sink(handler.FileSink(str(path)))
+        try:
+            load_test.run_scenario(base_url, "compress", size=4096, concurrency=2, requests=5)
+        finally:
+            handler.set_log_sink(previous)
+
+        summary = load_test.aggregate_metrics(str(path))
+        compress = summary["compress"]
+        assert compress["TotalMs"]["count"] == 5
+        assert compress["CompressMs"]["p50"] <= compress["CompressMs"]["p99"]
+        assert compress["BytesIn"]["p50"] >= 4096
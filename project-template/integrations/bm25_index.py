@@ -0,0 +1,382 @@
+"""
+BM25Index - 降級模式搜尋的倒排索引
+
+EvoMem 不可用（JSONStorage）時，這是 MemoryHub 的主要搜尋路徑。
+取代「每次查詢讀取全部記憶 + 子字串比對 + 排序全部結果」的 O(N·K) 掃描：
+
+- 倒排索引：詞 → {memory_id: 詞頻}，查詢只走訪含查詢詞的記憶
+- BM25 排序（k1=1.5, b=0.75），標籤詞頻加倍（沿用舊版標籤加權）
+- heapq 取前 k 名，不排序全部結果
+- 增量更新：add() 只追加一行日誌，不需先載入索引
+- 延遲載入 + 持久化：第一次查詢才讀取快照與日誌，並與儲存目錄比對
+  （補建缺少的記憶、移除已刪除的記憶），重啟後不需重建
+- 多行程共用：每次查詢檢查日誌大小與快照，只重播其他行程新追加的日誌行
+
+分詞：中日韓以外的文字（含重音字母、西里爾字母等）以 Unicode 單字為詞；
+中日韓文字以相鄰兩字（bigram）為詞，索引時另存單字詞，單字查詢也能命中。
+
+Version: 1.0.0
+Author: Multi-Expert Team (小米 + 小架 + 小憶)
+Date: 2026-10-18
+"""
+
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+import json
+import math
+import os
+import re
+
+
+INDEX_VERSION = 2  # 分詞規則改變時遞增：舊快照與日誌項目會從儲存重建
+K1 = 1.5
+B = 0.75
+TAG_WEIGHT = 2
+COMPACT_MIN_ENTRIES = 200  # 日誌超過 max(此值, 文件數 10%) 時重寫快照
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"  # 假名、中日韓漢字、韓文
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[^\\W{_CJK}]+")  # 中日韓片段 | 其他 Unicode 單字
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """
+    分詞（索引與查詢共用）
+
+    中日韓片段索引時同時產生 bigram 與單字詞；查詢時只取 bigram
+    （單一字元的片段才用單字詞），多字查詢不會因單字詞而放寬。
+
+    Args:
+        text: 任意文字
+        query: 是否為查詢字串
+
+    Returns:
+        詞列表（小寫 Unicode 單字 + 中日韓 bigram / 單字）
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if not query:
+                tokens.extend(run)
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _strings(value: Any) -> Iterator[str]:
+    """結構中所有字串值（遞迴）"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+def memory_terms(memory: Dict[str, Any]) -> Counter:
+    """
+    記憶的詞頻
+
+    本文取 session_memory.content；handoff 等沒有 content 的結構化記憶
+    則取 session_memory 與 long_term_memory 的所有字串。標籤詞頻 x TAG_WEIGHT。
+
+    Args:
+        memory: UniversalStorage 記憶項目
+
+    Returns:
+        詞 → 詞頻
+    """
+    session = memory.get("session_memory") or {}
+    content = session.get("content") if isinstance(session, dict) else None
+    if not isinstance(content, str):
+        content = memory.get("content")
+    if not isinstance(content, str):
+        content = " ".join(_strings(session)) + " " + " ".join(_strings(memory.get("long_term_memory")))
+
+    terms = Counter(tokenize(content))
+    tags = (memory.get("metadata") or {}).get("tags") or []
+    for tag in tags:
+        if isinstance(tag, str):
+            for token in tokenize(tag):
+                terms[token] += TAG_WEIGHT
+    return terms
+
+
+class BM25Index:
+    """
+    持久化 BM25 倒排索引
+
+    檔案（index_dir 下）：
+    - bm25.json: 快照 {"version", "postings": {詞: {id: 詞頻}}, "lengths": {id: 長度}}
+    - bm25.log: 快照之後的變更，每行 {"op": "add" | "remove", ...}
+
+    多個行程共用同一目錄時，每次查詢先 stat 日誌與快照：日誌變長時
+    只重播新增的行（從上次讀到的位元組位置起）；快照被其他行程重寫
+    （壓縮）或日誌變短時重新載入，被壓縮掉的日誌項目在比對儲存目錄時
+    補建。
+    """
+
+    def __init__(
+        self,
+        index_dir: Path,
+        list_ids: Callable[[], Iterable[str]],
+        load: Callable[[str], Optional[Dict]]
+    ):
+        """
+        建立索引（不讀取任何檔案，第一次查詢時才載入）
+
+        Args:
+            index_dir: 索引目錄
+            list_ids: 列出儲存中所有記憶 id（載入時比對用）
+            load: 依 id 讀取記憶（補建缺少的記憶用）
+        """
+        self.index_dir = Path(index_dir)
+        self.snapshot_path = self.index_dir / "bm25.json"
+        self.journal_path = self.index_dir / "bm25.log"
+        self._list_ids = list_ids
+        self._load = load
+
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lengths: Dict[str, int] = {}
+        self._doc_terms: Dict[str, List[str]] = {}  # id → 詞（反向索引，移除用）
+        self._total_length = 0
+        self._journal_entries = 0
+        self._journal_offset = 0  # 已重播的日誌位元組數
+        self._snapshot_stamp: Optional[Tuple[int, int]] = None
+        self._loaded = False
+
+    # ========== 公開方法 ==========
+
+    def add(self, memory_id: str, memory: Dict[str, Any]) -> None:
+        """
+        增量加入（或取代）一條記憶
+
+        只追加一行日誌；索引已載入時同步更新記憶體中的倒排表。
+
+        Args:
+            memory_id: 記憶 id
+            memory: 記憶項目
+        """
+        terms = memory_terms(memory)
+        entry = {"op": "add", "id": memory_id, "terms": dict(terms), "v": INDEX_VERSION}
+        self._append_journal(entry)
+        if self._loaded:
+            self._apply(entry)
+            if self._journal_entries > max(COMPACT_MIN_ENTRIES, len(self._lengths) // 10):
+                self.compact()
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        BM25 查詢
+
+        Complexity: O(查詢詞的倒排表長度總和 + 命中數 · log k)
+
+        Args:
+            query: 查詢字串
+            k: 返回結果數量
+
+        Returns:
+            [(memory_id, 分數)]，分數由高到低（同分時較新的 id 在前）
+        """
+        self._ensure_loaded()
+        n_docs = len(self._lengths)
+        terms = set(tokenize(query, query=True))
+        if not n_docs or not terms or k <= 0:
+            return []
+
+        avg_length = self._total_length / n_docs or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for memory_id, tf in postings.items():
+                norm = tf + K1 * (1 - B + B * self._lengths[memory_id] / avg_length)
+                scores[memory_id] += idf * tf * (K1 + 1) / norm
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def compact(self) -> None:
+        """把目前索引寫成快照並清空日誌（原子替換）"""
+        if not self._loaded:
+            self._load_index()
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        snapshot = {
+            "version": INDEX_VERSION,
+            "postings": self._postings,
+            "lengths": self._lengths
+        }
+        tmp_path = self.snapshot_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_stamp = self._stamp(self.snapshot_path)
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+        self._journal_entries = 0
+        self._journal_offset = 0
+
+    def __len__(self) -> int:
+        """已索引的記憶數"""
+        self._ensure_loaded()
+        return len(self._lengths)
+
+    # ========== 私有方法：載入 ==========
+
+    def _ensure_loaded(self) -> None:
+        """第一次呼叫時載入；之後只同步其他行程的變更（兩次 stat）"""
+        if not self._loaded:
+            self._load_index()
+            return
+        try:
+            journal_size = self.journal_path.stat().st_size
+        except FileNotFoundError:
+            journal_size = 0
+        if (self._stamp(self.snapshot_path) != self._snapshot_stamp
+                or journal_size < self._journal_offset):
+            # 其他行程壓縮了索引
+            self._reset()
+            self._load_index()
+        elif journal_size > self._journal_offset:
+            self._replay_journal()
+
+    def _load_index(self) -> None:
+        """
+        完整載入：快照 → 重播日誌 → 與儲存比對
+
+        比對只列出 id，不讀取已索引的記憶；有差異時重寫快照。
+        """
+        self._loaded = True
+        self._read_snapshot()
+        self._replay_journal()
+
+        stored = set(self._list_ids())
+        indexed = set(self._lengths)
+        changed = False
+        for memory_id in sorted(stored - indexed):
+            memory = self._load(memory_id)
+            if memory is not None:
+                self._apply({"op": "add", "id": memory_id, "terms": dict(memory_terms(memory))})
+                changed = True
+        for memory_id in indexed - stored:
+            self._apply({"op": "remove", "id": memory_id})
+            changed = True
+
+        if changed or self._journal_entries > max(COMPACT_MIN_ENTRIES, len(self._lengths) // 10):
+            self.compact()
+
+    def _reset(self) -> None:
+        """清空記憶體中的索引（重新載入前）"""
+        self._postings = defaultdict(dict)
+        self._lengths = {}
+        self._doc_terms = {}
+        self._total_length = 0
+        self._journal_entries = 0
+        self._journal_offset = 0
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+        """(inode, mtime_ns)；檔案不存在時為 None"""
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _read_snapshot(self) -> None:
+        """讀取快照（不存在、損壞或版本不符時從空索引開始）"""
+        self._snapshot_stamp = self._stamp(self.snapshot_path)
+        if self._snapshot_stamp is None:
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 搜尋索引快照無法讀取，將重建: {e}")
+            return
+        if snapshot.get("version") != INDEX_VERSION:
+            return
+        self._postings = defaultdict(dict, snapshot.get("postings", {}))
+        self._lengths = snapshot.get("lengths", {})
+        self._total_length = sum(self._lengths.values())
+        doc_terms: Dict[str, List[str]] = defaultdict(list)
+        for term, postings in self._postings.items():
+            for memory_id in postings:
+                doc_terms[memory_id].append(term)
+        self._doc_terms = dict(doc_terms)
+
+    def _replay_journal(self) -> None:
+        """
+        從上次讀到的位置重播日誌
+
+        略過損壞的行與舊版分詞的項目（後者載入時補建）；結尾沒有換行的
+        行可能仍在寫入，留到下次再讀。
+        """
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._journal_offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("op") == "add" and entry.get("v") != INDEX_VERSION:
+                    continue
+                self._apply(entry)
+                self._journal_entries += 1
+
+    # ========== 私有方法：更新 ==========
+
+    def _append_journal(self, entry: Dict[str, Any]) -> None:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        data = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with open(self.journal_path, "ab") as f:
+            f.write(data)
+            end = f.tell()
+        # 緊接在已重播的位置之後（期間沒有其他行程追加）：不必再重播
+        if self._loaded and end - len(data) == self._journal_offset:
+            self._journal_offset = end
+        self._journal_entries += 1
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        """套用一筆變更到記憶體中的倒排表"""
+        memory_id = entry["id"]
+        if memory_id in self._lengths:
+            self._remove(memory_id)
+        if entry["op"] != "add":
+            return
+        terms = entry["terms"]
+        for term, tf in terms.items():
+            self._postings[term][memory_id] = tf
+        self._doc_terms[memory_id] = list(terms)
+        length = sum(terms.values())
+        self._lengths[memory_id] = length
+        self._total_length += length
+
+    def _remove(self, memory_id: str) -> None:
+        """
+        移除一條記憶（取代或已刪除時）
+
+        Complexity: O(該記憶的詞數)（反向索引 _doc_terms）
+        """
+        for term in self._doc_terms.pop(memory_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None and postings.pop(memory_id, None) is not None and not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(memory_id)
+
+
+__all__ = ["BM25Index", "tokenize", "memory_terms"]
@@ -43,7 +43,8 @@ try:
     sys.path.insert(0, str(scripts_dir))
     sys.path.insert(0, str(integrations_dir))
 
-    from compress_context import ContextCompressor, estimate_tokens
+    from compress_context import ContextCompressor, estimate_tokens, iter_lines
+    from near_duplicate import NearDuplicateFilter
     from context7_integration import enhance_with_context7
     from exa_integration import enhance_with_exa
 
@@ -60,6 +61,51 @@ except ImportError as e:
     DEPENDENCIES_AVAILABLE = False
 
 
+# Keyword groups for decision / learning extraction (matched on lowercased text)
+DECISION_KEYWORDS = {
+    "decision": ['decision:', 'decided to', '選擇'],
+    "rationale": ['rationale:', '理由', '因為'],
+}
+
+LEARNING_KEYWORDS = {
+    "solution": ['fixed', 'resolved', 'solved', '修復'],
+    "optimization": ['optimized', 'improved', '優化'],
+    "implementation": ['implemented', 'created', '實作', '創建'],
+}
+
+# Keyword matching does not depend on the optional enhancement modules above:
+# imported on its own so decisions / learnings are extracted without them
+try:
+    from keyword_matcher import KeywordMatcher
+except ImportError:
+    KeywordMatcher = None
+
+
+class _SubstringMatcher:
+    """Fallback for KeywordMatcher: one lowercased substring check per keyword"""
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.groups = groups
+
+    def scan(self, line: str) -> Dict[str, set]:
+        lowered = line.lower()
+        result = {}
+        for name, keywords in self.groups.items():
+            found = {kw for kw in keywords if kw in lowered}
+            if found:
+                result[name] = found
+        return result
+
+
+# Compiled once at import (shared layer: scripts/keyword_matcher.py)
+if KeywordMatcher is not None:
+    DECISION_MATCHER = KeywordMatcher(DECISION_KEYWORDS, ignore_case_groups=DECISION_KEYWORDS)
+    LEARNING_MATCHER = KeywordMatcher(LEARNING_KEYWORDS, ignore_case_groups=LEARNING_KEYWORDS)
+else:
+    DECISION_MATCHER = _SubstringMatcher(DECISION_KEYWORDS)
+    LEARNING_MATCHER = _SubstringMatcher(LEARNING_KEYWORDS)
+
+
 # ============================================================
 # Trigger Detection (Step 1)
 # ============================================================
@@ -166,8 +212,14 @@ class InformationExtractor:
     - Learnings (學習與洞察)
     """
 
-    def __init__(self):
-        self.compressor = ContextCompressor()
+    def __init__(self, dedup_threshold: Optional[float] = None):
+        """
+        Args:
+            dedup_threshold: 近似重複過濾的 SimHash 相似度 (0-1, 例如 0.85);
+                             None 表示只去除完全相同的項目
+        """
+        self.dedup_threshold = dedup_threshold
+        self.compressor = ContextCompressor(dedup_threshold)
 
     def extract(self, conversation: str, todos: List[Dict]) -> Dict:
         """
@@ -205,16 +257,14 @@ class InformationExtractor:
         decisions = []
 
         # Simple extraction (可增強為 LLM-based)
-        keywords = ['decision:', 'decided to', '選擇', 'rationale:', '理由']
-
-        lines = conversation.split('\n')
         current_decision = None
 
-        for line in lines:
-            line_lower = line.lower()
+        for line in iter_lines(conversation):
+            line = line.rstrip('\n')
+            hits = DECISION_MATCHER.scan(line)
 
             # Check for decision start
-            if any(kw in line_lower for kw in ['decision:', 'decided to', '選擇']):
+            if 'decision' in hits:
                 if current_decision:
                     decisions.append(current_decision)
 
@@ -225,7 +275,7 @@ class InformationExtractor:
                 }
 
             # Check for rationale
-            elif current_decision and any(kw in line_lower for kw in ['rationale:', '理由', '因為']):
+            elif current_decision and 'rationale' in hits:
                 current_decision["rationale"] = line.strip()
 
         # Add last decision
@@ -274,19 +324,19 @@ class InformationExtractor:
         尋找模式:
         - "Fixed", "Optimized" → 解決方案
         - "Implemented", "Created" → 新功能
+        - 設定 dedup_threshold 時略過近似重複的動作
         """
         learnings = []
-
-        # Keywords indicating learnings
-        solution_keywords = ['fixed', 'resolved', 'solved', '修復']
-        optimization_keywords = ['optimized', 'improved', '優化']
-        implementation_keywords = ['implemented', 'created', '實作', '創建']
+        dedup = NearDuplicateFilter(self.dedup_threshold) if self.dedup_threshold is not None else None
 
         for action in play_by_play:
-            action_lower = action.lower()
+            if dedup is not None and dedup.is_duplicate(action):
+                continue
+
+            hits = LEARNING_MATCHER.scan(action)
 
             # Solution learning
-            if any(kw in action_lower for kw in solution_keywords):
+            if 'solution' in hits:
                 learnings.append({
                     "pattern": action,
                     "type": "solution",
@@ -294,7 +344,7 @@ class InformationExtractor:
                 })
 
             # Optimization learning
-            elif any(kw in action_lower for kw in optimization_keywords):
+            elif 'optimization' in hits:
                 learnings.append({
                     "pattern": action,
                     "type": "optimization",
@@ -302,7 +352,7 @@ class InformationExtractor:
                 })
 
             # Implementation learning
-            elif any(kw in action_lower for kw in implementation_keywords):
+            elif 'implementation' in hits:
                 learnings.append({
                     "pattern": action,
                     "type": "implementation",
@@ -469,7 +519,7 @@ class MemoryStorage:
         return self.backend.search(query, **kwargs)
 
     @property
-    def capability(self) -> StorageCapability:
+    def capability(self) -> "StorageCapability":
         """
         取得當前存儲後端的能力等級
 
@@ -646,16 +696,18 @@ class MemoryHandoffOrchestrator:
 
     def __init__(self,
                  storage_dir: str = "data/memory",
-                 output_dir: str = "."):
+                 output_dir: str = ".",
+                 dedup_threshold: Optional[float] = None):
         """
         Initialize orchestrator
 
         Args:
             storage_dir: 記憶存儲目錄
             output_dir: 文檔輸出目錄
+            dedup_threshold: 近似重複過濾的相似度 (None 表示關閉)
         """
         self.trigger = MemoryHandoffTrigger()
-        self.extractor = InformationExtractor()
+        self.extractor = InformationExtractor(dedup_threshold)
         self.enhancer = ContextEnhancer()
         self.storage = MemoryStorage(storage_dir)
         self.documenter = HandoffDocumenter()
@@ -14,6 +14,7 @@ from enum import Enum
 import time
 import json
 from datetime import datetime
+from pathlib import Path
 
 try:
     from universal_memory_storage import (
@@ -28,6 +29,11 @@ except ImportError:
     StorageCapability = None
     MemoryStorageInterface = None
 
+try:
+    from bm25_index import BM25Index
+except ImportError:
+    BM25Index = None
+
 
 class MemoryHub:
     """
@@ -74,6 +80,9 @@ class MemoryHub:
         self._query_cache: Dict[str, List[Dict]] = {}
         self._cache_max_size = 100
 
+        # 降級模式搜尋索引（JSONStorage 才有；第一次使用時建立，見 _get_search_index）
+        self._search_index = None
+
         print(f"✅ MemoryHub 初始化完成")
         print(f"   儲存能力: {self.capability.value}")
         print(f"   後端類型: {type(self.storage).__name__}")
@@ -126,7 +135,7 @@ class MemoryHub:
             return cache_result
 
         # 執行搜尋
-        raw_results = self._execute_search(query, n_results)
+        raw_results = self._execute_search(query, n_results, agent_type, project)
 
         # 應用過濾
         filtered = self._apply_filters(raw_results, agent_type, project, n_results)
@@ -422,9 +431,9 @@ class MemoryHub:
 
     def _store_memory(self, memory_item: Dict, content: str) -> bool:
         """
-        儲存記憶並清除快取
+        儲存記憶、清除快取並更新降級模式索引
 
-        Complexity: C = 1 (try-except)
+        Complexity: C = 2 (try-except + 索引更新)
 
         Args:
             memory_item: 記憶項目
@@ -434,17 +443,25 @@ class MemoryHub:
             是否成功
         """
         try:
-            self.storage.store(memory_item)
+            memory_id = self.storage.store(memory_item)
             print(f"✅ 記憶已添加: {content[:50]}...")
 
             # 清除快取（新記憶可能影響查詢結果）
             self._query_cache.clear()
-
-            return True
         except Exception as e:
             print(f"❌ 添加記憶失敗: {e}")
             return False
 
+        # 增量更新降級模式索引（失敗時下次載入索引會比對儲存目錄補建）
+        index = self._get_search_index()
+        if index is not None:
+            try:
+                index.add(memory_id, memory_item)
+            except Exception as e:
+                print(f"⚠️ 搜尋索引更新失敗: {e}")
+
+        return True
+
     # ========== 私有方法：查詢相關 ==========
 
     def _check_cache(
@@ -475,7 +492,13 @@ class MemoryHub:
             return self._query_cache[cache_key]
         return None
 
-    def _execute_search(self, query: str, n_results: int) -> List[Dict]:
+    def _execute_search(
+        self,
+        query: str,
+        n_results: int,
+        agent_type: Optional[str] = None,
+        project: Optional[str] = None
+    ) -> List[Dict]:
         """
         執行語義搜尋或降級模式的基礎搜尋（P1 增強）
 
@@ -484,6 +507,8 @@ class MemoryHub:
         Args:
             query: 查詢字串
             n_results: 結果數量
+            agent_type: 專家類型過濾（降級模式在排序迴圈內套用）
+            project: 專案過濾（降級模式在排序迴圈內套用）
 
         Returns:
             搜尋結果列表
@@ -491,7 +516,7 @@ class MemoryHub:
         # 檢查儲存能力（C += 1）
         if self.capability != StorageCapability.FULL:
             print("⚠️ EvoMem 不可用，使用降級模式（基礎關鍵字匹配）")
-            return self._degraded_mode_search(query, n_results)
+            return self._degraded_mode_search(query, n_results, agent_type, project)
 
         # 語義搜尋（查詢 2x 結果以便過濾）（C += 1 for try-except）
         try:
@@ -672,63 +697,116 @@ class MemoryHub:
         if n_results > 100:
             raise ValueError(f"n_results 不能超過 100，目前值: {n_results}")
 
-    def _degraded_mode_search(self, query: str, n_results: int) -> List[Dict]:
+    def _get_search_index(self):
+        """
+        降級模式搜尋索引（延遲建立）
+
+        索引存放於 JSONStorage 目錄下的 .index/；其他後端沒有檔案目錄，
+        返回 None。
+
+        Returns:
+            BM25Index 或 None
+        """
+        if self._search_index is None:
+            storage_dir = getattr(self.storage, "storage_dir", None)
+            if BM25Index is None or storage_dir is None:
+                return None
+            storage_dir = Path(storage_dir)
+            self._search_index = BM25Index(
+                storage_dir / ".index",
+                list_ids=lambda: [path.stem for path in storage_dir.glob("*.json")],
+                load=self.storage.retrieve
+            )
+        return self._search_index
+
+    def _degraded_mode_search(
+        self,
+        query: str,
+        n_results: int,
+        agent_type: Optional[str] = None,
+        project: Optional[str] = None
+    ) -> List[Dict]:
         """
-        降級模式搜尋：使用基礎關鍵字匹配（P1 增強）
+        降級模式搜尋：BM25 倒排索引（P1 增強）
 
-        當 EvoMem 不可用時，透過關鍵字匹配提供基本搜尋能力。
+        當 EvoMem 不可用時的主要搜尋路徑。只走訪含查詢詞的記憶，
+        以 heapq 取前 2 x n_results 名（與語義搜尋相同）後才依序讀取；
+        過濾在讀取迴圈內套用，通過過濾的結果不足 n_results 且還有
+        其他命中時，加倍候選數再取。
 
-        Complexity: C = 2.5
+        Complexity: C = 5
 
         Args:
             query: 查詢字串
             n_results: 返回結果數量
+            agent_type: 專家類型過濾
+            project: 專案過濾
 
         Returns:
-            匹配的記憶列表
+            通過過濾的記憶列表（BM25 分數由高到低，最多 n_results 條）
         """
-        # 從 JSON 儲存中獲取所有記憶
-        try:
-            all_memories = self.storage.list()
-        except Exception as e:
-            print(f"❌ 讀取記憶失敗: {e}")
+        index = self._get_search_index()
+        if index is None:
+            print("❌ 儲存後端不支援降級模式搜尋")
             return []
 
-        # 提取查詢關鍵字（轉為小寫）
-        keywords = query.lower().split()
-
-        # 為每個記憶計算關鍵字匹配分數
-        scored_memories = []
-        for memory in all_memories:
-            content = memory.get("content", "").lower()
-            metadata = memory.get("metadata", {})
-            tags = metadata.get("tags", [])
-
-            # 計算匹配分數
-            score = 0
-
-            # Content 匹配（每個匹配的關鍵字 +1）
-            for keyword in keywords:
-                if keyword in content:
-                    score += 1
+        results = []
+        seen = 0
+        k = n_results * 2
+        while len(results) < n_results:
+            try:
+                ranked = index.search(query, k)
+            except Exception as e:
+                print(f"❌ 讀取搜尋索引失敗: {e}")
+                return []
+
+            # 只讀取新進入前 k 名的記憶（期間被刪除的記憶略過）
+            for memory_id, score in ranked[seen:]:
+                memory_item = self.storage.retrieve(memory_id)
+                if memory_item is None:
+                    continue
+                kept = [self._to_search_result(memory_item, score)]
+                if agent_type:
+                    kept = self._filter_by_agent(kept, agent_type)
+                if project:
+                    kept = self._filter_by_project(kept, project)
+                results.extend(kept)
+                if len(results) >= n_results:
+                    break
+
+            if len(ranked) < k:
+                break  # 所有命中都已讀取
+            seen, k = len(ranked), k * 2
+
+        print(f"📊 降級模式找到 {len(results)}/{len(index)} 條匹配記憶")
+        return results
 
-            # Tags 匹配（精確匹配 +2）
-            for tag in tags:
-                if tag.lower() in keywords:
-                    score += 2
+    def _to_search_result(self, memory_item: Dict, score: float) -> Dict:
+        """
+        儲存項目 → 查詢結果格式（content + 完整 metadata，與語義搜尋結果一致）
 
-            # 只保留有匹配的記憶
-            if score > 0:
-                scored_memories.append((score, memory))
+        Args:
+            memory_item: UniversalStorage 記憶項目
+            score: BM25 分數
 
-        # 按分數排序（降序）
-        scored_memories.sort(key=lambda x: x[0], reverse=True)
+        Returns:
+            查詢結果（過濾、品質評分可直接使用）
+        """
+        session = memory_item.get("session_memory") or {}
+        content = session.get("content")
+        if not isinstance(content, str):
+            content = json.dumps(session, ensure_ascii=False)
 
-        # 返回前 n_results 條
-        results = [memory for score, memory in scored_memories[:n_results]]
+        metadata = {**memory_item.get("metadata", {}), **session.get("metadata", {})}
+        metadata.setdefault("type", memory_item.get("type"))
+        metadata.setdefault("timestamp", memory_item.get("timestamp"))
 
-        print(f"📊 降級模式找到 {len(results)}/{len(all_memories)} 條匹配記憶")
-        return results
+        return {
+            "id": memory_item.get("id"),
+            "content": content,
+            "metadata": metadata,
+            "score": round(score, 4)
+        }
 
 
 # ========== 向後相容別名 ==========
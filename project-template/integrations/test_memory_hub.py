@@ -30,6 +30,17 @@ def memory_hub():
     return MemoryHub()
 
 
+@pytest.fixture
+def json_hub(tmp_path):
+    """提供使用獨立 JSONStorage 的 MemoryHub（降級模式）"""
+    from universal_memory_storage import JSONStorage
+
+    hub = MemoryHub()
+    hub.storage = JSONStorage(str(tmp_path))
+    hub.capability = hub.storage.capability
+    return hub
+
+
 @pytest.fixture
 def sample_memory():
     """提供樣本記憶"""
@@ -485,18 +496,175 @@ class TestPerformance:
 class TestErrorHandling:
     """錯誤處理測試"""
 
-    def test_degraded_mode_handling(self, memory_hub):
+    def test_degraded_mode_handling(self, json_hub):
         """測試降級模式處理"""
         from universal_memory_storage import StorageCapability
 
         # 模擬降級模式
-        with mock.patch.object(memory_hub, 'capability', StorageCapability.BASIC):
-            results = memory_hub.intelligent_query("測試", n_results=5)
+        with mock.patch.object(json_hub, 'capability', StorageCapability.BASIC):
+            results = json_hub.intelligent_query("測試", n_results=5)
 
-            # 降級模式應返回空列表
+            # 空儲存的降級模式應返回空列表
             assert results == []
 
 
+# ========== 降級模式搜尋（BM25 倒排索引）==========
+
+class TestDegradedModeSearch:
+    """降級模式 BM25 索引測試"""
+
+    def _add(self, hub, content, **kwargs):
+        # 記憶 id 來自時間戳，間隔避免同一微秒
+        time.sleep(0.001)
+        assert hub.add_memory(content=content, **kwargs) is True
+
+    def test_bm25_ranking_and_filters(self, json_hub):
+        """測試 BM25 排序與過濾"""
+        self._add(json_hub, "pytest fixture 可提高測試複用性", expert="xiaocheng", tags=["pytest"])
+        self._add(json_hub, "API 設計決策：使用 REST", expert="xiaojia", memory_type="decision")
+        self._add(json_hub, "pytest 參數化測試 pytest.mark.parametrize", expert="xiaocheng")
+
+        results = json_hub.intelligent_query("pytest", n_results=5)
+        assert len(results) == 2
+        assert results[0]["score"] >= results[1]["score"] > 0
+        assert all("pytest" in r["content"] for r in results)
+
+        # 結果帶完整 metadata：可過濾、可評分
+        decision = json_hub.intelligent_query("REST 設計", agent_type="xiaojia", n_results=5)
+        assert [r["metadata"]["type"] for r in decision] == ["decision"]
+        assert "timestamp" in decision[0]["metadata"]
+        assert json_hub.intelligent_query("REST", agent_type="xiaocheng", n_results=5) == []
+
+    def test_filters_apply_before_top_k(self, json_hub):
+        """測試過濾在排序迴圈內套用（較高分但被過濾的記憶不佔名額）"""
+        for i in range(6):
+            self._add(json_hub, "deploy deploy deploy 流程 " + str(i), expert="xiaojia")
+        self._add(json_hub, "deploy 檢查清單", expert="xiaocheng")
+
+        results = json_hub.intelligent_query("deploy", agent_type="xiaocheng", n_results=1)
+        assert [r["content"] for r in results] == ["deploy 檢查清單"]
+
+    def test_chinese_bigram_match(self, json_hub):
+        """測試中文查詢（bigram 分詞）"""
+        self._add(json_hub, "資料庫連線池設定過小導致逾時")
+        self._add(json_hub, "前端元件拆分原則")
+
+        results = json_hub.intelligent_query("連線池逾時", n_results=5)
+        assert [r["content"] for r in results] == ["資料庫連線池設定過小導致逾時"]
+
+    def test_non_latin_and_single_character_queries(self, json_hub):
+        """測試西里爾字母、重音字母與單一中文字查詢"""
+        self._add(json_hub, "Кэш сбрасывается после деплоя")
+        self._add(json_hub, "Le café résumé des décisions")
+        self._add(json_hub, "資料庫連線池設定過小導致逾時")
+
+        assert [r["content"] for r in json_hub.intelligent_query("кэш", n_results=5)] == \
+            ["Кэш сбрасывается после деплоя"]
+        assert [r["content"] for r in json_hub.intelligent_query("résumé", n_results=5)] == \
+            ["Le café résumé des décisions"]
+        assert [r["content"] for r in json_hub.intelligent_query("池", n_results=5)] == \
+            ["資料庫連線池設定過小導致逾時"]
+
+    def test_top_k_uses_heap_not_full_sort(self, json_hub):
+        """測試只讀取前 k 名記憶"""
+        for i in range(12):
+            self._add(json_hub, f"cache 策略 {i} " + "cache " * (i % 3))
+
+        with mock.patch.object(json_hub.storage, "retrieve", wraps=json_hub.storage.retrieve) as retrieve:
+            results = json_hub.intelligent_query("cache", n_results=3)
+
+        assert len(results) == 3
+        assert retrieve.call_count == 3
+
+    def test_index_survives_restart(self, json_hub, tmp_path):
+        """測試索引持久化與延遲載入"""
+        from universal_memory_storage import JSONStorage
+
+        self._add(json_hub, "Lambda 冷啟動優化：延遲載入 boto3")
+        json_hub.intelligent_query("boto3", n_results=1)
+        self._add(json_hub, "S3 批次寫入降低延遲")  # 追加到日誌
+        assert len((tmp_path / ".index" / "bm25.log").read_text(encoding="utf-8").splitlines()) == 2
+
+        restarted = MemoryHub()
+        restarted.storage = JSONStorage(str(tmp_path))
+        restarted.capability = restarted.storage.capability
+
+        # 重啟後不重新讀取已索引的記憶
+        with mock.patch.object(restarted.storage, "retrieve", wraps=restarted.storage.retrieve) as retrieve:
+            results = restarted.intelligent_query("延遲", n_results=5)
+        assert len(results) == 2
+        assert retrieve.call_count == 2
+
+    def test_index_rebuilds_from_storage(self, json_hub, tmp_path):
+        """測試索引與儲存目錄比對（新增檔案、刪除檔案、索引遺失）"""
+        self._add(json_hub, "舊記憶：Redis 快取失效")
+        json_hub.intelligent_query("redis", n_results=1)
+
+        # 其他行程直接寫入的記憶、被刪除的記憶
+        other = json_hub._build_memory_item("外部寫入：Redis 叢集", {"timestamp": "2025-01-01T00:00:00"})
+        json_hub.storage.store(other)
+        for path in tmp_path.glob("*.json"):
+            if "20250101" not in path.name:
+                path.unlink()
+
+        json_hub._search_index = None
+        results = json_hub.intelligent_query("redis 叢集", n_results=5)
+        assert [r["content"] for r in results] == ["外部寫入：Redis 叢集"]
+
+        # 索引檔遺失時從儲存重建
+        for path in (tmp_path / ".index").iterdir():
+            path.unlink()
+        json_hub._search_index = None
+        json_hub.clear_cache()
+        assert len(json_hub.intelligent_query("redis", n_results=5)) == 1
+
+    def test_journal_compaction(self, tmp_path):
+        """測試日誌壓縮為快照、略過不完整的日誌行"""
+        import bm25_index
+        from bm25_index import BM25Index
+
+        memories = {}
+        index = BM25Index(tmp_path / ".index", list_ids=lambda: list(memories), load=memories.get)
+        with mock.patch.object(bm25_index, "COMPACT_MIN_ENTRIES", 3):
+            assert len(index) == 0
+            for i in range(5):
+                memories[f"m{i}"] = {"session_memory": {"content": f"第 {i} 條 queue 記憶"}}
+                index.add(f"m{i}", memories[f"m{i}"])
+
+        assert (tmp_path / ".index" / "bm25.json").exists()
+        with open(tmp_path / ".index" / "bm25.log", "a", encoding="utf-8") as f:
+            f.write('{"op": "add", "id": "m9"')  # 寫入中斷
+
+        reloaded = BM25Index(tmp_path / ".index", list_ids=lambda: list(memories), load=memories.get)
+        assert len(reloaded) == 5
+        assert [memory_id for memory_id, _ in reloaded.search("queue", 2)] == ["m4", "m3"]
+
+
+    def test_shared_index_directory(self, tmp_path):
+        """測試多個行程共用索引目錄：查詢時重播新日誌行、壓縮後重新載入"""
+        from bm25_index import BM25Index
+
+        memories = {"m0": {"session_memory": {"content": "queue 記憶"}}}
+        first = BM25Index(tmp_path / ".index", list_ids=lambda: list(memories), load=memories.get)
+        second = BM25Index(tmp_path / ".index", list_ids=lambda: list(memories), load=memories.get)
+        assert [memory_id for memory_id, _ in first.search("queue", 5)] == ["m0"]
+
+        # 另一個行程新增與取代記憶
+        memories["m1"] = {"session_memory": {"content": "queue 重試"}}
+        second.add("m1", memories["m1"])
+        memories["m0"] = {"session_memory": {"content": "cache 記憶"}}
+        second.add("m0", memories["m0"])
+        assert [memory_id for memory_id, _ in first.search("queue", 5)] == ["m1"]
+        assert [memory_id for memory_id, _ in first.search("cache", 5)] == ["m0"]
+        assert "m0" not in first._postings.get("queue", {})
+
+        # 另一個行程壓縮索引後再追加
+        second.compact()
+        memories["m2"] = {"session_memory": {"content": "queue 監控"}}
+        second.add("m2", memories["m2"])
+        assert [memory_id for memory_id, _ in first.search("queue", 5)] == ["m2", "m1"]
+
+
 # ========== 執行測試 ==========
 
 if __name__ == "__main__":
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Compression Benchmark Suite
+
+Purpose: Measure the compress_context.py hot path on synthetic transcripts
+(1 MB - 1 GB) built from data/tests/*_conversation.txt, and catch
+regressions against a saved baseline.
+
+Measures (per transcript size):
+  - End-to-end file compression: throughput, peak RSS, compression rate
+  - Each extractor alone: throughput
+  - estimate_tokens latency: one line, 4 KB and 1 MB blocks (uncached),
+    plus a cached lookup
+
+Usage:
+  python benchmark_compression.py run --output baseline.json
+  python benchmark_compression.py run --sizes 1MB,10MB,100MB,1GB --output baseline.json
+  python benchmark_compression.py run --output current.json --baseline baseline.json
+  python benchmark_compression.py compare baseline.json current.json --threshold 0.10
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from compress_context import (
+    ArtifactExtractor,
+    BreadcrumbExtractor,
+    ContextCompressor,
+    PlayByPlayExtractor,
+    SessionIntentExtractor,
+    _compress_path,
+)
+from token_estimator import get_estimator
+from transcript_reader import iter_file_lines
+
+# Peak memory via getrusage (not available on Windows)
+try:
+    import resource
+
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    resource = None
+    RESOURCE_AVAILABLE = False
+
+
+BENCHMARK_VERSION = 1
+FIXTURES_DIR = Path(__file__).parent.parent.parent / "data" / "tests"
+DEFAULT_SIZES = "1MB,10MB,100MB"
+DEFAULT_THRESHOLD = 0.10
+
+# Compression rate is deterministic: any drift beyond this is flagged
+RATE_TOLERANCE = 0.005
+
+# Timings shorter than this are too noisy to compare (saturated extractors)
+MIN_COMPARED_SECONDS = 0.05
+
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+EXTRACTORS: Dict[str, Callable[[ContextCompressor], object]] = {
+    "sessionIntent": lambda c: SessionIntentExtractor(c.stop_words),
+    "playByPlay": lambda c: PlayByPlayExtractor(),
+    "artifacts": lambda c: ArtifactExtractor(),
+    "breadcrumbs": lambda c: BreadcrumbExtractor(),
+}
+
+# Metrics compared by `compare`: (section, metric, higher_is_better)
+COMPARED_METRICS = [
+    ("endToEnd", "mbPerSecond", True),
+    ("endToEnd", "peakRssMB", False),
+    ("extractors", "mbPerSecond", True),
+    ("estimateTokens", None, False),
+]
+
+
+# ============================================================
+# Synthetic transcripts
+# ============================================================
+def parse_size(text: str) -> int:
+    """'10MB' -> bytes (KB/MB/GB, binary units)"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]B)\s*', text.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text!r} (expected e.g. 512KB, 10MB, 1GB)")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def load_fixtures(fixtures_dir: Path = FIXTURES_DIR) -> List[str]:
+    """Fixture transcripts used as generator templates"""
+    fixtures = [p.read_text(encoding="utf-8") for p in sorted(fixtures_dir.glob("*_conversation.txt"))]
+    if not fixtures:
+        raise FileNotFoundError(f"No *_conversation.txt fixtures in {fixtures_dir}")
+    return fixtures
+
+
+def _vary(template: str, copy: int) -> str:
+    """Rename paths and identifiers so copies are not exact duplicates"""
+    template = re.sub(r'(\w+)(\.(?:py|js|ts|md|json|yaml))\b', rf'\g<1>_{copy}\g<2>', template)
+    return re.sub(r'\b(def|class|function|const) (\w+)', rf'\g<1> \g<2>_{copy}', template)
+
+
+def generate_transcript(path: Path, size: int, fixtures: Optional[List[str]] = None) -> Path:
+    """
+    Write a synthetic transcript of at least `size` bytes (streamed to disk)
+
+    Fixtures are concatenated round-robin with per-copy renamed paths and
+    identifiers. Existing files of the right size are reused.
+    """
+    if path.exists() and path.stat().st_size >= size:
+        return path
+
+    fixtures = fixtures or load_fixtures()
+    written = 0
+    copy = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        while written < size:
+            text = _vary(fixtures[copy % len(fixtures)], copy)
+            if not text.endswith("\n"):
+                text += "\n"
+            f.write(text)
+            written += len(text.encode("utf-8"))
+            copy += 1
+    return path
+
+
+# ============================================================
+# Measurements
+# ============================================================
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process (MB)"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
+
+
+def _best_of(repeat: int, func: Callable[[], object]) -> Tuple[float, object]:
+    """Best wall time of `repeat` runs, with the last result"""
+    best = float("inf")
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def measure_end_to_end(path: str, repeat: int = 1) -> Dict:
+    """compress_file's input path + compressor on one transcript"""
+    size = os.path.getsize(path)
+    rss_before = _peak_rss_mb()
+    seconds, compressed = _best_of(repeat, lambda: _compress_path(ContextCompressor(), path))
+    rss_after = _peak_rss_mb()
+    metadata = compressed["compressionMetadata"]
+
+    return {
+        "seconds": seconds,
+        "mbPerSecond": size / 1e6 / seconds if seconds > 0 else 0.0,
+        "peakRssMB": rss_after,
+        "rssGrowthMB": rss_after - rss_before if rss_before is not None else None,
+        "compressionRate": metadata["compressionRate"],
+        "originalTokens": metadata["originalTokens"],
+        "compressedTokens": metadata["compressedTokens"],
+    }
+
+
+def measure_extractors(path: str, repeat: int = 1) -> Dict[str, Dict]:
+    """Each extractor alone over the transcript (stops when it saturates)"""
+    size = os.path.getsize(path)
+    results = {}
+    for name, factory in EXTRACTORS.items():
+        def run():
+            compressor = ContextCompressor()
+            compressor._feed_lines([factory(compressor)], iter_file_lines(path))
+
+        seconds, _ = _best_of(repeat, run)
+        results[name] = {
+            "seconds": seconds,
+            "mbPerSecond": size / 1e6 / seconds if seconds > 0 else 0.0,
+        }
+    return results
+
+
+def measure_estimate_tokens(path: str, calls: int = 200) -> Dict[str, float]:
+    """estimate_tokens latency in microseconds (median of `calls`)"""
+    with open(path, "r", encoding="utf-8") as f:
+        block = f.read(1024 ** 2)
+    line = max(block[:20000].splitlines(), key=len)
+    samples = {"lineUs": line, "block4kbUs": block[:4096], "block1mbUs": block}
+
+    estimator = get_estimator()
+    results = {}
+    for name, text in samples.items():
+        n = max(3, calls // 50) if len(text) > 100000 else calls
+        timings = []
+        for _ in range(n):
+            start = time.perf_counter()
+            estimator.backend.count(text)  # bypass the LRU: cold cost
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results[name] = timings[len(timings) // 2] * 1e6
+
+    estimator.estimate(block[:4096])
+    start = time.perf_counter()
+    for _ in range(calls):
+        estimator.estimate(block[:4096])
+    results["cachedUs"] = (time.perf_counter() - start) / calls * 1e6
+    return results
+
+
+def _measure_size(path: str, repeat: int) -> Dict:
+    """All measurements of one transcript (run in a fresh process for RSS)"""
+    return {
+        "bytes": os.path.getsize(path),
+        "endToEnd": measure_end_to_end(path, repeat),
+        "extractors": measure_extractors(path, repeat),
+        "estimateTokens": measure_estimate_tokens(path),
+    }
+
+
+def run_benchmark(sizes: List[str], work_dir: Optional[str] = None,
+                  repeat: int = 1, isolate: bool = True) -> Dict:
+    """
+    Benchmark every size and return a results document
+
+    Args:
+        sizes: Transcript sizes, e.g. ["1MB", "10MB"]
+        work_dir: Where synthetic transcripts are generated (and reused)
+        repeat: Best-of-N timing runs
+        isolate: Measure each size in a fresh process (accurate peak RSS)
+    """
+    work = Path(work_dir or Path(tempfile.gettempdir()) / "compress-benchmark")
+    work.mkdir(parents=True, exist_ok=True)
+    fixtures = load_fixtures()
+
+    results = {}
+    for label in sizes:
+        size = parse_size(label)
+        path = generate_transcript(work / f"synthetic_{label.upper()}.txt", size, fixtures)
+        print(f"[INFO] Benchmarking {label} ({path.stat().st_size / 1e6:.1f} MB)...")
+
+        if isolate:
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(1) as pool:
+                results[label.upper()] = pool.apply(_measure_size, (str(path), repeat))
+        else:
+            results[label.upper()] = _measure_size(str(path), repeat)
+
+    return {
+        "version": BENCHMARK_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tokenBackend": get_estimator().backend.name,
+        "results": results,
+    }
+
+
+# ============================================================
+# Regression comparison
+# ============================================================
+def _metric_pairs(baseline: Dict, current: Dict):
+    """Yield (name, baseline_value, current_value, higher_is_better)"""
+    for label, base in baseline["results"].items():
+        cur = current["results"].get(label)
+        if cur is None:
+            continue
+        for section, metric, higher_is_better in COMPARED_METRICS:
+            base_section, cur_section = base.get(section, {}), cur.get(section, {})
+            if section == "extractors":
+                for name in base_section:
+                    if name in cur_section and base_section[name]["seconds"] >= MIN_COMPARED_SECONDS:
+                        yield (f"{label} {section}.{name}.{metric}",
+                               base_section[name][metric], cur_section[name][metric],
+                               higher_is_better)
+            elif metric is None:
+                for name in base_section:
+                    if name in cur_section:
+                        yield (f"{label} {section}.{name}", base_section[name],
+                               cur_section[name], higher_is_better)
+            else:
+                yield (f"{label} {section}.{metric}", base_section.get(metric),
+                       cur_section.get(metric), higher_is_better)
+
+
+def compare_results(baseline: Dict, current: Dict,
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Compare two results documents
+
+    Returns:
+        Regressions: [{"metric", "baseline", "current", "change"}]. A metric
+        regresses when it is worse by more than `threshold` (relative);
+        compression rates are flagged on any change beyond RATE_TOLERANCE.
+    """
+    regressions = []
+    for name, base, cur, higher_is_better in _metric_pairs(baseline, current):
+        if base is None or cur is None or base == 0:
+            continue
+        change = (cur - base) / base
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            regressions.append({"metric": name, "baseline": base, "current": cur, "change": change})
+
+    for label, base in baseline["results"].items():
+        cur = current["results"].get(label)
+        if cur is None:
+            continue
+        base_rate = base["endToEnd"]["compressionRate"]
+        cur_rate = cur["endToEnd"]["compressionRate"]
+        if abs(cur_rate - base_rate) > RATE_TOLERANCE:
+            regressions.append({"metric": f"{label} endToEnd.compressionRate",
+                                "baseline": base_rate, "current": cur_rate,
+                                "change": cur_rate - base_rate})
+    return regressions
+
+
+def print_results(document: Dict) -> None:
+    """Human-readable summary of a results document"""
+    for label, result in document["results"].items():
+        e2e = result["endToEnd"]
+        rss = f"{e2e['peakRssMB']:.0f} MB" if e2e["peakRssMB"] is not None else "n/a"
+        print(f"[OK] {label}: {e2e['mbPerSecond']:.2f} MB/s, peak RSS {rss}, "
+              f"compression rate {e2e['compressionRate']:.1%}")
+        for name, extractor in result["extractors"].items():
+            print(f"   {name:14s} {extractor['mbPerSecond']:10.2f} MB/s")
+        latency = result["estimateTokens"]
+        print(f"   estimate_tokens: line {latency['lineUs']:.1f}us, 4KB {latency['block4kbUs']:.1f}us, "
+              f"1MB {latency['block1mbUs'] / 1000:.2f}ms, cached {latency['cachedUs']:.2f}us")
+
+
+def print_regressions(regressions: List[Dict], threshold: float) -> None:
+    """Print the comparison verdict"""
+    if not regressions:
+        print(f"[OK] No regressions (threshold {threshold:.0%})")
+        return
+    print(f"[ERROR] {len(regressions)} regression(s) (threshold {threshold:.0%}):")
+    for r in regressions:
+        print(f"   {r['metric']}: {r['baseline']:.4g} -> {r['current']:.4g} ({r['change']:+.1%})")
+
+
+def _load(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("version") != BENCHMARK_VERSION:
+        raise ValueError(f"{path}: unsupported benchmark version {document.get('version')!r}")
+    return document
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark compress_context.py on synthetic transcripts",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Record a baseline (1 MB, 10 MB, 100 MB)
+  python benchmark_compression.py run --output baseline.json
+
+  # Include the 1 GB transcript
+  python benchmark_compression.py run --sizes 1MB,10MB,100MB,1GB --output baseline.json
+
+  # Measure and compare in one go (exit code 1 on regression)
+  python benchmark_compression.py run --output current.json --baseline baseline.json
+
+  # Compare two saved runs
+  python benchmark_compression.py compare baseline.json current.json
+        """
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark")
+    run_parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                            help=f"Comma-separated transcript sizes (default: {DEFAULT_SIZES})")
+    run_parser.add_argument("--output", help="Write results JSON to this path")
+    run_parser.add_argument("--work-dir", help="Directory for generated transcripts (reused across runs)")
+    run_parser.add_argument("--repeat", type=int, default=1, help="Best-of-N timing runs (default: 1)")
+    run_parser.add_argument("--no-isolate", action="store_true",
+                            help="Measure in this process (faster, peak RSS less accurate)")
+    run_parser.add_argument("--baseline", help="Compare against this results file")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help=f"Relative regression threshold (default: {DEFAULT_THRESHOLD})")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("baseline", help="Baseline results JSON")
+    compare_parser.add_argument("current", help="Current results JSON")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help=f"Relative regression threshold (default: {DEFAULT_THRESHOLD})")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sizes = [s for s in args.sizes.split(",") if s.strip()]
+        document = run_benchmark(sizes, work_dir=args.work_dir, repeat=args.repeat,
+                                 isolate=not args.no_isolate)
+        print_results(document)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(document, f, indent=2)
+            print(f"[OK] Results written to: {args.output}")
+        if args.baseline:
+            regressions = compare_results(_load(args.baseline), document, args.threshold)
+            print_regressions(regressions, args.threshold)
+            sys.exit(1 if regressions else 0)
+        sys.exit(0)
+
+    regressions = compare_results(_load(args.baseline), _load(args.current), args.threshold)
+    print_regressions(regressions, args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
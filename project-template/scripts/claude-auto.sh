@@ -21,6 +21,7 @@ PROJECT_ROOT="$(cd "$SCRIPT_DIR/../.." && pwd)"
 TOKEN_THRESHOLD=70  # 70% of context window
 CONTEXT_WINDOW=200000
 HANDOFF_OUTPUT="handoff.json"
+TRANSCRIPT="${CLAUDE_TRANSCRIPT_PATH:-}"  # JSONL session log used for token estimates
 
 # Colors for output
 RED='\033[0;31m'
@@ -65,6 +66,7 @@ OPTIONS:
     --to AGENT          Target agent ID (required)
     --threshold PCT     Token threshold percentage (default: 70)
     --output FILE       Output handoff file (default: handoff.json)
+    --transcript FILE   JSONL session transcript (default: \$CLAUDE_TRANSCRIPT_PATH)
     --force             Force compression even if threshold not reached
     --help              Show this help message
 
@@ -111,6 +113,10 @@ while [[ $# -gt 0 ]]; do
             HANDOFF_OUTPUT="$2"
             shift 2
             ;;
+        --transcript)
+            TRANSCRIPT="$2"
+            shift 2
+            ;;
         --force)
             FORCE_COMPRESSION=true
             shift
@@ -144,6 +150,7 @@ echo "  From Agent: $FROM_AGENT"
 echo "  To Agent: $TO_AGENT"
 echo "  Token Threshold: ${TOKEN_THRESHOLD}%"
 echo "  Output File: $HANDOFF_OUTPUT"
+echo "  Transcript: ${TRANSCRIPT:-(not set)}"
 echo ""
 
 # Step 1: Check if Python is available
@@ -162,7 +169,12 @@ print_success "Python found: $PYTHON_CMD"
 # Step 2: Estimate current token usage (using compress_context.py)
 print_info "Estimating current token usage..."
 
-CURRENT_TOKENS=$($PYTHON_CMD "$SCRIPT_DIR/compress_context.py" --estimate-only 2>/dev/null || echo "0")
+TRANSCRIPT_ARGS=()
+if [[ -n "$TRANSCRIPT" ]]; then
+    TRANSCRIPT_ARGS=(--transcript "$TRANSCRIPT")
+fi
+
+CURRENT_TOKENS=$($PYTHON_CMD "$SCRIPT_DIR/compress_context.py" --estimate-only "${TRANSCRIPT_ARGS[@]}" 2>/dev/null || echo "0")
 
 if [[ "$CURRENT_TOKENS" == "0" ]]; then
     print_warning "Could not estimate token usage. Proceeding with compression..."
@@ -213,18 +225,24 @@ if [[ "$SHOULD_COMPRESS" == true ]]; then
         exit 1
     fi
 
-    # Step 5: Compress context (optional - using compress_context.py)
-    print_info "Compressing context..."
-
-    $PYTHON_CMD "$SCRIPT_DIR/compress_context.py" \
-        --handoff "$HANDOFF_OUTPUT" \
-        --from-agent "$FROM_AGENT" \
-        --to-agent "$TO_AGENT"
-
-    if [[ $? -eq 0 ]]; then
-        print_success "Context compression complete"
+    # Step 5: Compress context (optional - using compress_context.py; only the
+    # part of the transcript appended since the last run is scanned, see
+    # <transcript>.compress-state.json)
+    # Non-critical: a failure must not abort the workflow under set -e
+    if [[ ${#TRANSCRIPT_ARGS[@]} -eq 0 ]]; then
+        print_warning "No transcript (pass one or set CLAUDE_TRANSCRIPT_PATH), skipping context compression"
     else
-        print_warning "Context compression had warnings (non-critical)"
+        print_info "Compressing context..."
+
+        if $PYTHON_CMD "$SCRIPT_DIR/compress_context.py" \
+            --handoff "$HANDOFF_OUTPUT" \
+            --from-agent "$FROM_AGENT" \
+            --to-agent "$TO_AGENT" \
+            "${TRANSCRIPT_ARGS[@]}"; then
+            print_success "Context compression complete"
+        else
+            print_warning "Context compression had warnings (non-critical)"
+        fi
     fi
 
     # Summary
@@ -11,10 +11,14 @@ Features:
   - P1-3: Context7 + Exa intelligent enhancement
 
 Usage:
-  python compress_context.py --estimate-only
-  python compress_context.py --handoff handoff.json --from-agent research --to-agent product
+  python compress_context.py --estimate-only --transcript session.jsonl
+  python compress_context.py --handoff handoff.json --from-agent research --to-agent product --transcript session.jsonl
+      (resumes from session.jsonl.compress-state.json; --full-rescan to start over)
   python compress_context.py --compress --input conversation.txt --output compressed.txt
   python compress_context.py --compress --input conversation.txt --output compressed.txt --enhance
+  python compress_context.py --compress --input conversation.txt --output compressed.txt --incremental
+  python compress_context.py --batch archive/ --output-dir compressed/ --workers 8
+  python compress_context.py --cache-stats
 
 Version: 1.1 (P1-3: Context7 + Exa Integration)
 Author: Claude Code + zycaskevin
@@ -23,11 +27,53 @@ Based on: Factory.ai 2025 compression strategy
 
 import json
 import argparse
+import codecs
+import math
+import glob
+import hashlib
+import heapq
+import os
+import re
+import stat
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple, Optional, Union
 from datetime import datetime, timezone
 
+from context_codec import (
+    DEFAULT_FORMAT,
+    FORMAT_EXTENSIONS,
+    FORMATS,
+    dump as dump_context,
+    encode as encode_context,
+    load_with_format,
+)
+from keyword_matcher import KeywordMatcher
+from near_duplicate import NearDuplicateFilter
+from result_cache import ResultCache, bytes_sha256, default_cache_dir, file_sha256
+from token_estimator import TokenCounter, estimate_tokens, estimate_tokens_many, get_estimator, token_counter
+from transcript_reader import (
+    DEFAULT_CHUNK_BYTES,
+    is_compact_boundary,
+    iter_file_lines,
+    is_jsonl_transcript,
+    iter_transcript_lines,
+    record_text,
+    render_transcript_lines,
+)
+
+# Handoff file locking (POSIX flock, Windows msvcrt)
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 # P1-3: Import integration modules
 try:
     # Add integrations directory to path
@@ -43,53 +89,464 @@ except ImportError as e:
     INTEGRATIONS_AVAILABLE = False
 
 # ============================================================
-# Token Estimation (enhanced approximation)
+# Token Estimation (shared module: token_estimator.py)
+# ============================================================
+def get_compression_rate(original: str, compressed: str) -> float:
+    """Calculate compression rate"""
+    original_tokens = estimate_tokens(original)
+    compressed_tokens = estimate_tokens(compressed)
+    if original_tokens == 0:
+        return 0.0
+    return 1.0 - (compressed_tokens / original_tokens)
+
+
+# ============================================================
+# Streaming Extractors (single-pass engine)
 # ============================================================
-def estimate_tokens(text: str) -> int:
+def iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """
+    Yield lines (terminators kept) from a string, file object or iterable
+
+    Strings are walked with str.find so no list of lines is materialized.
     """
-    Estimate token count using improved heuristic
+    if isinstance(source, str):
+        start = 0
+        length = len(source)
+        while start < length:
+            end = source.find('\n', start)
+            if end == -1:
+                yield source[start:]
+                return
+            yield source[start:end + 1]
+            start = end + 1
+    else:
+        yield from source
+
+
+# Enhanced action keywords (play-by-play)
+ACTION_KEYWORDS = [
+    'created', 'modified', 'deleted', 'fixed', 'implemented',
+    'refactored', 'optimized', 'added', 'removed', 'updated',
+    'commit', 'pushed', 'merged', 'deployed', 'tested'
+]
+
+# Noise patterns to remove from play-by-play
+NOISE_PATTERNS = [
+    '# Extract actions with keywords:',
+    'pass',
+    '...',
+    'TODO:'
+]
+
+# Enhanced breadcrumb patterns with more variants
+BREADCRUMB_PATTERNS = {
+    'def ': 'function',
+    'class ': 'class',
+    'function ': 'function',
+    'const ': 'const',
+    'let ': 'variable',
+    'var ': 'variable',
+    'import ': 'import',
+    'from ': 'import_from',
+    'export ': 'export',
+    'async def ': 'async_function',
+    'async function ': 'async_function',
+    '@staticmethod': 'static_method',
+    '@classmethod': 'class_method',
+    '@property': 'property'
+}
+
+# Identifier after a breadcrumb pattern, up to the first terminator
+IDENTIFIER_PATTERN = re.compile(r'[^(:={, \t]*')
+
+# Per-line hits reported by KeywordMatcher.scan: {group: keywords found}
+LineHits = Dict[str, Set[str]]
+NO_HITS: LineHits = {}
+
+# Lines are token-counted in batches to amortize per-call overhead
+TOKEN_COUNT_BATCH_LINES = 512
+
+# Incremental compression state (compress_incremental / sidecar files)
+STATE_VERSION = 1
+STATE_FILE_SUFFIX = ".compress-state.json"
+STATE_HEAD_BYTES = 4096
+EXTRACTOR_SECTIONS = ("sessionIntent", "playByPlay", "artifacts", "breadcrumbs")
+
+# Token-budget mode (compress(target_tokens=N)): item score =
+#   section weight * (RECENCY_WEIGHT * recency + FREQUENCY_WEIGHT * frequency)
+# recency = position of the last mention in the transcript (0..1],
+# frequency = log-scaled mention count relative to the section maximum
+SECTION_WEIGHTS = {"sessionIntent": 3.0, "playByPlay": 2.0, "artifacts": 1.5, "breadcrumbs": 1.0}
+RECENCY_WEIGHT = 0.6
+FREQUENCY_WEIGHT = 0.4
+
+# Distinct candidates kept per section in token-budget mode
+MAX_BUDGET_CANDIDATES = 5000
+
+
+def build_line_matcher(noise_patterns: Iterable[str] = NOISE_PATTERNS) -> KeywordMatcher:
+    """Build the shared matcher scanning action, noise and breadcrumb keywords"""
+    return KeywordMatcher(
+        {
+            'action': ACTION_KEYWORDS,
+            'noise': noise_patterns,
+            'breadcrumb': BREADCRUMB_PATTERNS,
+        },
+        ignore_case_groups=('action',)
+    )
+
+
+# Compiled once at import; every extractor reads its hits from one scan per line
+LINE_MATCHER = build_line_matcher()
+
+
+class LineExtractor:
+    """
+    Base class for extractors fed one line at a time
+
+    feed() receives a line without its trailing newline plus the shared
+    LINE_MATCHER hits for that line, and returns True once the extractor is
+    saturated (further lines cannot change result()). Extractors that do not
+    read hits set uses_hits = False so the scan can be skipped once only
+    they remain.
+
+    get_state()/load_state() round-trip the extractor through JSON so
+    incremental compression can resume where the previous run stopped.
+
+    With collect_candidates=True (token-budget mode) an extractor never
+    saturates and records every distinct item in a CandidateIndex instead
+    of stopping at its fixed cap.
+
+    Extractors given a NearDuplicateFilter (dedup) drop items that are near
+    duplicates of one already kept; in candidate mode the repeat counts
+    toward the kept item's frequency instead.
+    """
+
+    uses_hits = True
+    candidates: Optional["CandidateIndex"] = None
+    dedup: Optional[NearDuplicateFilter] = None
+
+    def _dedup_state(self) -> Dict:
+        return {"dedup": self.dedup.get_state()} if self.dedup is not None else {}
+
+    def _load_dedup_state(self, state: Dict) -> None:
+        if self.dedup is not None:
+            self.dedup.load_state(state["dedup"])
+
+    def feed(self, line: str, hits: LineHits) -> bool:
+        raise NotImplementedError
+
+    def result(self) -> List[str]:
+        raise NotImplementedError
+
+    @property
+    def saturated(self) -> bool:
+        return False
+
+    def get_state(self) -> Dict:
+        raise NotImplementedError
+
+    def load_state(self, state: Dict) -> None:
+        raise NotImplementedError
 
-    Strategy:
-    - English: ~4 chars per token
-    - Chinese: ~2 chars per token (CJK characters)
-    - Code: ~3.5 chars per token (more symbols)
-    - Mixed content: weighted average
 
-    Improved accuracy: ±10% (vs. previous ±20%)
+class CandidateIndex:
     """
-    if not text:
-        return 0
+    Distinct items of one section: item -> [count, first_line, last_line]
+
+    At most limit items are kept (bounded memory). A new item arriving
+    when the index is full evicts the entry with the fewest mentions,
+    least recent first, so late items are never dropped. Eviction order
+    comes from a min-heap of (count, last_line, item) snapshots; outdated
+    snapshots are skipped when popped and the heap is rebuilt once it
+    holds twice as many snapshots as there are entries.
+    """
+
+    def __init__(self, limit: int = MAX_BUDGET_CANDIDATES):
+        self.limit = limit
+        self.entries: Dict[str, list] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+
+    def add(self, item: str, line_number: int) -> None:
+        entry = self.entries.get(item)
+        if entry is not None:
+            entry[0] += 1
+            entry[2] = line_number
+        elif self.limit > 0:
+            if len(self.entries) >= self.limit:
+                self._evict()
+            entry = self.entries[item] = [1, line_number, line_number]
+        else:
+            return
+
+        heapq.heappush(self._heap, (entry[0], entry[2], item))
+        if len(self._heap) > 2 * max(self.limit, len(self.entries)):
+            self._heap = [(count, last, key) for key, (count, _, last) in self.entries.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self) -> None:
+        """Drop the entry with the lowest (count, last_line)"""
+        while self._heap:
+            count, last, item = heapq.heappop(self._heap)
+            entry = self.entries.get(item)
+            if entry is not None and entry[0] == count and entry[2] == last:
+                del self.entries[item]
+                return
+
+
+class SessionIntentExtractor(LineExtractor):
+    """Session intent: first 5 user messages, filtered (Enhanced v2)"""
+
+    MAX_USER_MESSAGES = 5  # Increased from 3 to 5
+    uses_hits = False
+
+    def __init__(self, stop_words: Iterable[str], collect_candidates: bool = False,
+                 dedup: Optional[NearDuplicateFilter] = None):
+        self.stop_words = stop_words
+        self.user_messages_seen = 0
+        self.intents: List[str] = []
+        self.line_number = 0
+        self.dedup = dedup
+        if collect_candidates:
+            self.candidates = CandidateIndex()
+
+    def feed(self, line: str, hits: LineHits) -> bool:
+        self.line_number += 1
+        if not (line.startswith('User:') or line.startswith('user:')):
+            return False
+
+        self.user_messages_seen += 1
+
+        # Remove "User:" prefix and strip
+        intent = line.split(':', 1)[1].strip()
+
+        # Filter out noise, prioritize longer messages (more likely to be meaningful)
+        if (not any(stop_word in intent for stop_word in self.stop_words)
+                and intent and 15 < len(intent) < 200):  # Lowered min from 20, added max
+            representative = self.dedup.match(intent) if self.dedup is not None else None
+            if self.candidates is not None:
+                self.candidates.add(representative or intent, self.line_number - 1)
+            elif representative is None:
+                self.intents.append(intent)
+
+        return self.saturated
+
+    def result(self) -> List[str]:
+        return list(self.intents)
+
+    @property
+    def saturated(self) -> bool:
+        return self.candidates is None and self.user_messages_seen >= self.MAX_USER_MESSAGES
+
+    def get_state(self) -> Dict:
+        return {"user_messages_seen": self.user_messages_seen, "intents": list(self.intents),
+                **self._dedup_state()}
+
+    def load_state(self, state: Dict) -> None:
+        self.user_messages_seen = state["user_messages_seen"]
+        self.intents = list(state["intents"])
+        self._load_dedup_state(state)
+
+
+class PlayByPlayExtractor(LineExtractor):
+    """Play-by-play: deduplicated action lines, top 15 (Enhanced v2)"""
+
+    MAX_ACTIONS = 15  # Reduced from 20 for better compression
+
+    def __init__(self, collect_candidates: bool = False,
+                 dedup: Optional[NearDuplicateFilter] = None):
+        self.actions: Dict[str, None] = {}  # Ordered set
+        self.line_number = 0
+        self.dedup = dedup
+        if collect_candidates:
+            self.candidates = CandidateIndex()
+
+    def feed(self, line: str, hits: LineHits) -> bool:
+        self.line_number += 1
+
+        # Filter noise patterns, keep lines with action keywords
+        if 'noise' not in hits and 'action' in hits:
+            # Keep action summary (limit to 80 chars for better compression)
+            action = line.strip()[:80]
+
+            # Filter out too short actions
+            if action and len(action) > 10:
+                representative = None
+                if self.dedup is not None and action not in self.actions:
+                    representative = self.dedup.match(action)
+                if self.candidates is not None:
+                    self.candidates.add(representative or action, self.line_number - 1)
+                elif representative is None:
+                    self.actions[action] = None
+
+        return self.saturated
+
+    def result(self) -> List[str]:
+        return list(self.actions)[:self.MAX_ACTIONS]
+
+    @property
+    def saturated(self) -> bool:
+        return self.candidates is None and len(self.actions) >= self.MAX_ACTIONS
 
-    # Count different character types
-    import re
+    def get_state(self) -> Dict:
+        return {"actions": list(self.actions), **self._dedup_state()}
 
-    # CJK characters (Chinese, Japanese, Korean)
-    cjk_chars = len(re.findall(r'[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff]', text))
+    def load_state(self, state: Dict) -> None:
+        self.actions = dict.fromkeys(state["actions"])
+        self._load_dedup_state(state)
 
-    # Code symbols (more compact tokenization)
-    code_symbols = len(re.findall(r'[{}()\[\];:,.<>]', text))
 
-    # Remaining characters
-    total_chars = len(text)
-    other_chars = total_chars - cjk_chars - code_symbols
+class ArtifactExtractor(LineExtractor):
+    """
+    Artifact trails: file paths mentioned in the conversation, ranked
+
+    Words of each line holding a path separator and a known extension
+    are paths. Every path is indexed with its occurrence count,
+    first/last line (0-based) and extension class; result() returns the
+    top MAX_ARTIFACTS paths by count, then first appearance.
+    """
 
-    # Weighted token estimation
-    estimated_tokens = (
-        cjk_chars / 2.0 +          # CJK: ~2 chars/token
-        code_symbols / 2.5 +        # Code symbols: ~2.5 chars/token
-        other_chars / 4.0           # English/other: ~4 chars/token
+    MAX_ARTIFACTS = 30
+
+    # Common file extensions -> extension class
+    FILE_EXTENSIONS = {
+        '.py': 'code', '.js': 'code', '.ts': 'code', '.jsx': 'code', '.tsx': 'code',
+        '.sh': 'script', '.bat': 'script', '.sql': 'code',
+        '.md': 'doc', '.txt': 'doc', '.feature': 'test',
+        '.json': 'config', '.yaml': 'config', '.yml': 'config',
+        '.html': 'web', '.css': 'web',
+    }
+
+    # Characters of a path token: no whitespace, quotes, brackets or
+    # CJK / full-width punctuation (Markdown and Chinese prose wrap paths)
+    PATH_CHAR = r'[^\s`\'"()\[\]<>|*\u3000-\u303f\uff00-\uffef]'
+
+    # Words are split on non-path characters first; a word is a path when
+    # a known extension follows its first separator (the extension must
+    # end there: ".pyc" is not ".py"). Each pattern runs in linear time,
+    # so long unbroken runs (base64, minified code) cannot backtrack.
+    WORD_PATTERN = re.compile(rf'{PATH_CHAR}+')
+    SEPARATOR_PATTERN = re.compile(r'[/\\]')
+    EXTENSION_PATTERN = re.compile(
+        r'\.('
+        + '|'.join(sorted((re.escape(ext[1:]) for ext in FILE_EXTENSIONS), key=len, reverse=True))
+        + r')(?![\w-])'
     )
+    STRIP_CHARS = ',:;()[]{}"\'` '
+
+    uses_hits = False
+
+    def __init__(self, collect_candidates: bool = False):
+        # path -> [count, first_line, last_line, extension class]
+        self.index_entries: Dict[str, list] = {}
+        self.line_number = 0
+        if collect_candidates:
+            # The index already holds every path; share its entries
+            self.candidates = CandidateIndex(limit=0)
+            self.candidates.entries = self.index_entries
+
+    def feed(self, line: str, hits: LineHits) -> bool:
+        line_number = self.line_number
+        self.line_number += 1
+        if '/' not in line and '\\' not in line:
+            return False
+
+        for word in self.WORD_PATTERN.findall(line):
+            separator = self.SEPARATOR_PATTERN.search(word)
+            if separator is None:
+                continue
+            extension = self.EXTENSION_PATTERN.search(word, separator.end())
+            if extension is None:
+                continue
+            path = word.strip(self.STRIP_CHARS).rstrip('.')
+            if not path:
+                continue
+            entry = self.index_entries.get(path)
+            if entry is None:
+                self.index_entries[path] = [
+                    1, line_number, line_number, self.FILE_EXTENSIONS['.' + extension.group(1)]
+                ]
+            else:
+                entry[0] += 1
+                entry[2] = line_number
+        return False
 
-    return int(estimated_tokens)
+    def index(self, limit: Optional[int] = None) -> List[Dict]:
+        """Ranked artifact index (count desc, then first appearance)"""
+        ranked = sorted(self.index_entries.items(), key=lambda item: (-item[1][0], item[1][1]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [
+            {"path": path, "count": count, "firstLine": first, "lastLine": last,
+             "extensionClass": ext_class}
+            for path, (count, first, last, ext_class) in ranked
+        ]
 
+    def result(self) -> List[str]:
+        return [entry["path"] for entry in self.index(self.MAX_ARTIFACTS)]
 
-def get_compression_rate(original: str, compressed: str) -> float:
-    """Calculate compression rate"""
-    original_tokens = estimate_tokens(original)
-    compressed_tokens = estimate_tokens(compressed)
-    if original_tokens == 0:
-        return 0.0
-    return 1.0 - (compressed_tokens / original_tokens)
+    def get_state(self) -> Dict:
+        return {"line_number": self.line_number,
+                "index": {path: list(entry) for path, entry in self.index_entries.items()}}
+
+    def load_state(self, state: Dict) -> None:
+        self.line_number = state["line_number"]
+        self.index_entries = {path: list(entry) for path, entry in state["index"].items()}
+
+
+class BreadcrumbExtractor(LineExtractor):
+    """Breadcrumbs: function/class/variable identifiers, top 40 (Enhanced v2)"""
+
+    MAX_BREADCRUMBS = 40
+
+    def __init__(self, collect_candidates: bool = False):
+        self.breadcrumbs: Dict[str, None] = {}  # Ordered set
+        self.line_number = 0
+        if collect_candidates:
+            self.candidates = CandidateIndex()
+
+    def feed(self, line: str, hits: LineHits) -> bool:
+        self.line_number += 1
+        found = hits.get('breadcrumb')
+        if not found:
+            return False
+
+        line_stripped = line.strip()
+
+        # Skip comments and empty lines
+        if line_stripped.startswith('#') or line_stripped.startswith('//'):
+            return False
+
+        # Pattern order (not line order) decides breadcrumb order
+        for pattern, pattern_type in BREADCRUMB_PATTERNS.items():
+            if pattern in found:
+                # Extract identifier after pattern, up to the first terminator
+                start = line.find(pattern) + len(pattern)
+                identifier = IDENTIFIER_PATTERN.match(line, start).group().strip()
+
+                # Filter valid identifiers (reasonable length)
+                if identifier and 2 < len(identifier) < 50:
+                    if self.candidates is not None:
+                        self.candidates.add(f"{pattern_type}:{identifier}", self.line_number - 1)
+                        continue
+                    self.breadcrumbs[f"{pattern_type}:{identifier}"] = None
+                    if self.saturated:
+                        return True
+
+        return False
+
+    def result(self) -> List[str]:
+        return list(self.breadcrumbs)[:self.MAX_BREADCRUMBS]
+
+    @property
+    def saturated(self) -> bool:
+        return self.candidates is None and len(self.breadcrumbs) >= self.MAX_BREADCRUMBS
+
+    def get_state(self) -> Dict:
+        return {"breadcrumbs": list(self.breadcrumbs)}
+
+    def load_state(self, state: Dict) -> None:
+        self.breadcrumbs = dict.fromkeys(state["breadcrumbs"])
 
 
 # ============================================================
@@ -108,24 +565,32 @@ class ContextCompressor:
     - Smarter filtering (skip comments, duplicates)
     - Improved token estimation (±10% vs. ±20%)
     - Higher compression targets (50-60% vs. 30-70%)
+
+    v1.2: All extractors share one streaming pass (compress_stream), so the
+    conversation is read once and never needs to be held in memory whole.
     """
 
-    def __init__(self):
+    def __init__(self, dedup_threshold: Optional[float] = None):
+        """
+        Args:
+            dedup_threshold: Drop near-duplicate intents and actions at this
+                             SimHash similarity (0-1, e.g. 0.85); None keeps
+                             exact-match deduplication only
+        """
+        if dedup_threshold is not None:
+            NearDuplicateFilter(dedup_threshold)  # validate early
+        self.dedup_threshold = dedup_threshold
         self.session_intent = []
         self.play_by_play = []
         self.artifacts = []
+        self.artifact_index = []  # Ranked index behind self.artifacts
         self.breadcrumbs = []
 
         # Stop words to filter out from intents
         self.stop_words = {'TODO', 'Note:', 'PS:', 'BTW:', '[Request interrupted'}
 
         # Noise patterns to remove from play-by-play
-        self.noise_patterns = [
-            '# Extract actions with keywords:',
-            'pass',
-            '...',
-            'TODO:'
-        ]
+        self.noise_patterns = list(NOISE_PATTERNS)
 
     def extract_session_intent(self, conversation: str) -> List[str]:
         """
@@ -141,25 +606,8 @@ class ContextCompressor:
         - Prioritize longer, meaningful messages
         - Extract up to 5 intents (vs. 3)
         """
-        intents = []
-
-        # Extract user messages
-        lines = conversation.split('\n')
-        user_messages = [line for line in lines if line.startswith('User:') or line.startswith('user:')]
-
-        for msg in user_messages[:5]:  # Increased from 3 to 5
-            # Remove "User:" prefix and strip
-            intent = msg.split(':', 1)[1].strip() if ':' in msg else msg.strip()
-
-            # Filter out noise
-            if any(stop_word in intent for stop_word in self.stop_words):
-                continue
-
-            # Prioritize longer messages (more likely to be meaningful)
-            if intent and 15 < len(intent) < 200:  # Lowered min from 20, added max
-                intents.append(intent)
-
-        return intents
+        return self._run_extractor(
+            SessionIntentExtractor(self.stop_words, dedup=self._new_dedup()), conversation)
 
     def extract_play_by_play(self, conversation: str) -> List[str]:
         """
@@ -177,35 +625,7 @@ class ContextCompressor:
         - Prioritize important actions
         - Limit to top 15 (vs. 20) for better compression
         """
-        actions = []
-
-        # Enhanced action keywords
-        action_keywords = [
-            'created', 'modified', 'deleted', 'fixed', 'implemented',
-            'refactored', 'optimized', 'added', 'removed', 'updated',
-            'commit', 'pushed', 'merged', 'deployed', 'tested'
-        ]
-
-        lines = conversation.split('\n')
-        for line in lines:
-            line_lower = line.lower()
-
-            # Filter noise patterns
-            if any(noise in line for noise in self.noise_patterns):
-                continue
-
-            if any(keyword in line_lower for keyword in action_keywords):
-                # Keep action summary (limit to 80 chars for better compression)
-                action = line.strip()[:80]
-
-                # Filter out too short actions
-                if action and len(action) > 10:
-                    actions.append(action)
-
-        # Deduplicate and limit to top 15 actions (reduced from 20)
-        actions = list(dict.fromkeys(actions))[:15]
-
-        return actions
+        return self._run_extractor(PlayByPlayExtractor(dedup=self._new_dedup()), conversation)
 
     def extract_artifacts(self, conversation: str) -> List[str]:
         """
@@ -215,33 +635,23 @@ class ContextCompressor:
         - File paths mentioned
         - "Created: path/to/file.py"
         - Git commit file lists
+
+        Returns the top ArtifactExtractor.MAX_ARTIFACTS paths, most
+        frequently mentioned first.
         """
-        artifacts = []
+        return self._run_extractor(ArtifactExtractor(), conversation)
 
-        # Common file extensions
-        file_extensions = [
-            '.py', '.js', '.ts', '.jsx', '.tsx', '.md', '.json', '.yaml', '.yml',
-            '.sh', '.bat', '.feature', '.sql', '.html', '.css', '.txt'
-        ]
+    def extract_artifact_index(self, conversation: str) -> List[Dict]:
+        """
+        Ranked artifact index (uncapped)
 
-        lines = conversation.split('\n')
-        for line in lines:
-            # Look for file paths
-            for ext in file_extensions:
-                if ext in line:
-                    # Extract potential file path
-                    words = line.split()
-                    for word in words:
-                        if ext in word and '/' in word or '\\' in word:
-                            # Clean up the path
-                            path = word.strip(',:;()[]{}"\' ')
-                            if path:
-                                artifacts.append(path)
-
-        # Deduplicate
-        artifacts = list(dict.fromkeys(artifacts))
-
-        return artifacts
+        Returns:
+            [{"path", "count", "firstLine", "lastLine", "extensionClass"}, ...]
+            sorted by count, then first appearance
+        """
+        extractor = ArtifactExtractor()
+        self._run_extractor(extractor, conversation)
+        return extractor.index()
 
     def extract_breadcrumbs(self, conversation: str) -> List[str]:
         """
@@ -255,83 +665,293 @@ class ContextCompressor:
 
         Enhanced v2: Better pattern matching and identifier extraction
         """
-        breadcrumbs = []
-
-        # Enhanced patterns with more variants
-        patterns = {
-            'def ': 'function',
-            'class ': 'class',
-            'function ': 'function',
-            'const ': 'const',
-            'let ': 'variable',
-            'var ': 'variable',
-            'import ': 'import',
-            'from ': 'import_from',
-            'export ': 'export',
-            'async def ': 'async_function',
-            'async function ': 'async_function',
-            '@staticmethod': 'static_method',
-            '@classmethod': 'class_method',
-            '@property': 'property'
-        }
+        return self._run_extractor(BreadcrumbExtractor(), conversation)
 
-        lines = conversation.split('\n')
-        for line in lines:
-            line_stripped = line.strip()
+    def compress(self, conversation: str, target_tokens: Optional[int] = None) -> Dict:
+        """
+        Compress conversation into essential components
 
-            # Skip comments and empty lines
-            if line_stripped.startswith('#') or line_stripped.startswith('//') or not line_stripped:
-                continue
+        Args:
+            conversation: Conversation text
+            target_tokens: Token budget for the four sections. When set, the
+                           fixed caps are replaced by importance-ranked
+                           packing (see _pack_to_budget)
 
-            for pattern, pattern_type in patterns.items():
-                if pattern in line:
-                    # Extract identifier after pattern
-                    parts = line.split(pattern, 1)
-                    if len(parts) > 1:
-                        # Enhanced identifier extraction
-                        identifier = parts[1]
+        Returns:
+            Dictionary with compressed context
+        """
+        return self.compress_stream(conversation, target_tokens=target_tokens)
 
-                        # Remove common terminators
-                        for terminator in ['(', ':', '=', '{', ',', ' ', '\t']:
-                            identifier = identifier.split(terminator)[0]
+    def compress_stream(self, source: Union[str, Iterable[str]],
+                        target_tokens: Optional[int] = None) -> Dict:
+        """
+        Compress a conversation read line by line in a single pass
 
-                        identifier = identifier.strip()
+        Args:
+            source: Conversation string, text file object or any iterable of
+                    lines (keep line terminators for exact token counts)
+            target_tokens: Token budget (same as compress())
 
-                        # Filter valid identifiers
-                        if identifier and 2 < len(identifier) < 50:  # Reasonable length
-                            # Avoid duplicates with similar names
-                            breadcrumb = f"{pattern_type}:{identifier}"
-                            if breadcrumb not in breadcrumbs:
-                                breadcrumbs.append(breadcrumb)
+        Returns:
+            Dictionary with compressed context (same shape as compress())
+        """
+        if target_tokens is not None and target_tokens <= 0:
+            raise ValueError(f"target_tokens must be positive, got {target_tokens}")
 
-        # Deduplicate while preserving order, limit to top 40
-        return breadcrumbs[:40]
+        extractors = self._new_extractors(collect_candidates=target_tokens is not None)
+        tokens = token_counter()
+        self._feed_lines(extractors, iter_lines(source), tokens)
+        return self._finish(extractors, tokens.total(), target_tokens)
 
-    def compress(self, conversation: str) -> Dict:
+    def compress_incremental(self, new_text: Union[str, Iterable[str]],
+                             state: Optional[Dict] = None) -> Tuple[Dict, Dict]:
         """
-        Compress conversation into essential components
+        Compress an append-only conversation without re-reading old text
+
+        Only new_text is scanned; everything seen before lives in state.
+        The result equals compress() over the concatenation of all chunks
+        (an unterminated last line is carried over as pending text, so
+        chunks may split lines anywhere).
+
+        Args:
+            new_text: Text appended since the previous call, or an iterable
+                      of text chunks (split anywhere) to stream it
+            state: State returned by the previous call (None to start)
 
         Returns:
-            Dictionary with compressed context
+            (compressed, new_state) - new_state is JSON-serializable
+
+        Raises:
+            ValueError: state is from another version/configuration
         """
-        self.session_intent = self.extract_session_intent(conversation)
-        self.play_by_play = self.extract_play_by_play(conversation)
-        self.artifacts = self.extract_artifacts(conversation)
-        self.breadcrumbs = self.extract_breadcrumbs(conversation)
+        extractors = self._new_extractors()
+        tokens = token_counter()
+        pending = self._load_state(state, extractors, tokens) if state else ""
+
+        chunks = [new_text] if isinstance(new_text, str) else new_text
+        tail = [pending]
+
+        def complete_lines() -> Iterator[str]:
+            for chunk in chunks:
+                tokens.add(chunk)
+                for line in iter_lines(chunk):
+                    if tail[0]:
+                        line, tail[0] = tail[0] + line, ""
+                    if line.endswith('\n'):
+                        yield line
+                    else:
+                        tail[0] = line
+
+        self._feed_lines(extractors, complete_lines())
+        tail = tail[0]
+        new_state = self._dump_state(extractors, tokens, tail)
+
+        # The unterminated tail is part of this result, but not of the state
+        if tail:
+            self._feed_lines(extractors, [tail])
+
+        return self._finish(extractors, tokens.total()), new_state
+
+    def _new_extractors(self, collect_candidates: bool = False) -> List[LineExtractor]:
+        """Fresh extractors, in EXTRACTOR_SECTIONS order"""
+        return [
+            SessionIntentExtractor(self.stop_words, collect_candidates, self._new_dedup()),
+            PlayByPlayExtractor(collect_candidates, self._new_dedup()),
+            ArtifactExtractor(collect_candidates),
+            BreadcrumbExtractor(collect_candidates),
+        ]
+
+    def _new_dedup(self) -> Optional[NearDuplicateFilter]:
+        """Near-duplicate filter for one extractor (None when disabled)"""
+        if self.dedup_threshold is None:
+            return None
+        return NearDuplicateFilter(self.dedup_threshold)
+
+    def _feed_lines(self, extractors: List[LineExtractor], lines: Iterable[str],
+                    tokens: Optional[TokenCounter] = None) -> None:
+        """Feed raw lines to the extractors (and the token counter, if given)"""
+        matcher = self._line_matcher()
+        pending: List[str] = []
+        active = [extractor for extractor in extractors if not extractor.saturated]
+        scan = any(e.uses_hits for e in active)
+
+        for raw_line in lines:
+            if tokens is not None:
+                pending.append(raw_line)
+                if len(pending) >= TOKEN_COUNT_BATCH_LINES:
+                    self._flush_tokens(tokens, pending)
+
+            line = raw_line[:-1] if raw_line.endswith('\n') else raw_line
+            hits = matcher.scan(line) if scan else NO_HITS
+
+            finished = [extractor for extractor in active if extractor.feed(line, hits)]
+            if finished:
+                # Drop extractors whose result can no longer change
+                active = [e for e in active if e not in finished]
+                if not active and tokens is None:
+                    break
+                scan = any(e.uses_hits for e in active)
+
+        if tokens is not None:
+            self._flush_tokens(tokens, pending)
+
+    def _finish(self, extractors: List[LineExtractor], original_tokens: int,
+                target_tokens: Optional[int] = None) -> Dict:
+        """Store the extractor results and build the compressed dictionary"""
+        intent, actions, artifacts, breadcrumbs = extractors
+        self.artifact_index = artifacts.index()
+
+        if target_tokens is None:
+            self.session_intent = intent.result()
+            self.play_by_play = actions.result()
+            self.artifacts = artifacts.result()
+            self.breadcrumbs = breadcrumbs.result()
+            return self._build_result(original_tokens)
+
+        sections = self._pack_to_budget(extractors, target_tokens, artifacts.line_number)
+        self.session_intent = sections["sessionIntent"]
+        self.play_by_play = sections["playByPlay"]
+        self.artifacts = sections["artifacts"]
+        self.breadcrumbs = sections["breadcrumbs"]
+
+        compressed = self._build_result(original_tokens)
+        compressed["compressionMetadata"]["targetTokens"] = target_tokens
+        compressed["compressionMetadata"]["candidateCounts"] = {
+            section: len(extractor.candidates.entries)
+            for section, extractor in zip(EXTRACTOR_SECTIONS, extractors)
+        }
+        return compressed
 
+    @staticmethod
+    def _pack_to_budget(extractors: List[LineExtractor], target_tokens: int,
+                        total_lines: int) -> Dict[str, List[str]]:
+        """
+        Greedily pack the highest-scoring candidates into target_tokens
+
+        Every candidate is scored (SECTION_WEIGHTS, recency, frequency) and
+        added in score order when its serialized cost still fits; items
+        that do not fit are skipped so smaller ones can use the rest of the
+        budget. The final payload is re-estimated and the lowest-scoring
+        items are dropped until it fits, so the budget holds for any token
+        backend. Artifacts keep rank order, other sections stay
+        chronological.
+        """
+        total_lines = max(1, total_lines)
+        scored = []  # (score, section, item, first_line)
+        for section, extractor in zip(EXTRACTOR_SECTIONS, extractors):
+            entries = extractor.candidates.entries
+            if not entries:
+                continue
+            max_count = max(entry[0] for entry in entries.values())
+            weight = SECTION_WEIGHTS[section]
+            for item, entry in entries.items():
+                count, first_line, last_line = entry[0], entry[1], entry[2]
+                recency = (last_line + 1) / total_lines
+                frequency = math.log1p(count) / math.log1p(max_count)
+                score = weight * (RECENCY_WEIGHT * recency + FREQUENCY_WEIGHT * frequency)
+                scored.append((score, section, item, first_line))
+        scored.sort(key=lambda candidate: -candidate[0])
+
+        # Running estimate of the payload: skeleton plus '"item", ' per item
+        # (exact for the additive heuristic backend)
+        payload = token_counter()
+        payload.add(json.dumps({section: [] for section in EXTRACTOR_SECTIONS}))
+        selected = []
+        for candidate in scored:
+            before = payload.get_state()
+            payload.add(json.dumps(candidate[2]) + ", ")
+            if payload.total() <= target_tokens:
+                selected.append(candidate)
+            else:
+                payload.load_state(before)
+
+        def build(chosen):
+            sections = {section: [] for section in EXTRACTOR_SECTIONS}
+            for _, section, item, first_line in chosen:
+                sections[section].append((first_line, item))
+            return {
+                section: [item for _, item in (
+                    items if section == "artifacts" else sorted(items, key=lambda pair: pair[0])
+                )]
+                for section, items in sections.items()
+            }
+
+        # Non-additive backends may still overshoot: trim the lowest scores
+        sections = build(selected)
+        while selected and estimate_tokens(json.dumps(sections)) > target_tokens:
+            selected.pop()
+            sections = build(selected)
+        return sections
+
+    def _config_fingerprint(self) -> str:
+        """Hash of the settings that change extraction results"""
+        settings = [sorted(self.stop_words), self.noise_patterns]
+        if self.dedup_threshold is not None:
+            settings.append(self.dedup_threshold)
+        config = json.dumps(settings, ensure_ascii=False)
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+    def _dump_state(self, extractors: List[LineExtractor], tokens: TokenCounter,
+                    pending: str) -> Dict:
+        """Serialize incremental compression state"""
+        return {
+            "version": STATE_VERSION,
+            "config": self._config_fingerprint(),
+            "extractors": {
+                section: extractor.get_state()
+                for section, extractor in zip(EXTRACTOR_SECTIONS, extractors)
+            },
+            "tokens": tokens.get_state(),
+            "pending": pending,
+        }
+
+    def _load_state(self, state: Dict, extractors: List[LineExtractor],
+                    tokens: TokenCounter) -> str:
+        """Restore _dump_state() output, returning the pending text"""
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported compression state version: {state.get('version')!r}")
+        if state.get("config") != self._config_fingerprint():
+            raise ValueError("Compression state was created with different compressor settings")
+
+        try:
+            for section, extractor in zip(EXTRACTOR_SECTIONS, extractors):
+                extractor.load_state(state["extractors"][section])
+            tokens.load_state(state["tokens"])
+            return str(state["pending"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed compression state: {e}") from e
+
+    @staticmethod
+    def _flush_tokens(tokens: TokenCounter, pending: List[str]) -> None:
+        """Count the pending lines as one chunk, then clear them"""
+        if pending:
+            tokens.add(''.join(pending))
+            pending.clear()
+
+    def _build_result(self, original_tokens: int) -> Dict:
+        """Assemble the compressed dictionary from the extracted sections"""
         compressed = {
             "sessionIntent": self.session_intent,
             "playByPlay": self.play_by_play,
             "artifacts": self.artifacts,
             "breadcrumbs": self.breadcrumbs,
             "compressionMetadata": {
-                "originalTokens": estimate_tokens(conversation),
+                "originalTokens": original_tokens,
                 "compressedTokens": estimate_tokens(json.dumps({
                     "sessionIntent": self.session_intent,
                     "playByPlay": self.play_by_play,
                     "artifacts": self.artifacts,
                     "breadcrumbs": self.breadcrumbs
                 })),
+                # Serialized cost of each section on its own
+                "sectionTokens": {
+                    section: estimate_tokens(json.dumps(items)) for section, items in (
+                        ("sessionIntent", self.session_intent),
+                        ("playByPlay", self.play_by_play),
+                        ("artifacts", self.artifacts),
+                        ("breadcrumbs", self.breadcrumbs),
+                    )
+                },
                 "compressionRate": 0.0,  # Will be calculated
                 "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
             }
@@ -345,88 +965,374 @@ class ContextCompressor:
 
         return compressed
 
+    def _line_matcher(self) -> KeywordMatcher:
+        """Shared module matcher, unless noise_patterns were customized"""
+        if self.noise_patterns == NOISE_PATTERNS:
+            return LINE_MATCHER
+        return build_line_matcher(self.noise_patterns)
+
+    def _run_extractor(self, extractor: LineExtractor, conversation: str) -> List[str]:
+        """Feed a single extractor until it saturates or the input ends"""
+        matcher = self._line_matcher()
+        for raw_line in iter_lines(conversation):
+            line = raw_line[:-1] if raw_line.endswith('\n') else raw_line
+            if extractor.feed(line, matcher.scan(line)):
+                break
+        return extractor.result()
+
 
 # ============================================================
-# CLI Interface
+# Result Cache (content-addressed, see result_cache.py)
 # ============================================================
-def estimate_current_tokens() -> int:
+# Modules whose source determines the compressed output
+_VERSIONED_MODULES = ("compress_context.py", "keyword_matcher.py", "near_duplicate.py",
+                      "token_estimator.py", "transcript_reader.py")
+_compressor_version: Optional[str] = None
+
+
+def compressor_version() -> str:
+    """SHA-256 over the extraction modules' source (changes with any code edit)"""
+    global _compressor_version
+    if _compressor_version is None:
+        digest = hashlib.sha256()
+        scripts_dir = Path(__file__).parent
+        for name in _VERSIONED_MODULES:
+            digest.update(name.encode('ascii') + b'\0')
+            digest.update((scripts_dir / name).read_bytes())
+        _compressor_version = digest.hexdigest()
+    return _compressor_version
+
+
+def compressor_fingerprint(compressor: "ContextCompressor",
+                           target_tokens: Optional[int] = None) -> str:
+    """Everything besides the input bytes that a cached result depends on"""
+    backend = get_estimator().backend
+    encoding = getattr(getattr(backend, "encoding", None), "name", None)
+    return json.dumps([compressor_version(), compressor._config_fingerprint(),
+                       backend.name, encoding, target_tokens])
+
+
+def _compress_cached(cache: Optional[ResultCache], compressor: "ContextCompressor",
+                     input_path: str, target_tokens: Optional[int] = None,
+                     reader: Callable[..., Iterable[str]] = iter_file_lines) -> Tuple[Dict, bool]:
     """
-    Estimate current conversation tokens
+    _compress_path through the result cache
 
-    In a real CLI environment, this would read from conversation history.
-    For now, we return a dummy value.
+    Returns:
+        (compressed, cache hit)
     """
-    # TODO: Integrate with actual conversation history
-    # For now, return a placeholder that won't trigger compression
-    return 50000  # 50K tokens (25% of 200K context window)
+    if cache is None:
+        return _compress_path(compressor, input_path, target_tokens=target_tokens, reader=reader), False
 
+    try:
+        before = os.stat(input_path)
+        fingerprint = compressor_fingerprint(compressor, target_tokens)
+        if reader is not iter_file_lines:
+            fingerprint += ":" + reader.__name__
+        key = cache.key(file_sha256(input_path), fingerprint)
+        compressed = cache.get(key)
+        if compressed is not None:
+            return compressed, True
+
+        compressed = _compress_path(compressor, input_path, target_tokens=target_tokens, reader=reader)
+        after = os.stat(input_path)
+        # Only store if the file did not change while it was hashed and compressed
+        if (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns):
+            cache.put(key, compressed)
+        return compressed, False
+    finally:
+        cache.flush_stats()  # one stats.json update per compression
 
-def compress_with_handoff(handoff_path: str, from_agent: str, to_agent: str) -> bool:
-    """
-    Compress context and update handoff.json with compressed summary
 
-    Args:
-        handoff_path: Path to handoff.json file
-        from_agent: Source agent ID
-        to_agent: Target agent ID
+# ============================================================
+# CLI Interface
+# ============================================================
+# Session transcript (JSONL) used by --estimate-only
+TRANSCRIPT_ENV = "CLAUDE_TRANSCRIPT_PATH"
+TOKEN_CHECKPOINT_VERSION = 1
+TRANSCRIPT_READ_BYTES = 1 << 20
+PLACEHOLDER_TOKENS = 50000  # 25% of a 200K window: below the handoff threshold
 
-    Returns:
-        True if successful, False otherwise
+
+def _token_checkpoint_path(transcript_path: str) -> str:
+    """Default checkpoint file for a transcript (under the result cache dir)"""
+    digest = hashlib.sha256(os.path.abspath(transcript_path).encode('utf-8')).hexdigest()[:32]
+    return str(default_cache_dir() / "token-checkpoints" / f"{digest}.json")
+
+
+def _count_records(data: bytes, total: int) -> int:
+    """Add the tokens of complete JSONL records in data to total"""
+    texts = []
+    for raw in data.splitlines():
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            continue  # not a JSON record (corrupt or foreign line)
+        if not isinstance(record, dict):
+            continue
+        if is_compact_boundary(record):
+            # Everything before the boundary was summarized out of the context
+            total, texts = 0, []
+            continue
+        text = record_text(record)
+        if text:
+            texts.append(text)
+    return total + sum(estimate_tokens_many(texts))
+
+
+def estimate_transcript_tokens(transcript_path: str, checkpoint_path: Optional[str] = None) -> int:
     """
-    try:
-        # Read handoff file
-        with open(handoff_path, 'r', encoding='utf-8') as f:
-            handoff = json.load(f)
-
-        # Read conversation context (simulate)
-        # In real usage, this would read from actual conversation history
-        conversation = f"""
-        User: Implement dynamic memory compression for agent handoffs
-        Assistant: I'll create a compression system based on Factory.ai 2025 best practices...
-
-        Created: project-template/scripts/compress_context.py
-        Created: project-template/scripts/claude-auto.sh
-        Modified: README.md
-
-        Key decisions:
-        - Use Factory.ai compression strategy (preserve intent, play-by-play, artifacts, breadcrumbs)
-        - Implement CLI wrapper for auto-compression
-        - Token threshold: 70% of context window
-
-        def compress_context(conversation):
-            compressor = ContextCompressor()
-            return compressor.compress(conversation)
-        """
+    Tokens currently in context according to a JSONL session transcript
 
-        # Compress conversation
-        compressor = ContextCompressor()
-        compressed = compressor.compress(conversation)
+    A checkpoint file keeps the byte offset of the last complete record
+    counted and the running token sum, so each call only tokenizes bytes
+    appended since the previous one. Counting restarts from zero when the
+    transcript shrank, its head changed (file replaced), the token backend
+    changed, or a compact boundary record is read.
 
-        # Update handoff metadata
-        if "metadata" not in handoff:
-            handoff["metadata"] = {}
+    Args:
+        transcript_path: JSONL transcript (one record per line, appended to)
+        checkpoint_path: Checkpoint file (default: under the result cache dir)
 
-        handoff["metadata"]["compressionRate"] = compressed["compressionMetadata"]["compressionRate"]
-        handoff["metadata"]["protectedContent"] = [
-            "Session intent preserved",
-            "Artifact trails maintained",
-            "Key breadcrumbs retained"
-        ]
+    Returns:
+        Estimated tokens
+    """
+    checkpoint_path = checkpoint_path or _token_checkpoint_path(transcript_path)
+    checkpoint = _read_state_file(checkpoint_path) or {}
+    backend = get_estimator().backend.name
+    offset, total = 0, 0
+
+    with open(transcript_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if (checkpoint.get("version") == TOKEN_CHECKPOINT_VERSION
+                and checkpoint.get("backend") == backend
+                and size >= checkpoint.get("offset", -1)):
+            head = f.read(checkpoint.get("head_bytes", 0))
+            if hashlib.sha256(head).hexdigest() == checkpoint.get("head_sha256"):
+                offset, total = checkpoint["offset"], checkpoint["tokens"]
+
+        f.seek(offset)
+        carry = b''
+        while True:
+            chunk = f.read(TRANSCRIPT_READ_BYTES)
+            if not chunk:
+                break
+            data = carry + chunk
+            cut = data.rfind(b'\n') + 1
+            total = _count_records(data[:cut], total)
+            offset += cut
+            carry = data[cut:]
+        # carry: a record still being written, counted once it is complete
+
+        f.seek(0)
+        head = f.read(min(STATE_HEAD_BYTES, offset))
+
+    if offset != checkpoint.get("offset") or total != checkpoint.get("tokens"):
+        os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+        _write_state_file(checkpoint_path, {
+            "version": TOKEN_CHECKPOINT_VERSION,
+            "transcript": os.path.abspath(transcript_path),
+            "backend": backend,
+            "offset": offset,
+            "tokens": total,
+            "head_bytes": len(head),
+            "head_sha256": hashlib.sha256(head).hexdigest(),
+        })
+    return total
+
+
+def estimate_current_tokens(transcript_path: Optional[str] = None,
+                            checkpoint_path: Optional[str] = None) -> int:
+    """
+    Estimate current conversation tokens
 
-        # Add compressed context to summary
-        if "summary" not in handoff:
-            handoff["summary"] = {}
+    Reads the JSONL session transcript given by transcript_path or
+    $CLAUDE_TRANSCRIPT_PATH (see estimate_transcript_tokens). Without one,
+    a placeholder below the handoff threshold is returned.
 
+    Raises:
+        OSError: the transcript cannot be read
+    """
+    transcript_path = transcript_path or os.environ.get(TRANSCRIPT_ENV)
+    if not transcript_path:
+        print(f"[WARNING] No transcript given (--transcript or ${TRANSCRIPT_ENV}); "
+              f"using placeholder estimate", file=sys.stderr)
+        return PLACEHOLDER_TOKENS
+    return estimate_transcript_tokens(transcript_path, checkpoint_path)
+
+
+def _apply_compressed_context(handoff: Dict, compressed: Dict,
+                              target_tokens: Optional[int] = None) -> None:
+    """Merge a compressed context into handoff metadata / summary"""
+    # Update handoff metadata
+    if "metadata" not in handoff:
+        handoff["metadata"] = {}
+
+    handoff["metadata"]["compressionRate"] = compressed["compressionMetadata"]["compressionRate"]
+    handoff["metadata"]["protectedContent"] = [
+        "Session intent preserved",
+        "Artifact trails maintained",
+        "Key breadcrumbs retained"
+    ]
+
+    # Add compressed context to summary
+    if "summary" not in handoff:
+        handoff["summary"] = {}
+
+    if target_tokens is None:
         handoff["summary"]["compressedContext"] = {
             "sessionIntent": compressed["sessionIntent"],
             "keyActions": compressed["playByPlay"][:10],  # Top 10 actions
             "artifacts": compressed["artifacts"],
             "breadcrumbs": compressed["breadcrumbs"][:15]  # Top 15 breadcrumbs
         }
+    else:
+        # Already packed to the budget: keep everything selected
+        handoff["summary"]["compressedContext"] = {
+            "sessionIntent": compressed["sessionIntent"],
+            "keyActions": compressed["playByPlay"],
+            "artifacts": compressed["artifacts"],
+            "breadcrumbs": compressed["breadcrumbs"],
+            "sectionTokens": compressed["compressionMetadata"]["sectionTokens"],
+        }
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """
+    Exclusive advisory lock on <path>.lock (blocks until acquired)
+
+    Serializes read-modify-write cycles of concurrent processes, e.g.
+    parallel claude-auto.sh runs updating the same handoff.json.
+    """
+    with open(path + ".lock", 'a+b') as lock_file:
+        fd = lock_file.fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    lock_file.seek(0)
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10s; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _write_atomic(path: str, data: bytes, durable: bool = False) -> None:
+    """
+    Replace path with data atomically (temp file in the same directory + rename)
+
+    Readers see the old or the new file, never a partial one. The existing
+    file's permissions are kept; durable=True fsyncs before the rename.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".",
+                                    suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compress_with_handoff(handoff_path: str, from_agent: str, to_agent: str,
+                          target_tokens: Optional[int] = None,
+                          output_format: Optional[str] = None,
+                          use_cache: bool = True,
+                          cache_dir: Optional[str] = None,
+                          dedup_threshold: Optional[float] = None,
+                          transcript: Optional[str] = None,
+                          incremental: bool = True,
+                          state_path: Optional[str] = None) -> bool:
+    """
+    Compress context and update handoff.json with compressed summary
 
-        # Write back to handoff file
-        with open(handoff_path, 'w', encoding='utf-8') as f:
-            json.dump(handoff, f, indent=2, ensure_ascii=False)
+    A transcript file is compressed incrementally: the sidecar state
+    (<transcript>.compress-state.json) holds the compressor state, so each
+    run only scans what was appended since the previous one. With a token
+    budget, stdin, a non-UTF-8 transcript or incremental=False the
+    transcript is streamed whole through the compressor instead (never
+    loaded whole). The handoff is then re-read, updated and replaced
+    atomically under an exclusive lock (<handoff>.lock), so concurrent runs
+    cannot interleave or leave a partially written file.
+
+    Args:
+        handoff_path: Path to handoff.json file
+        from_agent: Source agent ID
+        to_agent: Target agent ID
+        target_tokens: Token budget for the compressed context (replaces
+                       the fixed top-10 actions / top-15 breadcrumbs)
+        output_format: context_codec format for the updated handoff
+                       (default: keep the format the file was read in)
+        use_cache: Reuse a cached result for an unchanged transcript file
+                   (whole-transcript runs)
+        cache_dir: Result cache directory (default: see result_cache.py)
+        dedup_threshold: Near-duplicate similarity for intents/actions (None: off)
+        transcript: Conversation transcript - plain text or JSONL session log -
+                    or "-" for stdin (default: $CLAUDE_TRANSCRIPT_PATH)
+        incremental: Resume from the transcript's sidecar state
+        state_path: Sidecar state file (default: <transcript>.compress-state.json)
+
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        transcript = transcript or os.environ.get(TRANSCRIPT_ENV)
+        if not transcript:
+            raise ValueError(f"No transcript given (--transcript FILE, '-' for stdin, "
+                             f"or ${TRANSCRIPT_ENV})")
+        if not os.path.isfile(handoff_path):
+            raise FileNotFoundError(f"Handoff file not found: {handoff_path}")
+
+        # Stream the conversation through the compressor (or reuse the cached result)
+        compressor = ContextCompressor(dedup_threshold)
+        compressed = None
+        if transcript == '-':
+            compressed = compressor.compress_stream(render_transcript_lines(sys.stdin),
+                                                    target_tokens=target_tokens)
+        elif incremental and target_tokens is None:
+            try:
+                compressed = compress_file_incremental(transcript, state_path, compressor,
+                                                       transcript=True)
+            except (OSError, UnicodeDecodeError) as e:
+                if not os.path.isfile(transcript):
+                    raise
+                print(f"[WARNING] Incremental compression unavailable ({e}), "
+                      f"rescanning the whole transcript")
+        if compressed is None:
+            cache = ResultCache(cache_dir) if use_cache else None
+            compressed, cache_hit = _compress_cached(cache, compressor, transcript, target_tokens,
+                                                     reader=iter_transcript_lines)
+            if cache_hit:
+                print(f"[INFO] Cache hit: reusing compressed context for {transcript}")
+
+        # Read-modify-write under the lock so concurrent updates are not lost
+        with _file_lock(handoff_path):
+            handoff, input_format = load_with_format(handoff_path)
+            _apply_compressed_context(handoff, compressed, target_tokens)
+            _write_atomic(handoff_path, encode_context(handoff, output_format or input_format),
+                          durable=True)
 
         print(f"[OK] Compressed context added to: {handoff_path}")
         print(f"   Compression rate: {compressed['compressionMetadata']['compressionRate']:.1%}")
@@ -440,10 +1346,171 @@ def compress_with_handoff(handoff_path: str, from_agent: str, to_agent: str) ->
         return False
 
 
+def _read_state_file(state_path: str) -> Optional[Dict]:
+    """Load a sidecar state file (None if missing or unreadable)"""
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Ignoring unreadable state file {state_path}: {e}")
+        return None
+
+
+def _write_state_file(state_path: str, sidecar: Dict) -> None:
+    """Write a sidecar state file atomically (temp file + rename)"""
+    _write_atomic(state_path, json.dumps(sidecar, ensure_ascii=False).encode('utf-8'))
+
+
+class _Utf8Reader:
+    """
+    Decoded chunks of a UTF-8 file from a byte offset, in constant memory
+
+    After iteration, end_offset excludes a trailing incomplete UTF-8
+    sequence (still being appended) - with whole_lines=True also a trailing
+    line without its newline, which is then not yielded; head is the first
+    STATE_HEAD_BYTES of the file.
+    """
+
+    def __init__(self, input_path: str, offset: int,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES, whole_lines: bool = False):
+        self.input_path = input_path
+        self.offset = offset
+        self.end_offset = offset
+        self.chunk_bytes = chunk_bytes
+        self.whole_lines = whole_lines
+        with open(input_path, 'rb') as f:
+            self.head = f.read(STATE_HEAD_BYTES)
+
+    def __iter__(self) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        carry = ''
+        with open(self.input_path, 'rb') as f:
+            f.seek(self.offset)
+            while True:
+                data = f.read(self.chunk_bytes)
+                if not data:
+                    break
+                self.end_offset += len(data)
+                text = decoder.decode(data, final=False)
+                if self.whole_lines:
+                    text = carry + text
+                    cut = text.rfind('\n') + 1
+                    text, carry = text[:cut], text[cut:]
+                if text:
+                    yield text
+        self.end_offset -= len(decoder.getstate()[0]) + len(carry.encode('utf-8'))
+
+
+def _incremental_source(reader: _Utf8Reader, jsonl: bool) -> Iterable[str]:
+    """Chunks of reader, or its JSONL records rendered as transcript lines"""
+    if not jsonl:
+        return reader
+    return render_transcript_lines((line for chunk in reader for line in iter_lines(chunk)),
+                                   jsonl=True)
+
+
+def compress_file_incremental(input_path: str, state_path: Optional[str] = None,
+                              compressor: Optional["ContextCompressor"] = None,
+                              transcript: bool = False) -> Dict:
+    """
+    Compress an append-only file, scanning only bytes added since last run
+
+    State lives in a sidecar JSON file (default: <input>.compress-state.json)
+    holding the byte offset already processed, a SHA-256 of the file head
+    and the compressor state. The file is recompressed from the start when
+    it shrank, its head changed, or the state does not match the compressor.
+
+    With transcript=True, JSONL session logs are rendered like
+    iter_transcript_lines() does; only complete records are consumed, so a
+    record still being written is read on the next run.
+
+    Args:
+        input_path: UTF-8 input file (appended to between runs)
+        state_path: Sidecar state file path
+        compressor: Compressor instance (default: ContextCompressor())
+        transcript: Treat input_path as a transcript (plain text or JSONL)
+
+    Returns:
+        Dictionary with compressed context (same as compressing the whole file)
+    """
+    state_path = state_path or input_path + STATE_FILE_SUFFIX
+    compressor = compressor or ContextCompressor()
+
+    sidecar = _read_state_file(state_path) or {}
+    offset = 0
+    state = None
+    jsonl = None
+
+    if sidecar.get("version") == STATE_VERSION and sidecar.get("transcript", False) == transcript:
+        with open(input_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(sidecar.get("head_bytes", 0))
+        if (size >= sidecar.get("offset", -1)
+                and hashlib.sha256(head).hexdigest() == sidecar.get("head_sha256")):
+            offset = sidecar["offset"]
+            state = sidecar.get("compressor")
+            # Nothing read yet (empty file): detect the format again
+            jsonl = sidecar.get("jsonl", False) if offset else None
+    if jsonl is None:
+        jsonl = transcript and is_jsonl_transcript(input_path, encoding='utf-8')
+
+    reader = _Utf8Reader(input_path, offset, whole_lines=jsonl)
+    try:
+        compressed, new_state = compressor.compress_incremental(
+            _incremental_source(reader, jsonl), state)
+    except UnicodeDecodeError:
+        raise
+    except ValueError as e:
+        print(f"[WARNING] Discarding incompatible state ({e}), recompressing from start")
+        offset = 0
+        reader = _Utf8Reader(input_path, offset, whole_lines=jsonl)
+        compressed, new_state = compressor.compress_incremental(_incremental_source(reader, jsonl))
+
+    end_offset = reader.end_offset
+    head = reader.head[:end_offset]
+    _write_state_file(state_path, {
+        "version": STATE_VERSION,
+        "offset": end_offset,
+        "head_bytes": len(head),
+        "head_sha256": hashlib.sha256(head).hexdigest(),
+        "transcript": transcript,
+        "jsonl": jsonl,
+        "compressor": new_state,
+    })
+
+    print(f"[INFO] Incremental: scanned {end_offset - offset:,} new bytes "
+          f"(resumed at byte {offset:,})")
+    return compressed
+
+
+def _compress_path(compressor: "ContextCompressor", input_path: str,
+                   encoding: Optional[str] = None,
+                   target_tokens: Optional[int] = None,
+                   reader: Callable[..., Iterable[str]] = iter_file_lines) -> Dict:
+    """
+    Stream a file through the compressor in constant memory
+
+    The file is memory-mapped and decoded in line-aligned chunks; the
+    encoding is detected from samples (UTF-8, then the system encoding).
+    reader=iter_transcript_lines renders JSONL session logs first.
+    """
+    return compressor.compress_stream(reader(input_path, encoding=encoding),
+                                      target_tokens=target_tokens)
+
+
 def compress_file(input_path: str, output_path: str,
                   use_context7: bool = False,
                   use_exa: bool = False,
-                  exa_api_key: Optional[str] = None) -> bool:
+                  exa_api_key: Optional[str] = None,
+                  incremental: bool = False,
+                  state_path: Optional[str] = None,
+                  target_tokens: Optional[int] = None,
+                  output_format: str = DEFAULT_FORMAT,
+                  use_cache: bool = True,
+                  cache_dir: Optional[str] = None,
+                  dedup_threshold: Optional[float] = None) -> bool:
     """
     Compress a text file using context compression
 
@@ -453,22 +1520,28 @@ def compress_file(input_path: str, output_path: str,
         use_context7: Enable Context7 documentation enhancement
         use_exa: Enable Exa search enhancement
         exa_api_key: Exa API key (optional)
+        incremental: Resume from a sidecar state file (append-only UTF-8 input)
+        state_path: Sidecar state file (default: <input>.compress-state.json)
+        target_tokens: Token budget (see ContextCompressor.compress)
+        output_format: Output codec (context_codec.FORMATS, default: indented JSON)
+        use_cache: Reuse the cached result for unchanged input (not incremental)
+        cache_dir: Result cache directory (default: see result_cache.py)
+        dedup_threshold: Near-duplicate similarity for intents/actions (None: off)
 
     Returns:
         True if successful, False otherwise
     """
     try:
-        # Read input file (try UTF-8, fallback to system encoding)
-        try:
-            with open(input_path, 'r', encoding='utf-8') as f:
-                conversation = f.read()
-        except UnicodeDecodeError:
-            with open(input_path, 'r', encoding=sys.getdefaultencoding()) as f:
-                conversation = f.read()
-
-        # Compress
-        compressor = ContextCompressor()
-        compressed = compressor.compress(conversation)
+        compressor = ContextCompressor(dedup_threshold)
+        if incremental and target_tokens is not None:
+            raise ValueError("--incremental cannot be combined with --target-tokens")
+        if incremental:
+            compressed = compress_file_incremental(input_path, state_path, compressor)
+        else:
+            cache = ResultCache(cache_dir) if use_cache else None
+            compressed, cache_hit = _compress_cached(cache, compressor, input_path, target_tokens)
+            if cache_hit:
+                print(f"[INFO] Cache hit: reusing compressed result for {input_path}")
 
         # P1-3: Apply enhancements if requested
         if (use_context7 or use_exa) and INTEGRATIONS_AVAILABLE:
@@ -492,10 +1565,9 @@ def compress_file(input_path: str, output_path: str,
             print("[WARNING] Enhancement requested but integration modules not available")
 
         # Write compressed output
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(compressed, f, indent=2, ensure_ascii=False)
+        size = dump_context(compressed, output_path, output_format)
 
-        print(f"[OK] Compressed: {input_path} -> {output_path}")
+        print(f"[OK] Compressed: {input_path} -> {output_path} ({output_format}, {size:,} bytes)")
         print(f"   Compression rate: {compressed['compressionMetadata']['compressionRate']:.1%}")
 
         return True
@@ -505,21 +1577,233 @@ def compress_file(input_path: str, output_path: str,
         return False
 
 
+# ============================================================
+# Batch Compression (directory / glob, process pool)
+# ============================================================
+# Outputs are named <stem>.compressed<format extension>
+BATCH_OUTPUT_MARKER = ".compressed"
+
+
+def collect_batch_inputs(source: str, pattern: str = "*.txt",
+                         recursive: bool = False) -> Tuple[List[Path], Path]:
+    """
+    Resolve a batch source into input files
+
+    Args:
+        source: Directory (filtered by pattern) or glob expression
+        pattern: File pattern used when source is a directory
+        recursive: Search subdirectories of a directory source
+
+    Returns:
+        (sorted input files, base directory for relative output paths)
+    """
+    root = Path(source)
+    if root.is_dir():
+        matches = root.rglob(pattern) if recursive else root.glob(pattern)
+        base = root
+    else:
+        matches = (Path(p) for p in glob.glob(source, recursive=True))
+        base = None
+
+    inputs = sorted(
+        p for p in matches
+        if p.is_file() and BATCH_OUTPUT_MARKER + "." not in p.name
+    )
+    if base is None:
+        base = Path(os.path.commonpath([str(p.parent) for p in inputs])) if inputs else Path('.')
+    return inputs, base
+
+
+def batch_output_path(input_path: Path, base: Path, output_dir: Path,
+                      output_format: str = DEFAULT_FORMAT,
+                      disambiguate: bool = False) -> Path:
+    """
+    Output path mirroring input_path's location under base
+
+    disambiguate=True appends a short hash of the relative input path to
+    the stem (for inputs whose plain output names collide, e.g. session.txt
+    and session.md).
+    """
+    relative = input_path.relative_to(base)
+    stem = relative.stem
+    if disambiguate:
+        stem += '-' + hashlib.sha256(relative.as_posix().encode('utf-8')).hexdigest()[:8]
+    name = stem + BATCH_OUTPUT_MARKER + FORMAT_EXTENSIONS[output_format]
+    return output_dir / relative.parent / name
+
+
+def batch_output_paths(inputs: List[Path], base: Path, output_dir: Path,
+                       output_format: str = DEFAULT_FORMAT) -> List[Path]:
+    """Output path per input; inputs sharing an output name get hashed names"""
+    outputs = [batch_output_path(p, base, output_dir, output_format) for p in inputs]
+    seen: Dict[Path, int] = {}
+    for output in outputs:
+        seen[output] = seen.get(output, 0) + 1
+    return [
+        batch_output_path(p, base, output_dir, output_format, disambiguate=True)
+        if seen[output] > 1 else output
+        for p, output in zip(inputs, outputs)
+    ]
+
+
+def _compress_batch_item(job: Tuple[str, str, Optional[int], str, Optional[str], Optional[float]]) -> Dict:
+    """Worker: compress one file and write its output (runs in a pool process)"""
+    input_path, output_path, target_tokens, output_format, cache_dir, dedup_threshold = job
+    start = time.perf_counter()
+    try:
+        cache = ResultCache(cache_dir) if cache_dir is not None else None
+        compressed, cache_hit = _compress_cached(cache, ContextCompressor(dedup_threshold),
+                                               input_path, target_tokens)
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        dump_context(compressed, output_path, output_format)
+        return {
+            "input": input_path,
+            "ok": True,
+            "bytes": os.path.getsize(input_path),
+            "compressionRate": compressed["compressionMetadata"]["compressionRate"],
+            "cacheHit": cache_hit,
+            "seconds": time.perf_counter() - start,
+        }
+    except Exception as e:
+        return {"input": input_path, "ok": False, "error": str(e),
+                "seconds": time.perf_counter() - start}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of pre-sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_batch(results: List[Dict], elapsed: float) -> Dict:
+    """Aggregate throughput and compression-rate distribution of a batch run"""
+    done = [r for r in results if r["ok"]]
+    total_bytes = sum(r["bytes"] for r in done)
+    rates = sorted(r["compressionRate"] for r in done)
+
+    return {
+        "files": len(results),
+        "succeeded": len(done),
+        "failed": [{"input": r["input"], "error": r["error"]} for r in results if not r["ok"]],
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "mbPerSecond": total_bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+        "filesPerSecond": len(done) / elapsed if elapsed > 0 else 0.0,
+        "cacheHits": sum(1 for r in done if r.get("cacheHit")),
+        "compressionRate": {
+            "min": rates[0] if rates else 0.0,
+            "p10": _percentile(rates, 10),
+            "p50": _percentile(rates, 50),
+            "p90": _percentile(rates, 90),
+            "max": rates[-1] if rates else 0.0,
+            "mean": sum(rates) / len(rates) if rates else 0.0,
+        },
+    }
+
+
+def compress_batch(source: str, output_dir: str, workers: Optional[int] = None,
+                   pattern: str = "*.txt", recursive: bool = False,
+                   target_tokens: Optional[int] = None,
+                   output_format: str = DEFAULT_FORMAT,
+                   use_cache: bool = True,
+                   cache_dir: Optional[str] = None,
+                   dedup_threshold: Optional[float] = None) -> Dict:
+    """
+    Compress every file of a directory or glob across a process pool
+
+    One output per input is written to output_dir as
+    <relative path>/<stem>.compressed<ext>, ext following output_format
+    (<stem>-<hash> when several inputs would share that name).
+
+    Args:
+        source: Directory or glob expression
+        output_dir: Output directory
+        workers: Worker processes (default: CPU count; 1 runs in-process)
+        pattern: File pattern for directory sources
+        recursive: Search subdirectories of a directory source
+        target_tokens: Token budget per output (see ContextCompressor.compress)
+        output_format: Output codec (context_codec.FORMATS)
+        use_cache: Reuse cached results for unchanged inputs
+        cache_dir: Result cache directory (default: see result_cache.py)
+        dedup_threshold: Near-duplicate similarity for intents/actions (None: off)
+
+    Returns:
+        Summary dictionary (see summarize_batch)
+    """
+    inputs, base = collect_batch_inputs(source, pattern, recursive)
+    output_root = Path(output_dir)
+    # Workers open the cache themselves; None disables it
+    cache_dir = str(ResultCache(cache_dir).cache_dir) if use_cache else None
+    outputs = batch_output_paths(inputs, base, output_root, output_format)
+    jobs = [
+        (str(p), str(output), target_tokens, output_format, cache_dir, dedup_threshold)
+        for p, output in zip(inputs, outputs)
+    ]
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    start = time.perf_counter()
+    if workers == 1 or len(jobs) <= 1:
+        results = [_compress_batch_item(job) for job in jobs]
+    else:
+        # Small files dominate archives: hand out jobs in chunks to cut IPC
+        chunksize = max(1, min(64, len(jobs) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_compress_batch_item, jobs, chunksize=chunksize))
+    return summarize_batch(results, time.perf_counter() - start)
+
+
+def print_batch_summary(summary: Dict) -> None:
+    """Print a batch summary in the CLI's [OK]/[ERROR] style"""
+    rates = summary["compressionRate"]
+    print(f"[OK] Batch compressed {summary['succeeded']}/{summary['files']} files "
+          f"({summary['bytes'] / 1e6:.1f} MB) in {summary['seconds']:.2f}s")
+    print(f"   Throughput: {summary['mbPerSecond']:.2f} MB/s, {summary['filesPerSecond']:.1f} files/s")
+    if summary["cacheHits"]:
+        print(f"   Cache: {summary['cacheHits']} of {summary['succeeded']} results reused")
+    print(f"   Compression rate: min {rates['min']:.1%}  p10 {rates['p10']:.1%}  "
+          f"p50 {rates['p50']:.1%}  p90 {rates['p90']:.1%}  max {rates['max']:.1%}")
+    for failure in summary["failed"]:
+        print(f"[ERROR] {failure['input']}: {failure['error']}", file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Context Compression for Agent Handoffs",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
-  # Estimate current token usage
-  python compress_context.py --estimate-only
+  # Estimate current token usage (only bytes appended since the last call are read)
+  python compress_context.py --estimate-only --transcript ~/.claude/projects/<project>/<session>.jsonl
 
-  # Compress context and update handoff.json
-  python compress_context.py --handoff handoff.json --from-agent research --to-agent product
+  # Compress a session transcript (file, or '-' for stdin) into handoff.json
+  python compress_context.py --handoff handoff.json --from-agent research --to-agent product --transcript session.jsonl
+  cat conversation.txt | python compress_context.py --handoff handoff.json --from-agent research --to-agent product --transcript -
 
   # Compress a text file
   python compress_context.py --compress --input conversation.txt --output compressed.json
 
+  # Compact binary output (readers auto-detect the format)
+  python compress_context.py --compress --input conversation.txt --output compressed.msgpack.gz --format msgpack.gz
+
+  # Compress into a 2,000-token budget (importance-ranked, no fixed caps)
+  python compress_context.py --compress --input conversation.txt --output compressed.json --target-tokens 2000
+
+  # Collapse near-duplicate log lines ("Updated X (1/3)", "(2/3)", ...)
+  python compress_context.py --compress --input conversation.txt --output compressed.json --dedup-threshold 0.85
+
+  # Compress a directory (or glob) of transcripts across 8 processes
+  python compress_context.py --batch archive/ --output-dir compressed/ --workers 8
+  python compress_context.py --batch "archive/**/*.txt" --output-dir compressed/
+
+  # Recompress without the result cache / show cache counters
+  python compress_context.py --compress --input conversation.txt --output compressed.json --no-cache
+  python compress_context.py --cache-stats
+
+  # Re-compress a growing transcript, scanning only the appended part
+  python compress_context.py --compress --input conversation.txt --output compressed.json --incremental
+
 Compression Strategy (Factory.ai 2025):
   - Session Intent: What are we trying to accomplish?
   - Play-by-Play: Key actions taken
@@ -530,6 +1814,10 @@ Compression Strategy (Factory.ai 2025):
 
     parser.add_argument("--estimate-only", action="store_true",
                         help="Estimate current token usage and exit")
+    parser.add_argument("--transcript",
+                        help="Session transcript: JSONL log for --estimate-only; plain text, "
+                             "JSONL or '-' (stdin) for --handoff "
+                             f"(default: ${TRANSCRIPT_ENV})")
     parser.add_argument("--handoff", help="Path to handoff.json file")
     parser.add_argument("--from-agent", help="Source agent ID")
     parser.add_argument("--to-agent", help="Target agent ID")
@@ -537,6 +1825,42 @@ Compression Strategy (Factory.ai 2025):
                         help="Compress input file to output file")
     parser.add_argument("--input", help="Input file path (for --compress)")
     parser.add_argument("--output", help="Output file path (for --compress)")
+    parser.add_argument("--format", dest="output_format", choices=FORMATS,
+                        help="Output codec for --compress/--batch (default: json); "
+                             "--handoff keeps the file's format unless given")
+    parser.add_argument("--target-tokens", type=int,
+                        help="Pack the compressed context into this token budget "
+                             "(replaces the fixed per-section caps)")
+    parser.add_argument("--dedup-threshold", type=float, metavar="SIMILARITY",
+                        help="Drop near-duplicate intents/actions at this SimHash similarity "
+                             "(0-1, e.g. 0.85; default: exact duplicates only)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only scan text appended since the last run (for --compress; "
+                             "--handoff always does unless --full-rescan)")
+    parser.add_argument("--full-rescan", action="store_true",
+                        help="Compress the whole transcript for --handoff, ignoring the state file")
+    parser.add_argument("--state", help="Incremental state file "
+                                        "(default: <input or transcript>.compress-state.json)")
+
+    # Result cache
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompress even if a cached result exists (and do not store one)")
+    parser.add_argument("--cache-dir",
+                        help="Result cache directory (default: $COMPRESS_CACHE_DIR or "
+                             "~/.cache/project-template/compress-context)")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="Print result cache hit/miss counters and size, then exit")
+
+    # Batch mode
+    parser.add_argument("--batch", metavar="DIR_OR_GLOB",
+                        help="Compress every file of a directory or glob (needs --output-dir)")
+    parser.add_argument("--output-dir", help="Output directory (for --batch)")
+    parser.add_argument("--workers", type=int, help="Worker processes for --batch (default: CPU count)")
+    parser.add_argument("--pattern", default="*.txt",
+                        help="File pattern when --batch is a directory (default: *.txt)")
+    parser.add_argument("--recursive", action="store_true",
+                        help="Include subdirectories when --batch is a directory")
+    parser.add_argument("--report", help="Write the batch summary as JSON to this path")
 
     # P1-3: Enhancement options
     parser.add_argument("--enhance", action="store_true",
@@ -556,13 +1880,38 @@ Compression Strategy (Factory.ai 2025):
 
     # Estimate only mode
     if args.estimate_only:
-        tokens = estimate_current_tokens()
+        try:
+            tokens = estimate_current_tokens(args.transcript)
+        except OSError as e:
+            print(f"[ERROR] Cannot read transcript: {e}", file=sys.stderr)
+            sys.exit(1)
         print(tokens)
         sys.exit(0)
 
+    # Result cache counters
+    if args.cache_stats:
+        cache = ResultCache(args.cache_dir)
+        entries, size = cache.usage()
+        totals = cache.totals()
+        lookups = totals["hits"] + totals["misses"]
+        print(f"[INFO] Result cache: {cache.cache_dir}")
+        print(f"   Entries: {entries:,} ({size / 1e6:.1f} MB of {cache.max_bytes / 1e6:.1f} MB)")
+        print(f"   Hits: {totals['hits']:,}  Misses: {totals['misses']:,}  "
+              f"Hit rate: {totals['hits'] / lookups if lookups else 0.0:.1%}")
+        print(f"   Stores: {totals['stores']:,}  Evictions: {totals['evictions']:,}")
+        sys.exit(0)
+
     # Compress with handoff mode
     if args.handoff and args.from_agent and args.to_agent:
-        success = compress_with_handoff(args.handoff, args.from_agent, args.to_agent)
+        success = compress_with_handoff(args.handoff, args.from_agent, args.to_agent,
+                                        target_tokens=args.target_tokens,
+                                        output_format=args.output_format,
+                                        use_cache=not args.no_cache,
+                                        cache_dir=args.cache_dir,
+                                        dedup_threshold=args.dedup_threshold,
+                                        transcript=args.transcript,
+                                        incremental=not args.full_rescan,
+                                        state_path=args.state)
         sys.exit(0 if success else 1)
 
     # Compress file mode
@@ -570,9 +1919,31 @@ Compression Strategy (Factory.ai 2025):
         success = compress_file(args.input, args.output,
                                use_context7=args.use_context7,
                                use_exa=args.use_exa,
-                               exa_api_key=args.exa_api_key)
+                               exa_api_key=args.exa_api_key,
+                               incremental=args.incremental,
+                               state_path=args.state,
+                               target_tokens=args.target_tokens,
+                               output_format=args.output_format or DEFAULT_FORMAT,
+                               use_cache=not args.no_cache,
+                               cache_dir=args.cache_dir,
+                               dedup_threshold=args.dedup_threshold)
         sys.exit(0 if success else 1)
 
+    # Batch mode
+    if args.batch and args.output_dir:
+        summary = compress_batch(args.batch, args.output_dir, workers=args.workers,
+                                 pattern=args.pattern, recursive=args.recursive,
+                                 target_tokens=args.target_tokens,
+                                 output_format=args.output_format or DEFAULT_FORMAT,
+                                 use_cache=not args.no_cache,
+                                 cache_dir=args.cache_dir,
+                                 dedup_threshold=args.dedup_threshold)
+        print_batch_summary(summary)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
+        sys.exit(0 if summary["files"] and not summary["failed"] else 1)
+
     # No valid mode specified
     parser.print_help()
     sys.exit(1)
@@ -0,0 +1,15 @@
+"""
+Shared pytest fixtures for the scripts test suites
+
+Version: 1.0.0
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    """Keep the compressed-result cache out of the user's cache directory"""
+    cache_dir = tmp_path / "result-cache"
+    monkeypatch.setenv("COMPRESS_CACHE_DIR", str(cache_dir))
+    return cache_dir
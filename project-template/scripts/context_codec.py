@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Context Codec - output formats for compressed contexts and handoffs
+
+Purpose: Write compressed contexts smaller and faster to parse than
+indented JSON, and read any supported format back without being told
+which one it is.
+
+Formats:
+  json         Indented JSON (default, human-readable)
+  json-min     Minified JSON
+  msgpack      MessagePack binary (msgpack package if installed,
+               otherwise a built-in encoder/decoder - same bytes)
+  json.gz      Minified JSON, gzip-wrapped
+  msgpack.gz   MessagePack, gzip-wrapped
+  json.zst     Minified JSON, zstd-wrapped (needs: pip install zstandard)
+  msgpack.zst  MessagePack, zstd-wrapped (needs: pip install zstandard)
+
+Detection (decode/load): gzip (1f 8b) and zstd (28 b5 2f fd) magic bytes
+are unwrapped first; then '{' / '[' means JSON and a MessagePack map or
+array header means MessagePack.
+
+Usage:
+  from context_codec import dump, load
+  dump(compressed, "compressed.msgpack.gz", "msgpack.gz")
+  compressed = load("compressed.msgpack.gz")   # format auto-detected
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import gzip
+import json
+import struct
+from typing import Any, Dict, List, Tuple
+
+# Optional fast MessagePack implementation
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# Optional zstd wrapper
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+
+# ============================================================
+# Formats
+# ============================================================
+FORMATS = ("json", "json-min", "msgpack", "json.gz", "msgpack.gz", "json.zst", "msgpack.zst")
+DEFAULT_FORMAT = "json"
+
+FORMAT_EXTENSIONS = {
+    "json": ".json",
+    "json-min": ".json",
+    "msgpack": ".msgpack",
+    "json.gz": ".json.gz",
+    "msgpack.gz": ".msgpack.gz",
+    "json.zst": ".json.zst",
+    "msgpack.zst": ".msgpack.zst",
+}
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+# ============================================================
+# Built-in MessagePack (subset: nil, bool, int, float, str, bin, array, map)
+# ============================================================
+def _pack(obj: Any, out: List[bytes]) -> None:
+    if obj is None:
+        out.append(b'\xc0')
+    elif obj is True:
+        out.append(b'\xc3')
+    elif obj is False:
+        out.append(b'\xc2')
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(bytes((obj,)))
+        elif -32 <= obj < 0:
+            out.append(bytes((obj & 0xff,)))
+        elif 0 <= obj <= 0xffffffffffffffff:
+            for fmt, code in (('>B', 0xcc), ('>H', 0xcd), ('>I', 0xce), ('>Q', 0xcf)):
+                if obj < 1 << (8 * struct.calcsize(fmt)):
+                    out.append(bytes((code,)) + struct.pack(fmt, obj))
+                    break
+        elif -(1 << 63) <= obj < 0:
+            for fmt, code in (('>b', 0xd0), ('>h', 0xd1), ('>i', 0xd2), ('>q', 0xd3)):
+                if obj >= -(1 << (8 * struct.calcsize(fmt) - 1)):
+                    out.append(bytes((code,)) + struct.pack(fmt, obj))
+                    break
+        else:
+            raise OverflowError(f"Integer out of MessagePack range: {obj}")
+    elif isinstance(obj, float):
+        out.append(b'\xcb' + struct.pack('>d', obj))
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        n = len(data)
+        if n < 32:
+            out.append(bytes((0xa0 | n,)))
+        elif n < 0x100:
+            out.append(b'\xd9' + struct.pack('>B', n))
+        elif n < 0x10000:
+            out.append(b'\xda' + struct.pack('>H', n))
+        else:
+            out.append(b'\xdb' + struct.pack('>I', n))
+        out.append(data)
+    elif isinstance(obj, (bytes, bytearray)):
+        n = len(obj)
+        if n < 0x100:
+            out.append(b'\xc4' + struct.pack('>B', n))
+        elif n < 0x10000:
+            out.append(b'\xc5' + struct.pack('>H', n))
+        else:
+            out.append(b'\xc6' + struct.pack('>I', n))
+        out.append(bytes(obj))
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(bytes((0x90 | n,)))
+        elif n < 0x10000:
+            out.append(b'\xdc' + struct.pack('>H', n))
+        else:
+            out.append(b'\xdd' + struct.pack('>I', n))
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(bytes((0x80 | n,)))
+        elif n < 0x10000:
+            out.append(b'\xde' + struct.pack('>H', n))
+        else:
+            out.append(b'\xdf' + struct.pack('>I', n))
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+# Fixed-size headers: code -> (struct format, kind)
+_UNPACK_HEADERS = {
+    0xcc: ('>B', 'scalar'), 0xcd: ('>H', 'scalar'), 0xce: ('>I', 'scalar'), 0xcf: ('>Q', 'scalar'),
+    0xd0: ('>b', 'scalar'), 0xd1: ('>h', 'scalar'), 0xd2: ('>i', 'scalar'), 0xd3: ('>q', 'scalar'),
+    0xca: ('>f', 'scalar'), 0xcb: ('>d', 'scalar'),
+    0xd9: ('>B', 'str'), 0xda: ('>H', 'str'), 0xdb: ('>I', 'str'),
+    0xc4: ('>B', 'bin'), 0xc5: ('>H', 'bin'), 0xc6: ('>I', 'bin'),
+    0xdc: ('>H', 'array'), 0xdd: ('>I', 'array'),
+    0xde: ('>H', 'map'), 0xdf: ('>I', 'map'),
+}
+
+
+def _unpack(data: bytes, pos: int) -> Tuple[Any, int]:
+    code = data[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xe0:
+        return code - 0x100, pos
+    if 0xa0 <= code <= 0xbf:
+        kind, n = 'str', code & 0x1f
+    elif 0x90 <= code <= 0x9f:
+        kind, n = 'array', code & 0x0f
+    elif 0x80 <= code <= 0x8f:
+        kind, n = 'map', code & 0x0f
+    elif code == 0xc0:
+        return None, pos
+    elif code == 0xc2:
+        return False, pos
+    elif code == 0xc3:
+        return True, pos
+    elif code in _UNPACK_HEADERS:
+        fmt, kind = _UNPACK_HEADERS[code]
+        size = struct.calcsize(fmt)
+        (n,) = struct.unpack_from(fmt, data, pos)
+        pos += size
+        if kind == 'scalar':
+            return n, pos
+    else:
+        raise ValueError(f"Unsupported MessagePack type byte 0x{code:02x} at offset {pos - 1}")
+
+    if kind == 'str':
+        if pos + n > len(data):
+            raise ValueError("Truncated MessagePack data")
+        return data[pos:pos + n].decode('utf-8'), pos + n
+    if kind == 'bin':
+        if pos + n > len(data):
+            raise ValueError("Truncated MessagePack data")
+        return data[pos:pos + n], pos + n
+    if kind == 'array':
+        items = []
+        for _ in range(n):
+            item, pos = _unpack(data, pos)
+            items.append(item)
+        return items, pos
+    mapping = {}
+    for _ in range(n):
+        key, pos = _unpack(data, pos)
+        value, pos = _unpack(data, pos)
+        mapping[key] = value
+    return mapping, pos
+
+
+def msgpack_dumps(obj: Any) -> bytes:
+    """Serialize to MessagePack"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.packb(obj, use_bin_type=True)
+    out: List[bytes] = []
+    _pack(obj, out)
+    return b''.join(out)
+
+
+def msgpack_loads(data: bytes) -> Any:
+    """Deserialize MessagePack"""
+    if MSGPACK_AVAILABLE:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    try:
+        obj, pos = _unpack(data, 0)
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"Truncated MessagePack data: {e}") from e
+    if pos != len(data):
+        raise ValueError(f"Extra data after MessagePack object at offset {pos}")
+    return obj
+
+
+# ============================================================
+# Encode / decode
+# ============================================================
+def _require_zstd() -> None:
+    if not ZSTD_AVAILABLE:
+        raise ImportError("zstandard not installed. Install with: pip install zstandard")
+
+
+def encode(obj: Any, fmt: str = DEFAULT_FORMAT) -> bytes:
+    """
+    Serialize obj in the given format
+
+    Raises:
+        ValueError: unknown format
+        ImportError: zstd format without the zstandard package
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt!r} (choose from {', '.join(FORMATS)})")
+
+    if fmt == "json":
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+    base, _, wrapper = fmt.partition('.')
+    if base in ("json", "json-min"):
+        payload = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    else:
+        payload = msgpack_dumps(obj)
+
+    if wrapper == "gz":
+        return gzip.compress(payload, compresslevel=GZIP_LEVEL, mtime=0)
+    if wrapper == "zst":
+        _require_zstd()
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return payload
+
+
+def _unwrap(data: bytes) -> Tuple[bytes, str]:
+    """Strip a gzip / zstd wrapper: (payload, "" / ".gz" / ".zst")"""
+    if data[:2] == GZIP_MAGIC:
+        return gzip.decompress(data), ".gz"
+    if data[:4] == ZSTD_MAGIC:
+        _require_zstd()
+        return zstandard.ZstdDecompressor().decompress(data), ".zst"
+    return data, ""
+
+
+def detect_format(data: bytes) -> str:
+    """
+    Detect the format of serialized data from its magic bytes
+
+    Returns:
+        A FORMATS name ("json" covers indented and minified JSON)
+
+    Raises:
+        ValueError: unrecognized data
+    """
+    payload, wrapper = _unwrap(data)
+    return _detect_base(payload) + wrapper
+
+
+def _detect_base(data: bytes) -> str:
+    head = data[:64].lstrip(b' \t\r\n')
+    if head.startswith(b'\xef\xbb\xbf'):
+        head = head[3:].lstrip(b' \t\r\n')
+    if head[:1] in (b'{', b'['):
+        return "json"
+    if head and (0x80 <= head[0] <= 0x9f or head[0] in (0xdc, 0xdd, 0xde, 0xdf)):
+        return "msgpack"
+    raise ValueError("Unrecognized data: not JSON, MessagePack, gzip or zstd")
+
+
+def _decode_payload(payload: bytes, base: str) -> Any:
+    if base == "json":
+        return json.loads(payload.decode('utf-8-sig'))
+    return msgpack_loads(payload)
+
+
+def decode(data: bytes) -> Any:
+    """Deserialize data in any supported format (auto-detected)"""
+    payload, _ = _unwrap(data)
+    return _decode_payload(payload, _detect_base(payload))
+
+
+def dump(obj: Any, path: str, fmt: str = DEFAULT_FORMAT) -> int:
+    """Write obj to path in the given format, returning the bytes written"""
+    data = encode(obj, fmt)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def load(path: str) -> Any:
+    """Read a file written in any supported format"""
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def load_with_format(path: str) -> Tuple[Any, str]:
+    """Read a file and also report its detected format (for write-back)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    # Decompress once: detection and decoding share the payload
+    payload, wrapper = _unwrap(data)
+    base = _detect_base(payload)
+    fmt = base + wrapper
+    if fmt == "json" and b'\n' not in data.strip():
+        fmt = "json-min"
+    return _decode_payload(payload, base), fmt
+
+
+def available_formats() -> Dict[str, bool]:
+    """Format name -> usable in this environment"""
+    return {fmt: ZSTD_AVAILABLE or not fmt.endswith(".zst") for fmt in FORMATS}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Keyword Matcher - shared multi-pattern scanning for extractors
+
+Purpose: Report every keyword hit of a line in one call instead of running
+`any(kw in line for kw in ...)` once per keyword list.
+
+Design:
+  - All keywords of all groups compile into a single regex alternation
+    (longest first), built once when the owning module loads
+  - Case-insensitive groups are matched against `line.lower()`, mirroring
+    the original `kw in line.lower()` checks exactly
+  - Keywords that may hide inside (or overlap) a longer match are
+    re-checked with `in`, so hits are identical to independent substring
+    checks
+
+Usage:
+  matcher = KeywordMatcher({"action": ["created", "fixed"], "noise": ["TODO:"]},
+                           ignore_case_groups=("action",))
+  hits = matcher.scan("Fixed: TODO: cleanup")
+  # {"action": {"fixed"}, "noise": {"TODO:"}}
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class _Alternation:
+    """Single compiled alternation over one keyword set"""
+
+    def __init__(self, keywords: Iterable[str], owners: Dict[str, Tuple[str, ...]],
+                 folded: bool):
+        self.keywords = sorted(set(keywords), key=lambda kw: (-len(kw), kw))
+        self.pattern = re.compile('|'.join(re.escape(kw) for kw in self.keywords))
+        self.partners = self._find_partners(self.keywords)
+        self.owners = owners
+        self.folded = folded
+
+    @staticmethod
+    def _find_partners(keywords: List[str]) -> Dict[str, Tuple[str, ...]]:
+        """
+        Map each keyword to keywords that can hide behind one of its matches
+
+        A keyword hides when it is contained in a reported match or overlaps
+        its end (suffix of one == prefix of the other). Non-overlapping regex
+        scanning skips those occurrences, so they are re-checked explicitly.
+        """
+        partners = {}
+        for kw in keywords:
+            hidden = []
+            for other in keywords:
+                if other == kw:
+                    continue
+                contained = other in kw
+                overlaps = any(
+                    kw.endswith(other[:size]) for size in range(1, min(len(kw), len(other)))
+                )
+                if contained or overlaps:
+                    hidden.append(other)
+            if hidden:
+                partners[kw] = tuple(hidden)
+        return partners
+
+    def find(self, text: str) -> Set[str]:
+        """Return every keyword occurring in text"""
+        found = set(self.pattern.findall(text))
+        if found and self.partners:
+            for kw in found.intersection(self.partners):
+                for partner in self.partners[kw]:
+                    if partner in text:
+                        found.add(partner)
+        return found
+
+
+class KeywordMatcher:
+    """
+    Grouped multi-keyword matcher
+
+    Args:
+        groups: {group_name: keywords}; a keyword may belong to several groups
+        ignore_case_groups: groups matched against the lowercased line
+                            (keywords of these groups should be lowercase)
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]],
+                 ignore_case_groups: Iterable[str] = ()):
+        ignore_case_groups = set(ignore_case_groups)
+        unknown = ignore_case_groups - set(groups)
+        if unknown:
+            raise ValueError(f"Unknown ignore-case groups: {sorted(unknown)}")
+
+        self.groups = {name: list(keywords) for name, keywords in groups.items()}
+
+        self._passes: List[_Alternation] = []
+        for folded in (False, True):
+            owners = self._owners({
+                name: keywords for name, keywords in self.groups.items()
+                if (name in ignore_case_groups) == folded
+            })
+            if owners:
+                self._passes.append(_Alternation(owners, owners, folded))
+
+    @staticmethod
+    def _owners(groups: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+        """Map keyword -> names of the groups it belongs to"""
+        owners: Dict[str, List[str]] = {}
+        for name, keywords in groups.items():
+            for kw in keywords:
+                owners.setdefault(kw, []).append(name)
+        return {kw: tuple(names) for kw, names in owners.items()}
+
+    def scan(self, line: str) -> Dict[str, Set[str]]:
+        """
+        Report all keyword hits of a line
+
+        Returns:
+            {group_name: keywords found} for groups with hits only. Use
+            `line.find(keyword)` (or `line.lower().find` for ignore-case
+            groups) when the position of a hit is needed.
+        """
+        result: Dict[str, Set[str]] = {}
+        for alternation in self._passes:
+            found = alternation.find(line.lower() if alternation.folded else line)
+            for kw in found:
+                for name in alternation.owners[kw]:
+                    if name in result:
+                        result[name].add(kw)
+                    else:
+                        result[name] = {kw}
+        return result
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Filter - streaming SimHash suppression of repeated lines
+
+Purpose: Agent logs repeat slightly different lines thousands of times
+("Updated file X (1/3)", "Updated file X (2/3)", ...). Exact-match
+deduplication keeps every variant, so they crowd out real actions.
+This filter keeps the first line of each near-duplicate family.
+
+Method:
+  - 64-bit SimHash over character 3-grams of the lowercased,
+    whitespace-collapsed line; digit runs are folded to one placeholder
+    so counters, progress fractions and timestamps do not separate
+    otherwise identical lines
+  - similarity = 1 - hamming_distance / 64; lines at or above the
+    threshold are near-duplicates
+  - LSH banding: the signature is split into (max_distance + 1) bands, so
+    any signature within max_distance shares at least one band exactly
+    (pigeonhole). Lookups probe one bucket per band.
+  - Bounded table: at most `capacity` signatures (oldest evicted first)
+    and `bucket_size` per bucket, so each line costs O(1) regardless of
+    input length
+
+Usage:
+  from near_duplicate import NearDuplicateFilter
+  dedup = NearDuplicateFilter(threshold=0.85)
+  for line in lines:
+      if dedup.match(line) is None:
+          keep(line)
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import hashlib
+import re
+import struct
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+SIGNATURE_BITS = 64
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_CAPACITY = 4096
+DEFAULT_BUCKET_SIZE = 8
+
+# SimHash bit counts are summed in 16-bit lanes of one big integer:
+# LANE_SPREAD[b] places bit i of byte b at bit 16*i of the result
+_LANE_BITS = 16
+_LANE_MASK = (1 << _LANE_BITS) - 1
+LANE_SPREAD = [
+    sum(1 << (_LANE_BITS * i) for i in range(8) if value >> i & 1)
+    for value in range(256)
+]
+_LANES = struct.Struct(f'<{SIGNATURE_BITS}H')
+_MAX_SHINGLE_CACHE = 1 << 16
+
+_WHITESPACE = re.compile(r'\s+')
+_DIGITS = re.compile(r'\d+')
+
+
+def _shingle_lanes(shingle: str) -> int:
+    """Lane-spread 64-bit hash of one shingle"""
+    h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+    lanes = 0
+    for byte_index in range(8):
+        lanes |= LANE_SPREAD[h >> (8 * byte_index) & 0xff] << (8 * _LANE_BITS * byte_index)
+    return lanes
+
+
+_shingle_cache: Dict[str, int] = {}
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of text (character 3-grams, case/whitespace/digit-insensitive)"""
+    normalized = _DIGITS.sub('0', _WHITESPACE.sub(' ', text.strip().lower()))
+    if len(normalized) < SHINGLE_SIZE:
+        normalized = normalized.ljust(SHINGLE_SIZE)
+
+    cache = _shingle_cache
+    if len(cache) > _MAX_SHINGLE_CACHE:
+        cache.clear()
+
+    # Lane counts are 16-bit: cap the shingles so no lane can overflow
+    count = min(len(normalized) - SHINGLE_SIZE + 1, _LANE_MASK)
+    shingles = [normalized[i:i + SHINGLE_SIZE] for i in range(count)]
+    for shingle in shingles:
+        if shingle not in cache:
+            cache[shingle] = _shingle_lanes(shingle)
+    totals = sum(map(cache.__getitem__, shingles))
+
+    lanes = _LANES.unpack(totals.to_bytes(_LANES.size, 'little'))
+    signature = 0
+    for bit, ones in enumerate(lanes):
+        if 2 * ones > count:
+            signature |= 1 << bit
+    return signature
+
+
+if hasattr(int, "bit_count"):  # Python 3.10+
+    def hamming_distance(a: int, b: int) -> int:
+        return (a ^ b).bit_count()
+else:
+    def hamming_distance(a: int, b: int) -> int:
+        return bin(a ^ b).count('1')
+
+
+def max_distance_for(threshold: float) -> int:
+    """Largest Hamming distance still counted as similar at threshold"""
+    return int((1.0 - threshold) * SIGNATURE_BITS + 1e-9)
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detector over a bounded signature table
+
+    match(text) returns the previously seen representative text that text
+    is a near-duplicate of, or None (text then becomes a representative
+    itself). Thresholds below ~0.8 make bands narrow enough that buckets
+    fill up; recall then degrades gracefully (bucket_size bounds the work).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD,
+                 capacity: int = DEFAULT_CAPACITY,
+                 bucket_size: int = DEFAULT_BUCKET_SIZE):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Near-duplicate threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.bucket_size = bucket_size
+        self.max_distance = max_distance_for(threshold)
+
+        # Band layout: (shift, mask) per band, widths as even as possible
+        bands = self.max_distance + 1
+        self._bands: List[Tuple[int, int]] = []
+        shift = 0
+        for band in range(bands):
+            width = SIGNATURE_BITS // bands + (1 if band < SIGNATURE_BITS % bands else 0)
+            self._bands.append((shift, (1 << width) - 1))
+            shift += width
+
+        self._order: Deque[Tuple[int, str]] = deque()
+        self._buckets: Dict[int, List[Tuple[int, str]]] = {}
+
+    def _band_keys(self, signature: int) -> List[int]:
+        return [
+            (band << SIGNATURE_BITS) | (signature >> shift & mask)
+            for band, (shift, mask) in enumerate(self._bands)
+        ]
+
+    def match(self, text: str) -> Optional[str]:
+        """Representative text that text near-duplicates, else None (and remember text)"""
+        signature = simhash(text)
+        keys = self._band_keys(signature)
+
+        max_distance = self.max_distance
+        buckets = self._buckets
+        for key in keys:
+            for other, representative in buckets.get(key, ()):
+                if hamming_distance(signature, other) <= max_distance:
+                    return representative
+
+        self._add(signature, text, keys)
+        return None
+
+    def is_duplicate(self, text: str) -> bool:
+        return self.match(text) is not None
+
+    def _add(self, signature: int, text: str, keys: List[int]) -> None:
+        entry = (signature, text)
+        self._order.append(entry)
+        for key in keys:
+            bucket = self._buckets.setdefault(key, [])
+            bucket.append(entry)
+            if len(bucket) > self.bucket_size:
+                bucket.pop(0)
+
+        if len(self._order) > self.capacity:
+            old = self._order.popleft()
+            for key in self._band_keys(old[0]):
+                bucket = self._buckets.get(key)
+                if bucket and old in bucket:
+                    bucket.remove(old)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def get_state(self) -> Dict:
+        return {"threshold": self.threshold,
+                "entries": [[signature, text] for signature, text in self._order]}
+
+    def load_state(self, state: Dict) -> None:
+        if state.get("threshold") != self.threshold:
+            raise ValueError("Near-duplicate state was created with a different threshold")
+        self._order.clear()
+        self._buckets.clear()
+        for signature, text in state["entries"]:
+            self._add(int(signature), text, self._band_keys(int(signature)))
+
+
+def filter_near_duplicates(texts: List[str], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Keep the first text of each near-duplicate family, in order"""
+    dedup = NearDuplicateFilter(threshold)
+    return [text for text in texts if dedup.match(text) is None]
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Result Cache - content-addressed on-disk cache for compressed contexts
+
+Purpose: Return the stored compressed result when the same input is
+compressed again (archived sessions, retries after downstream failures)
+instead of re-running every extractor.
+
+Features:
+  - Key = SHA-256(input bytes) + compressor-version fingerprint
+  - Entries stored as gzip-wrapped minified JSON, written atomically
+  - LRU eviction by total size (entry mtime is refreshed on every hit)
+  - Hit/miss/store/eviction counters, per instance and persisted
+    (merged into stats.json once per run by flush_stats(), under a lock)
+
+Location: $COMPRESS_CACHE_DIR, else $XDG_CACHE_HOME/project-template/
+compress-context (~/.cache/... by default). Size limit:
+$COMPRESS_CACHE_MAX_BYTES (default 256 MB).
+
+Usage:
+  from result_cache import ResultCache, file_sha256
+  cache = ResultCache()
+  key = cache.key(file_sha256("conversation.txt"), fingerprint)
+  compressed = cache.get(key)
+  if compressed is None:
+      compressed = compress(...)
+      cache.put(key, compressed)
+  cache.flush_stats()
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from context_codec import decode, encode
+
+try:
+    import fcntl
+except ImportError:  # Windows: counters merge without a lock
+    fcntl = None
+
+
+# ============================================================
+# Settings
+# ============================================================
+CACHE_DIR_ENV = "COMPRESS_CACHE_DIR"
+CACHE_MAX_BYTES_ENV = "COMPRESS_CACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+ENTRY_FORMAT = "json.gz"
+ENTRY_SUFFIX = ".json.gz"
+STATS_FILE = "stats.json"
+HASH_CHUNK_BYTES = 1 << 20
+
+COUNTERS = ("hits", "misses", "stores", "evictions")
+
+
+def default_cache_dir() -> Path:
+    """Cache directory from the environment (see module docstring)"""
+    configured = os.environ.get(CACHE_DIR_ENV)
+    if configured:
+        return Path(configured).expanduser()
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "project-template" / "compress-context"
+
+
+def bytes_sha256(data: bytes) -> str:
+    """Hex SHA-256 of in-memory input"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file, read in 1MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ============================================================
+# Cache
+# ============================================================
+class ResultCache:
+    """
+    Content-addressed compressed-result cache with size-bounded LRU eviction
+
+    max_bytes is a soft limit: each process tracks the bytes it has added
+    since its last directory scan and evicts when its running total goes
+    over, so concurrent writers can overshoot until the next scan.
+    Counters are kept in memory; flush_stats() merges them into
+    stats.json under an exclusive lock, so concurrent writers (batch
+    workers) do not lose each other's counts.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else default_cache_dir()
+        if max_bytes is None:
+            max_bytes = int(os.environ.get(CACHE_MAX_BYTES_ENV, DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self._unflushed: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self._total_bytes: Optional[int] = None  # unknown until the first scan
+
+    @staticmethod
+    def key(content_sha256: str, fingerprint: str) -> str:
+        """Cache key for an input digest under a compressor fingerprint"""
+        return hashlib.sha256(f"{content_sha256}:{fingerprint}".encode('ascii')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / (key + ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Stored result for key, or None (unreadable entries are dropped)"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = decode(f.read())
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, ValueError, EOFError) as e:
+            print(f"[WARNING] Dropping unreadable cache entry {path.name}: {e}")
+            self._remove(path)
+            self._count("misses")
+            return None
+
+        try:
+            os.utime(path)  # LRU: most recently used = newest mtime
+        except OSError:
+            pass
+        self._count("hits")
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value under key (atomic write), then evict if over the limit"""
+        data = encode(value, ENTRY_FORMAT)
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".entry-", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self._total_bytes is None:
+            self._total_bytes = self.usage()[1]
+        else:
+            self._total_bytes += len(data)
+        self._count("stores")
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry"""
+        entries = []
+        if not self.cache_dir.is_dir():
+            return entries
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue  # evicted by another process
+                    entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return entries
+
+    def usage(self) -> Tuple[int, int]:
+        """(entry count, total bytes) on disk"""
+        entries = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Remove least recently used entries until total <= max_bytes"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            if self._remove(path):
+                removed += 1
+            total -= size
+        self._total_bytes = total
+        if removed:
+            self._count("evictions", removed)
+        return removed
+
+    def clear(self) -> int:
+        """Remove every entry"""
+        return self.evict(0)
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    # --------------------------------------------------------
+    # Counters
+    # --------------------------------------------------------
+    def _count(self, name: str, amount: int = 1) -> None:
+        self.stats[name] += amount
+        self._unflushed[name] += amount
+
+    def flush_stats(self) -> None:
+        """Merge counts not yet persisted into stats.json (once per run)"""
+        if not any(self._unflushed.values()):
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_dir / (STATS_FILE + ".lock"), 'a+b') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                totals = self._stored_totals()
+                for name, amount in self._unflushed.items():
+                    totals[name] += amount
+                fd, tmp_path = tempfile.mkstemp(prefix=".stats-", dir=str(self.cache_dir))
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(totals, f)
+                os.replace(tmp_path, self.cache_dir / STATS_FILE)
+        except OSError:
+            return  # counters are advisory; never fail a compression over them
+        self._unflushed = {name: 0 for name in COUNTERS}
+
+    def _stored_totals(self) -> Dict[str, int]:
+        try:
+            with open(self.cache_dir / STATS_FILE, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        return {name: int(stored.get(name, 0)) for name in COUNTERS}
+
+    def totals(self) -> Dict[str, int]:
+        """Counters accumulated across runs (stats.json plus unflushed counts)"""
+        stored = self._stored_totals()
+        return {name: stored[name] + self._unflushed[name] for name in COUNTERS}
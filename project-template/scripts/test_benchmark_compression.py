@@ -0,0 +1,63 @@
+"""
+Compression benchmark suite tests
+
+Covers transcript generation, a small in-process run and regression
+detection; timings themselves are not asserted.
+
+Version: 1.0.0
+"""
+
+import copy
+
+import pytest
+
+from benchmark_compression import (
+    compare_results,
+    generate_transcript,
+    parse_size,
+    run_benchmark,
+)
+
+
+@pytest.fixture(scope="module")
+def document(tmp_path_factory):
+    work_dir = tmp_path_factory.mktemp("bench")
+    return run_benchmark(["64KB"], work_dir=str(work_dir), isolate=False)
+
+
+class TestBenchmark:
+    """run / compare"""
+
+    def test_parse_size(self):
+        assert parse_size("64KB") == 64 * 1024
+        assert parse_size("1gb") == 1024 ** 3
+        with pytest.raises(ValueError):
+            parse_size("10 parsecs")
+
+    def test_generated_transcript_reaches_size(self, tmp_path):
+        path = generate_transcript(tmp_path / "t.txt", 200 * 1024)
+
+        assert path.stat().st_size >= 200 * 1024
+        assert "_3.py" in path.read_text(encoding="utf-8")  # copies are varied
+
+    def test_run_document_shape(self, document):
+        result = document["results"]["64KB"]
+
+        assert result["bytes"] >= 64 * 1024
+        assert set(result["extractors"]) == {"sessionIntent", "playByPlay", "artifacts", "breadcrumbs"}
+        assert result["endToEnd"]["mbPerSecond"] > 0
+        assert 0 < result["endToEnd"]["compressionRate"] <= 1
+        assert set(result["estimateTokens"]) == {"lineUs", "block4kbUs", "block1mbUs", "cachedUs"}
+
+    def test_identical_runs_have_no_regressions(self, document):
+        assert compare_results(document, document) == []
+
+    def test_slower_run_is_flagged(self, document):
+        current = copy.deepcopy(document)
+        e2e = current["results"]["64KB"]["endToEnd"]
+        e2e["mbPerSecond"] *= 0.5
+        e2e["compressionRate"] -= 0.1
+
+        flagged = {r["metric"] for r in compare_results(document, current, threshold=0.1)}
+
+        assert flagged == {"64KB endToEnd.mbPerSecond", "64KB endToEnd.compressionRate"}
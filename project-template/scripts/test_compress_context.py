@@ -0,0 +1,519 @@
+"""
+ContextCompressor test suite
+
+Covers:
+- Single-pass streaming engine (compress_stream) parity with compress()
+- Per-extractor wrappers (extract_*) parity with the combined pass
+- Incremental (append-only) compression and sidecar state files
+- Batch (directory / glob) compression across a process pool
+- Ranked artifact index
+- Token-budget mode (compress(target_tokens=N))
+- Transcript-backed token estimates with checkpoints (estimate_current_tokens)
+- Handoff updates from streamed transcripts (compress_with_handoff)
+
+Version: 1.0.0
+"""
+
+import io
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import compress_context
+from compress_context import (
+    ArtifactExtractor,
+    ContextCompressor,
+    PLACEHOLDER_TOKENS,
+    compress_batch,
+    compress_file_incremental,
+    compress_with_handoff,
+    estimate_current_tokens,
+    estimate_tokens,
+    iter_lines,
+)
+from context_codec import dump, load
+from transcript_reader import render_transcript_lines
+
+
+FIXTURES_DIR = Path(__file__).parent.parent.parent / "data" / "tests"
+
+SAMPLE_CONVERSATION = """User: Implement dynamic memory compression for agent handoffs
+Assistant: I'll create a compression system based on Factory.ai 2025 best practices...
+Created: project-template/scripts/compress_context.py
+Modified: README.md
+Fixed: path bug in C:\\work\\handoff.json
+def compress_context(conversation):
+    compressor = ContextCompressor()
+    return compressor.compress(conversation)
+User: 請確認輸出與原本完全一致，包含中文 token 估算
+"""
+
+
+def _without_timestamp(compressed):
+    compressed["compressionMetadata"].pop("timestamp")
+    return compressed
+
+
+@pytest.fixture(params=sorted(FIXTURES_DIR.glob("*_conversation.txt")) or [None])
+def conversation(request):
+    """Fixture transcripts (falls back to the inline sample)"""
+    if request.param is None:
+        return SAMPLE_CONVERSATION
+    return request.param.read_text(encoding="utf-8")
+
+
+class TestStreamingEngine:
+    """compress_stream must match compress() exactly"""
+
+    def test_file_object_matches_string(self, conversation):
+        expected = _without_timestamp(ContextCompressor().compress(conversation))
+        actual = _without_timestamp(ContextCompressor().compress_stream(io.StringIO(conversation)))
+
+        assert actual == expected
+
+    def test_line_iterable_matches_string(self, conversation):
+        expected = _without_timestamp(ContextCompressor().compress(conversation))
+        lines = conversation.splitlines(keepends=True)
+        actual = _without_timestamp(ContextCompressor().compress_stream(iter(lines)))
+
+        assert actual == expected
+
+    def test_original_tokens_match_full_text_estimate(self, conversation):
+        compressed = ContextCompressor().compress(conversation)
+
+        assert compressed["compressionMetadata"]["originalTokens"] == estimate_tokens(conversation)
+
+    def test_extractor_wrappers_match_combined_pass(self, conversation):
+        compressor = ContextCompressor()
+        compressed = ContextCompressor().compress(conversation)
+
+        assert compressor.extract_session_intent(conversation) == compressed["sessionIntent"]
+        assert compressor.extract_play_by_play(conversation) == compressed["playByPlay"]
+        assert compressor.extract_artifacts(conversation) == compressed["artifacts"]
+        assert compressor.extract_breadcrumbs(conversation) == compressed["breadcrumbs"]
+
+    def test_caps_are_enforced(self):
+        conversation = "".join(
+            f"User: please handle request number {i} carefully\n"
+            f"Updated file src/module_{i}.py with change {i}\n"
+            f"def handler_{i}(event):\n"
+            for i in range(100)
+        )
+        compressed = ContextCompressor().compress(conversation)
+
+        assert len(compressed["sessionIntent"]) == 5
+        assert len(compressed["playByPlay"]) == 15
+        assert len(compressed["breadcrumbs"]) == 40
+
+    def test_iter_lines_keeps_terminators(self):
+        assert list(iter_lines("a\nb\n\nc")) == ["a\n", "b\n", "\n", "c"]
+        assert list(iter_lines("")) == []
+
+
+class TestIncrementalCompression:
+    """compress_incremental / compress_file_incremental must match compress()"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+    def test_chunked_appends_match_full_compress(self, conversation, chunk_size):
+        expected = _without_timestamp(ContextCompressor().compress(conversation))
+
+        state = None
+        for start in range(0, len(conversation), chunk_size * 37):
+            chunk = conversation[start:start + chunk_size * 37]
+            compressed, state = ContextCompressor().compress_incremental(chunk, state)
+            state = json.loads(json.dumps(state))  # must survive serialization
+
+        assert _without_timestamp(compressed) == expected
+
+    def test_state_from_other_settings_is_rejected(self):
+        _, state = ContextCompressor().compress_incremental(SAMPLE_CONVERSATION)
+
+        compressor = ContextCompressor()
+        compressor.noise_patterns.append("Assistant:")
+        with pytest.raises(ValueError):
+            compressor.compress_incremental("more\n", state)
+
+    def test_sidecar_resumes_and_recovers(self, tmp_path):
+        input_path = tmp_path / "conversation.txt"
+        lines = SAMPLE_CONVERSATION.splitlines(keepends=True)
+        input_path.write_text("".join(lines[:4]), encoding="utf-8")
+
+        compress_file_incremental(str(input_path))
+        with open(input_path, "a", encoding="utf-8") as f:
+            f.write("".join(lines[4:]))
+        compressed = compress_file_incremental(str(input_path))
+
+        sidecar = json.loads((tmp_path / "conversation.txt.compress-state.json").read_text())
+        assert sidecar["offset"] == input_path.stat().st_size
+        assert _without_timestamp(compressed) == \
+            _without_timestamp(ContextCompressor().compress(SAMPLE_CONVERSATION))
+
+        # Rewritten (not appended) file: the state is discarded
+        input_path.write_text("User: start over with something new\n", encoding="utf-8")
+        compressed = compress_file_incremental(str(input_path))
+        assert compressed["sessionIntent"] == ["start over with something new"]
+
+    def test_file_remainder_is_streamed_in_chunks(self, tmp_path):
+        input_path = tmp_path / "conversation.txt"
+        input_path.write_text(SAMPLE_CONVERSATION, encoding="utf-8")
+
+        # Chunks split lines and multi-byte characters anywhere
+        reader = compress_context._Utf8Reader(str(input_path), 0, chunk_bytes=5)
+        compressed, _ = ContextCompressor().compress_incremental(reader)
+
+        assert reader.end_offset == input_path.stat().st_size
+        assert _without_timestamp(compressed) == \
+            _without_timestamp(ContextCompressor().compress(SAMPLE_CONVERSATION))
+
+    def test_split_utf8_sequence_is_not_consumed(self, tmp_path):
+        input_path = tmp_path / "conversation.txt"
+        data = SAMPLE_CONVERSATION.encode("utf-8")
+        split = data.index("確".encode("utf-8")) + 1
+        input_path.write_bytes(data[:split])
+
+        compress_file_incremental(str(input_path))
+        with open(input_path, "ab") as f:
+            f.write(data[split:])
+        compressed = compress_file_incremental(str(input_path))
+
+        assert _without_timestamp(compressed) == \
+            _without_timestamp(ContextCompressor().compress(SAMPLE_CONVERSATION))
+
+
+class TestBatchCompression:
+    """compress_batch writes one output per input, identical to compress()"""
+
+    @pytest.fixture
+    def archive(self, tmp_path):
+        root = tmp_path / "archive"
+        (root / "2025").mkdir(parents=True)
+        for i in range(3):
+            (root / f"session_{i}.txt").write_text(
+                SAMPLE_CONVERSATION + f"User: follow-up request {i}\n", encoding="utf-8")
+        (root / "2025" / "old.txt").write_text(SAMPLE_CONVERSATION, encoding="utf-8")
+        (root / "notes.md").write_text("ignored\n", encoding="utf-8")
+        return root
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_directory_outputs_match_compress(self, archive, tmp_path, workers):
+        out = tmp_path / "out"
+        summary = compress_batch(str(archive), str(out), workers=workers, recursive=True)
+
+        assert summary["files"] == summary["succeeded"] == 4
+        assert summary["failed"] == []
+        assert summary["mbPerSecond"] > 0
+        assert summary["compressionRate"]["min"] <= summary["compressionRate"]["p50"] \
+            <= summary["compressionRate"]["max"]
+
+        for source in archive.rglob("*.txt"):
+            relative = source.relative_to(archive)
+            output = out / relative.parent / (relative.stem + ".compressed.json")
+            expected = ContextCompressor().compress(source.read_text(encoding="utf-8"))
+            assert _without_timestamp(json.loads(output.read_text(encoding="utf-8"))) == \
+                _without_timestamp(expected)
+
+    def test_glob_source_skips_directories(self, archive, tmp_path):
+        (archive / "session_dir.txt").mkdir()  # matches the glob, but is not a file
+        summary = compress_batch(str(archive / "session_*"), str(tmp_path / "out"), workers=1)
+
+        assert summary["succeeded"] == 3
+        assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+            f"session_{i}.compressed.json" for i in range(3)
+        ]
+
+
+    def test_inputs_sharing_a_name_get_distinct_outputs(self, tmp_path):
+        root = tmp_path / "sessions"
+        for relative in ("a/session.txt", "a/session.md", "b/session.txt"):
+            (root / relative).parent.mkdir(parents=True, exist_ok=True)
+            (root / relative).write_text(
+                SAMPLE_CONVERSATION + f"User: only in {relative}\n", encoding="utf-8")
+
+        out = tmp_path / "out"
+        summary = compress_batch(str(root), str(out), workers=1,
+                                 pattern="session.*", recursive=True)
+
+        assert summary["succeeded"] == 3
+        outputs = sorted(out.rglob("*.compressed.json"))
+        assert len(outputs) == 3
+        intents = {o.relative_to(out).parent.name + ":" + json.loads(o.read_text())["sessionIntent"][-1]
+                   for o in outputs}
+        assert intents == {"a:only in a/session.txt", "a:only in a/session.md",
+                           "b:only in b/session.txt"}
+        assert (out / "b" / "session.compressed.json").exists()
+
+class TestArtifactIndex:
+    """Word-based artifact extraction, ranking and cap"""
+
+    def test_paths_are_cleaned_and_ranked(self):
+        conversation = (
+            "Created: `src/app.py` and docs/guide.md\n"
+            "測試腳本：`project-template/scripts/compress_context.py`\n"
+            "See [guide](docs/guide.md), then src/app.py.\n"
+            "Updated src/app.py\n"
+        )
+        index = ContextCompressor().extract_artifact_index(conversation)
+
+        assert index == [
+            {"path": "src/app.py", "count": 3, "firstLine": 0, "lastLine": 3,
+             "extensionClass": "code"},
+            {"path": "docs/guide.md", "count": 2, "firstLine": 0, "lastLine": 2,
+             "extensionClass": "doc"},
+            {"path": "project-template/scripts/compress_context.py", "count": 1,
+             "firstLine": 1, "lastLine": 1, "extensionClass": "code"},
+        ]
+
+    def test_backslash_words_need_an_extension(self):
+        conversation = 'print("a\\nb") and/or C:\\work\\handoff.json\nbuild/cache.pyc\n'
+
+        assert ContextCompressor().extract_artifacts(conversation) == ["C:\\work\\handoff.json"]
+
+    def test_long_unbroken_line_is_linear(self):
+        # 200 KB of base64 (many '/' and '.', no spaces) used to backtrack
+        blob = ("QUJDRA/x.+9zZ/" * 15000)[:200000]
+        conversation = f"Attached data:{blob} and src/after_blob.py\n"
+
+        start = time.perf_counter()
+        artifacts = ContextCompressor().extract_artifacts(conversation)
+
+        assert time.perf_counter() - start < 1.0
+        assert artifacts == ["src/after_blob.py"]
+
+    def test_artifacts_are_capped_by_rank(self):
+        conversation = "".join(f"Modified src/module_{i}.py\n" for i in range(100))
+        conversation += "Modified src/module_99.py again\n"
+
+        compressor = ContextCompressor()
+        compressed = compressor.compress(conversation)
+
+        assert len(compressed["artifacts"]) == ArtifactExtractor.MAX_ARTIFACTS
+        assert compressed["artifacts"][:2] == ["src/module_99.py", "src/module_0.py"]
+        assert len(compressor.artifact_index) == 100
+
+
+class TestTokenBudget:
+    """compress(target_tokens=N) packs by importance within the budget"""
+
+    @pytest.mark.parametrize("target", [40, 120, 400])
+    def test_budget_is_respected(self, conversation, target):
+        compressed = ContextCompressor().compress(conversation, target_tokens=target)
+        metadata = compressed["compressionMetadata"]
+
+        assert metadata["compressedTokens"] <= target
+        assert metadata["targetTokens"] == target
+        for section, tokens in metadata["sectionTokens"].items():
+            assert tokens == estimate_tokens(json.dumps(compressed[section]))
+
+    def test_large_budget_is_not_capped(self):
+        conversation = "".join(f"Updated file src/module_{i}.py with change {i}\n" for i in range(40))
+        compressed = ContextCompressor().compress(conversation, target_tokens=100000)
+
+        assert len(compressed["playByPlay"]) == 40  # fixed cap would keep 15
+        assert compressed["compressionMetadata"]["candidateCounts"]["playByPlay"] == 40
+
+    def test_frequent_and_recent_items_win(self):
+        conversation = (
+            "Updated src/rarely_touched_module.py once at the start\n"
+            + "filler line without keywords\n" * 50
+            + "Fixed the flaky retry loop in the uploader\n" * 5
+        )
+        compressed = ContextCompressor().compress(conversation, target_tokens=40)
+
+        assert compressed["playByPlay"] == ["Fixed the flaky retry loop in the uploader"]
+
+    def test_late_items_win_past_candidate_limit(self):
+        limit = compress_context.MAX_BUDGET_CANDIDATES
+        conversation = "".join(f"Updated file src/module_{i}.py with change {i}\n"
+                               for i in range(limit + 1000))
+        compressed = ContextCompressor().compress(conversation, target_tokens=60)
+
+        assert compressed["compressionMetadata"]["candidateCounts"]["playByPlay"] == limit
+        last = f"Updated file src/module_{limit + 999}.py with change {limit + 999}"
+        assert last in compressed["playByPlay"]  # used to be dropped at the limit
+
+    def test_invalid_budget(self):
+        with pytest.raises(ValueError):
+            ContextCompressor().compress("User: hi\n", target_tokens=0)
+
+
+def _record(role, content):
+    return json.dumps({"type": role, "message": {"role": role, "content": content}},
+                      ensure_ascii=False) + "\n"
+
+
+TRANSCRIPT_RECORDS = [
+    _record("user", "請實作 transcript token 估算"),
+    _record("assistant", [
+        {"type": "thinking", "thinking": "Read the JSONL log incrementally"},
+        {"type": "text", "text": "I'll keep a byte-offset checkpoint."},
+        {"type": "tool_use", "name": "Edit", "input": {"file_path": "compress_context.py"}},
+    ]),
+    _record("user", [{"type": "tool_result", "content": [{"type": "text", "text": "ok"}]}]),
+]
+
+
+def _expected_tokens(*texts):
+    return sum(estimate_tokens(text) for text in texts)
+
+
+class TestTranscriptTokens:
+    """estimate_current_tokens reads the JSONL transcript incrementally"""
+
+    EXPECTED = _expected_tokens(
+        "請實作 transcript token 估算",
+        "Read the JSONL log incrementally\nI'll keep a byte-offset checkpoint.\n"
+        '{"file_path": "compress_context.py"}',
+        "ok",
+    )
+
+    def test_counts_message_text(self, tmp_path):
+        transcript = tmp_path / "session.jsonl"
+        transcript.write_text("".join(TRANSCRIPT_RECORDS), encoding="utf-8")
+
+        assert estimate_current_tokens(str(transcript)) == self.EXPECTED
+
+    def test_only_appended_bytes_are_read(self, tmp_path, monkeypatch):
+        transcript = tmp_path / "session.jsonl"
+        transcript.write_text("".join(TRANSCRIPT_RECORDS[:2]), encoding="utf-8")
+        estimate_current_tokens(str(transcript))
+
+        scanned = []
+        count_records = compress_context._count_records
+        monkeypatch.setattr(compress_context, "_count_records",
+                            lambda data, total: scanned.append(data) or count_records(data, total))
+        with open(transcript, "a", encoding="utf-8") as f:
+            f.write(TRANSCRIPT_RECORDS[2])
+
+        assert estimate_current_tokens(str(transcript)) == self.EXPECTED
+        assert scanned == [TRANSCRIPT_RECORDS[2].encode("utf-8")]
+
+    def test_partial_record_waits_for_its_newline(self, tmp_path):
+        transcript = tmp_path / "session.jsonl"
+        last = TRANSCRIPT_RECORDS[2]
+        transcript.write_text("".join(TRANSCRIPT_RECORDS[:2]) + last[:10], encoding="utf-8")
+        partial = estimate_current_tokens(str(transcript))
+
+        with open(transcript, "a", encoding="utf-8") as f:
+            f.write(last[10:])
+
+        assert partial == self.EXPECTED - estimate_tokens("ok")
+        assert estimate_current_tokens(str(transcript)) == self.EXPECTED
+
+    def test_replaced_transcript_and_compaction_reset(self, tmp_path):
+        transcript = tmp_path / "session.jsonl"
+        transcript.write_text("".join(TRANSCRIPT_RECORDS), encoding="utf-8")
+        estimate_current_tokens(str(transcript))
+
+        transcript.write_text(_record("user", "a brand new session"), encoding="utf-8")
+        assert estimate_current_tokens(str(transcript)) == estimate_tokens("a brand new session")
+
+        with open(transcript, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "system", "subtype": "compact_boundary"}) + "\n")
+            f.write(_record("user", "after compaction"))
+        assert estimate_current_tokens(str(transcript)) == estimate_tokens("after compaction")
+
+    def test_environment_variable_and_placeholder(self, tmp_path, monkeypatch):
+        monkeypatch.delenv(compress_context.TRANSCRIPT_ENV, raising=False)
+        assert estimate_current_tokens() == PLACEHOLDER_TOKENS
+
+        transcript = tmp_path / "session.jsonl"
+        transcript.write_text("".join(TRANSCRIPT_RECORDS), encoding="utf-8")
+        monkeypatch.setenv(compress_context.TRANSCRIPT_ENV, str(transcript))
+        assert estimate_current_tokens() == self.EXPECTED
+
+
+class TestHandoffTranscript:
+    """compress_with_handoff streams a real transcript and writes atomically"""
+
+    @pytest.fixture
+    def handoff(self, tmp_path):
+        path = tmp_path / "handoff.json"
+        dump({"schemaVersion": "2.0.0", "summary": {"notes": "keep me"}}, str(path))
+        return path
+
+    def test_jsonl_transcript(self, tmp_path, handoff):
+        transcript = tmp_path / "session.jsonl"
+        transcript.write_text(
+            _record("user", "Implement streaming handoff compression please")
+            + _record("assistant", [{"type": "text", "text": "Created: src/handoff_writer.py"}])
+            + _record("user", [{"type": "tool_result", "content": "User: not a real request"}]),
+            encoding="utf-8")
+
+        assert compress_with_handoff(str(handoff), "research", "product", transcript=str(transcript))
+        context = load(str(handoff))["summary"]["compressedContext"]
+
+        assert context["sessionIntent"] == ["Implement streaming handoff compression please"]
+        assert context["artifacts"] == ["src/handoff_writer.py"]
+        assert load(str(handoff))["summary"]["notes"] == "keep me"
+        assert not list(tmp_path.glob(".handoff.json.*"))  # no temp files left
+
+    def test_jsonl_transcript_resumes_from_sidecar(self, tmp_path, handoff, capsys):
+        transcript = tmp_path / "session.jsonl"
+        records = [
+            _record("user", "Implement streaming handoff compression please"),
+            _record("assistant", [{"type": "text", "text": "Created: src/handoff_writer.py"}]),
+            _record("user", "Now add incremental resume to the handoff path"),
+        ]
+        transcript.write_text("".join(records[:2]), encoding="utf-8")
+        assert compress_with_handoff(str(handoff), "research", "product", transcript=str(transcript))
+        first_size = transcript.stat().st_size
+
+        # One more record, and one still being written
+        with open(transcript, "a", encoding="utf-8") as f:
+            f.write(records[2] + records[0][:15])
+        capsys.readouterr()
+        assert compress_with_handoff(str(handoff), "research", "product", transcript=str(transcript))
+
+        assert f"resumed at byte {first_size:,}" in capsys.readouterr().out
+        sidecar = json.loads((tmp_path / "session.jsonl.compress-state.json").read_text())
+        assert sidecar["jsonl"] and sidecar["offset"] == first_size + len(records[2].encode("utf-8"))
+
+        context = load(str(handoff))["summary"]["compressedContext"]
+        full = ContextCompressor().compress_stream(render_transcript_lines(records))
+        assert context["sessionIntent"] == full["sessionIntent"] == [
+            "Implement streaming handoff compression please",
+            "Now add incremental resume to the handoff path"]
+        assert context["keyActions"] == full["playByPlay"][:10]
+        assert context["artifacts"] == full["artifacts"] == ["src/handoff_writer.py"]
+
+    def test_stdin_transcript(self, handoff, monkeypatch):
+        monkeypatch.setattr("sys.stdin", io.StringIO(SAMPLE_CONVERSATION))
+
+        assert compress_with_handoff(str(handoff), "research", "product", transcript="-")
+        context = load(str(handoff))["summary"]["compressedContext"]
+
+        assert context["sessionIntent"] == ContextCompressor().compress(SAMPLE_CONVERSATION)["sessionIntent"]
+
+    def test_missing_transcript_fails(self, handoff, monkeypatch):
+        monkeypatch.delenv(compress_context.TRANSCRIPT_ENV, raising=False)
+
+        assert not compress_with_handoff(str(handoff), "research", "product")
+
+    def test_concurrent_updates_are_serialized(self, tmp_path, handoff, monkeypatch):
+        transcript = tmp_path / "conversation.txt"
+        transcript.write_text(SAMPLE_CONVERSATION, encoding="utf-8")
+        apply = compress_context._apply_compressed_context
+
+        def slow_apply(handoff_data, compressed, target_tokens=None):
+            runs = handoff_data.setdefault("runs", [])
+            time.sleep(0.01)  # widen the read-modify-write window
+            runs.append(len(runs))
+            apply(handoff_data, compressed, target_tokens)
+
+        monkeypatch.setattr(compress_context, "_apply_compressed_context", slow_apply)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(compress_with_handoff(
+                str(handoff), "research", "product", transcript=str(transcript), use_cache=False)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [True] * 8
+        assert load(str(handoff))["runs"] == list(range(8))  # no lost updates
@@ -0,0 +1,123 @@
+"""
+Context codec test suite
+
+Covers round-trips for every format, magic-byte detection, MessagePack
+wire compatibility and the CLI writers/readers that use the codec.
+
+Version: 1.0.0
+"""
+
+import gzip
+import json
+
+import pytest
+
+import context_codec
+from context_codec import (
+    FORMATS,
+    ZSTD_AVAILABLE,
+    decode,
+    detect_format,
+    dump,
+    encode,
+    load,
+    load_with_format,
+    msgpack_dumps,
+    msgpack_loads,
+)
+from compress_context import ContextCompressor, compress_file, compress_with_handoff
+
+
+SAMPLE = ContextCompressor().compress(
+    "User: 實作 handoff 壓縮並確認輸出格式\n"
+    "Created: project-template/scripts/context_codec.py\n"
+    "def encode(obj, fmt):\n"
+)
+
+USABLE_FORMATS = [fmt for fmt in FORMATS if ZSTD_AVAILABLE or not fmt.endswith(".zst")]
+
+
+class TestCodec:
+    """encode/decode round-trips and detection"""
+
+    @pytest.mark.parametrize("fmt", USABLE_FORMATS)
+    def test_round_trip_and_detection(self, fmt):
+        data = encode(SAMPLE, fmt)
+
+        assert decode(data) == SAMPLE
+        assert detect_format(data) == ("json" if fmt == "json-min" else fmt)
+
+    def test_compact_formats_are_smaller(self):
+        indented = len(encode(SAMPLE, "json"))
+
+        assert len(encode(SAMPLE, "json-min")) < indented
+        assert len(encode(SAMPLE, "msgpack")) < len(encode(SAMPLE, "json-min"))
+
+    @pytest.mark.parametrize("value", [
+        None, True, False, 0, 127, 128, 255, 256, 65536, 2 ** 40, -1, -32, -33, -200, -40000,
+        -2 ** 40, 1.5, "", "x" * 31, "y" * 32, "z" * 300, "字" * 30000,
+        list(range(20)), {str(i): i for i in range(20)}, {"nested": [{"a": [1, {"b": None}]}]},
+    ])
+    def test_msgpack_round_trip(self, value):
+        assert msgpack_loads(msgpack_dumps(value)) == value
+
+    def test_msgpack_wire_format(self):
+        # Reference bytes from the MessagePack specification
+        assert msgpack_dumps({"compact": True, "schema": 0}) == \
+            b'\x82\xa7compact\xc3\xa6schema\x00'
+        assert msgpack_dumps([1, -1, 300, "a"]) == b'\x94\x01\xff\xcd\x01\x2c\xa1a'
+
+    def test_unknown_format_and_data(self):
+        with pytest.raises(ValueError):
+            encode(SAMPLE, "yaml")
+        with pytest.raises(ValueError):
+            decode(b"plain text")
+
+    def test_load_reports_minified_json(self, tmp_path):
+        path = tmp_path / "handoff.json"
+        dump(SAMPLE, str(path), "json-min")
+
+        assert load_with_format(str(path)) == (SAMPLE, "json-min")
+
+    def test_load_decompresses_once(self, tmp_path, monkeypatch):
+        path = tmp_path / "handoff.msgpack.gz"
+        dump(SAMPLE, str(path), "msgpack.gz")
+        calls = []
+        decompress = gzip.decompress
+
+        def counting_decompress(data):
+            calls.append(len(data))
+            return decompress(data)
+
+        monkeypatch.setattr(context_codec.gzip, "decompress", counting_decompress)
+
+        assert load_with_format(str(path)) == (SAMPLE, "msgpack.gz")
+        assert len(calls) == 1
+
+
+class TestWriters:
+    """compress_file / compress_with_handoff honour the codec"""
+
+    def test_compress_file_format(self, tmp_path):
+        source = tmp_path / "conversation.txt"
+        source.write_text("User: please compress this transcript\nCreated: src/app.py\n",
+                          encoding="utf-8")
+        output = tmp_path / "compressed.msgpack.gz"
+
+        assert compress_file(str(source), str(output), output_format="msgpack.gz")
+        assert output.read_bytes()[:2] == b'\x1f\x8b'
+        assert load(str(output))["artifacts"] == ["src/app.py"]
+
+    def test_handoff_keeps_its_format(self, tmp_path):
+        path = tmp_path / "handoff.json"
+        dump({"schemaVersion": "2.0.0"}, str(path), "msgpack")
+
+        transcript = tmp_path / "conversation.txt"
+        transcript.write_text("User: hand the research notes to product\n", encoding="utf-8")
+
+        assert compress_with_handoff(str(path), "research", "product", transcript=str(transcript))
+        handoff, fmt = load_with_format(str(path))
+
+        assert fmt == "msgpack"
+        assert "compressedContext" in handoff["summary"]
+        assert json.loads(json.dumps(handoff)) == handoff
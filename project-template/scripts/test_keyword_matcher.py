@@ -0,0 +1,67 @@
+"""
+KeywordMatcher test suite
+
+Hits must be identical to independent `kw in line` checks, including
+keywords hidden inside or overlapping longer matches.
+
+Version: 1.0.0
+"""
+
+import pytest
+
+from keyword_matcher import KeywordMatcher
+from compress_context import ACTION_KEYWORDS, BREADCRUMB_PATTERNS, NOISE_PATTERNS
+
+
+def _naive_scan(groups, ignore_case_groups, line):
+    result = {}
+    for name, keywords in groups.items():
+        text = line.lower() if name in ignore_case_groups else line
+        found = {kw for kw in keywords if kw in text}
+        if found:
+            result[name] = found
+    return result
+
+
+GROUPS = {
+    "action": ACTION_KEYWORDS,
+    "noise": NOISE_PATTERNS,
+    "breadcrumb": list(BREADCRUMB_PATTERNS),
+}
+
+LINES = [
+    "",
+    "async def fetch(url):",
+    "    @classmethodef helper():",
+    "export async function load() { const x = 1 }",
+    "Fixed: TODO: clean up ... later",
+    "COMMITTED and PUSHED the Updated branch",
+    "from pathlib import Path",
+    "nothing interesting here",
+]
+
+
+class TestKeywordMatcher:
+    """scan() parity with substring checks"""
+
+    @pytest.mark.parametrize("line", LINES)
+    def test_matches_naive_substring_checks(self, line):
+        matcher = KeywordMatcher(GROUPS, ignore_case_groups=("action",))
+
+        assert matcher.scan(line) == _naive_scan(GROUPS, {"action"}, line)
+
+    def test_overlapping_keywords(self):
+        groups = {"g": ["abc", "cde", "b", "abcd"]}
+        matcher = KeywordMatcher(groups)
+
+        for line in ["abcde", "xabcdex", "cde abc", "b"]:
+            assert matcher.scan(line) == _naive_scan(groups, set(), line)
+
+    def test_keyword_in_several_groups(self):
+        matcher = KeywordMatcher({"a": ["fix"], "b": ["fix", "bug"]})
+
+        assert matcher.scan("fix the bug") == {"a": {"fix"}, "b": {"fix", "bug"}}
+
+    def test_unknown_ignore_case_group(self):
+        with pytest.raises(ValueError):
+            KeywordMatcher({"a": ["x"]}, ignore_case_groups=("b",))
@@ -0,0 +1,143 @@
+"""
+Near-duplicate filter test suite
+
+Covers SimHash similarity, the bounded LSH table, state round-trips and
+the ContextCompressor / InformationExtractor integration.
+
+Version: 1.0.0
+"""
+
+import json
+
+import pytest
+
+from compress_context import ContextCompressor
+from near_duplicate import (
+    NearDuplicateFilter,
+    filter_near_duplicates,
+    hamming_distance,
+    max_distance_for,
+    simhash,
+)
+
+
+PROGRESS_LOG = "".join(
+    f"Updated file project-template/scripts/compress_context.py ({i}/40)\n" for i in range(1, 41)
+) + "Fixed the flaky retry loop in the uploader\nCreated the benchmark harness\n"
+
+
+class TestSimHash:
+    """Signatures and similarity"""
+
+    def test_counters_and_case_do_not_matter(self):
+        assert simhash("Updated file X (1/3)") == simhash("updated  file x (2/3)")
+
+    def test_similar_lines_are_close_and_different_lines_far(self):
+        base = simhash("User: implement streaming compression for handoffs")
+        similar = simhash("User: please implement streaming compression for handoffs")
+        different = simhash("Fixed the flaky retry loop in the uploader")
+
+        assert hamming_distance(base, similar) <= max_distance_for(0.85)
+        assert hamming_distance(base, different) > max_distance_for(0.85)
+
+    def test_threshold_bounds(self):
+        assert max_distance_for(1.0) == 0
+        with pytest.raises(ValueError):
+            NearDuplicateFilter(0.0)
+        with pytest.raises(ValueError):
+            NearDuplicateFilter(1.5)
+
+
+class TestFilter:
+    """Streaming match / bounded table / state"""
+
+    def test_keeps_first_of_each_family(self):
+        lines = PROGRESS_LOG.splitlines()
+
+        assert filter_near_duplicates(lines) == [lines[0], lines[-2], lines[-1]]
+
+    def test_match_returns_representative(self):
+        dedup = NearDuplicateFilter()
+
+        assert dedup.match("Running tests: 10 passed") is None
+        assert dedup.match("Running tests: 11 passed") == "Running tests: 10 passed"
+
+    def test_table_is_bounded(self):
+        dedup = NearDuplicateFilter(1.0, capacity=8)
+        for i in range(100):
+            dedup.match(f"distinct line {chr(0x4e00 + i)} {chr(0x4e80 + i)} {chr(0x4f00 + i)}")
+
+        assert len(dedup) == 8
+        assert sum(len(bucket) for bucket in dedup._buckets.values()) == 8  # one band
+
+    def test_state_round_trip(self):
+        dedup = NearDuplicateFilter()
+        dedup.match("Updated file X (1/3)")
+
+        restored = NearDuplicateFilter()
+        restored.load_state(json.loads(json.dumps(dedup.get_state())))
+        assert restored.match("Updated file X (3/3)") == "Updated file X (1/3)"
+
+        with pytest.raises(ValueError):
+            NearDuplicateFilter(0.9).load_state(dedup.get_state())
+
+
+class TestCompressorIntegration:
+    """ContextCompressor(dedup_threshold=...)"""
+
+    def test_play_by_play_collapses_progress_lines(self):
+        plain = ContextCompressor().compress(PROGRESS_LOG)
+        deduped = ContextCompressor(dedup_threshold=0.85).compress(PROGRESS_LOG)
+
+        assert len(plain["playByPlay"]) == 15  # fixed cap filled by one family
+        assert deduped["playByPlay"] == [
+            "Updated file project-template/scripts/compress_context.py (1/40)",
+            "Fixed the flaky retry loop in the uploader",
+            "Created the benchmark harness",
+        ]
+
+    def test_budget_mode_counts_repeats_toward_representative(self):
+        compressed = ContextCompressor(dedup_threshold=0.85).compress(PROGRESS_LOG, target_tokens=400)
+
+        assert compressed["compressionMetadata"]["candidateCounts"]["playByPlay"] == 3
+        assert compressed["playByPlay"][0].endswith("(1/40)")
+
+    def test_intents_are_deduplicated(self):
+        conversation = (
+            "User: implement streaming compression for handoffs\n"
+            "User: please implement streaming compression for handoffs\n"
+            "User: add a benchmark for the artifact index\n"
+        )
+        compressed = ContextCompressor(dedup_threshold=0.85).compress(conversation)
+
+        assert compressed["sessionIntent"] == [
+            "implement streaming compression for handoffs",
+            "add a benchmark for the artifact index",
+        ]
+
+    def test_incremental_matches_full_compress(self):
+        compressor = ContextCompressor(dedup_threshold=0.85)
+        expected = compressor.compress(PROGRESS_LOG)
+
+        state = None
+        for start in range(0, len(PROGRESS_LOG), 97):
+            compressed, state = compressor.compress_incremental(PROGRESS_LOG[start:start + 97], state)
+            state = json.loads(json.dumps(state))
+
+        assert compressed["playByPlay"] == expected["playByPlay"]
+        with pytest.raises(ValueError):
+            ContextCompressor().compress_incremental("more\n", state)
+
+    def test_learnings_skip_near_duplicates(self):
+        extractor_module = pytest.importorskip("memory_handoff_integration")
+        if not extractor_module.DEPENDENCIES_AVAILABLE:
+            pytest.skip("integration dependencies not available")
+
+        extractor = extractor_module.InformationExtractor(dedup_threshold=0.85)
+        learnings = extractor._extract_learnings([
+            "Fixed retry loop (attempt 1)", "Fixed retry loop (attempt 2)", "Optimized token estimation",
+        ])
+
+        assert [item["pattern"] for item in learnings] == [
+            "Fixed retry loop (attempt 1)", "Optimized token estimation",
+        ]
@@ -0,0 +1,166 @@
+"""
+Result cache test suite
+
+Covers content-addressed lookups, size-bounded LRU eviction, counters and
+the compress_file / compress_batch / compress_with_handoff cache paths.
+
+Version: 1.0.0
+"""
+
+import os
+
+import pytest
+
+import compress_context
+from compress_context import compress_batch, compress_file, compress_with_handoff
+from context_codec import dump, load
+from result_cache import ResultCache, bytes_sha256, file_sha256
+
+
+CONVERSATION = (
+    "User: 請壓縮這份封存的對話\n"
+    "Created: src/archive_loader.py\n"
+    "Fixed the retry loop in the uploader\n"
+)
+
+
+@pytest.fixture
+def transcript(tmp_path):
+    path = tmp_path / "conversation.txt"
+    path.write_text(CONVERSATION, encoding="utf-8")
+    return path
+
+
+class TestResultCache:
+    """get / put / eviction / counters"""
+
+    def test_round_trip_and_counters(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"))
+        key = cache.key(bytes_sha256(b"input"), "v1")
+
+        assert cache.get(key) is None
+        cache.put(key, {"artifacts": ["src/app.py"]})
+        assert cache.get(key) == {"artifacts": ["src/app.py"]}
+
+        assert cache.stats == {"hits": 1, "misses": 1, "stores": 1, "evictions": 0}
+        assert cache.totals() == cache.stats
+        cache.flush_stats()
+        assert ResultCache(str(tmp_path / "cache")).totals() == cache.stats
+
+    def test_counters_persist_once_per_flush(self, tmp_path):
+        first = ResultCache(str(tmp_path / "cache"))
+        second = ResultCache(str(tmp_path / "cache"))
+        key = first.key(bytes_sha256(b"input"), "v1")
+        first.put(key, {"ok": True})
+        for _ in range(3):
+            first.get(key)
+            second.get(key)
+
+        assert not (tmp_path / "cache" / "stats.json").exists()  # no write per lookup
+        first.flush_stats()
+        second.flush_stats()
+        second.flush_stats()  # nothing new: no double counting
+
+        totals = ResultCache(str(tmp_path / "cache")).totals()
+        assert (totals["hits"], totals["stores"]) == (6, 1)
+
+    def test_key_depends_on_fingerprint(self):
+        digest = bytes_sha256(b"input")
+
+        assert ResultCache.key(digest, "v1") != ResultCache.key(digest, "v2")
+
+    def test_file_digest_matches_bytes_digest(self, transcript):
+        assert file_sha256(str(transcript)) == bytes_sha256(transcript.read_bytes())
+
+    def test_lru_eviction_by_total_size(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"), max_bytes=10 ** 6)
+        value = {"payload": os.urandom(2000).hex()}  # incompressible, ~2KB gzipped
+        keys = [cache.key(bytes_sha256(str(i).encode()), "v1") for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, value)
+            path = cache._entry_path(key)
+            os.utime(path, (1000 + i, 1000 + i))
+
+        cache.get(keys[0])  # most recently used now
+        entry_size = cache._entry_path(keys[0]).stat().st_size
+        removed = cache.evict(max_bytes=2 * entry_size)
+
+        assert removed == 1
+        assert cache.get(keys[1]) is None  # oldest untouched entry went first
+        assert cache.get(keys[0]) == value
+        assert cache.get(keys[2]) == value
+        assert cache.usage() == (2, 2 * entry_size)
+
+    def test_put_evicts_when_over_limit(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"), max_bytes=5000)
+        for i in range(5):
+            cache.put(cache.key(bytes_sha256(str(i).encode()), "v1"),
+                      {"payload": os.urandom(1000).hex()})
+
+        assert cache.usage()[1] <= 5000
+        assert cache.stats["evictions"] >= 1
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache"))
+        key = cache.key(bytes_sha256(b"input"), "v1")
+        cache.put(key, {"ok": True})
+        cache._entry_path(key).write_bytes(b"\x1f\x8b truncated")
+
+        assert cache.get(key) is None
+        assert not cache._entry_path(key).exists()
+
+
+class TestCachedCompression:
+    """compress_file / compress_batch / compress_with_handoff reuse results"""
+
+    def test_second_run_skips_extraction(self, transcript, tmp_path, monkeypatch):
+        first = tmp_path / "first.json"
+        assert compress_file(str(transcript), str(first))
+
+        def fail(*args, **kwargs):
+            raise AssertionError("input was re-scanned")
+
+        monkeypatch.setattr(compress_context, "_compress_path", fail)
+        second = tmp_path / "second.json"
+        assert compress_file(str(transcript), str(second))
+        assert load(str(second)) == load(str(first))
+
+        # --no-cache must not touch the cache, so it re-scans (and fails here)
+        assert not compress_file(str(transcript), str(tmp_path / "third.json"), use_cache=False)
+
+    def test_changed_input_or_budget_misses(self, transcript, tmp_path, isolated_result_cache):
+        output = tmp_path / "out.json"
+        assert compress_file(str(transcript), str(output))
+        assert compress_file(str(transcript), str(output), target_tokens=500)
+        transcript.write_text(CONVERSATION + "Modified: src/uploader.py\n", encoding="utf-8")
+        assert compress_file(str(transcript), str(output))
+
+        cache = ResultCache(str(isolated_result_cache))
+        assert cache.totals()["misses"] == 3
+        assert cache.totals()["hits"] == 0
+        assert "src/uploader.py" in load(str(output))["artifacts"]
+
+    def test_batch_reports_cache_hits(self, tmp_path):
+        source = tmp_path / "archive"
+        source.mkdir()
+        for i in range(3):
+            (source / f"session_{i}.txt").write_text(CONVERSATION + f"Created: src/m{i}.py\n",
+                                                     encoding="utf-8")
+
+        first = compress_batch(str(source), str(tmp_path / "out"), workers=1)
+        second = compress_batch(str(source), str(tmp_path / "out"), workers=1)
+        uncached = compress_batch(str(source), str(tmp_path / "out"), workers=1, use_cache=False)
+
+        assert (first["cacheHits"], second["cacheHits"], uncached["cacheHits"]) == (0, 3, 0)
+
+    def test_handoff_uses_cache(self, tmp_path, transcript, isolated_result_cache):
+        path = tmp_path / "handoff.json"
+        dump({"schemaVersion": "2.0.0"}, str(path))
+
+        # Whole-transcript runs (the default resumes from the sidecar state instead)
+        for _ in range(2):
+            assert compress_with_handoff(str(path), "research", "product",
+                                         transcript=str(transcript), incremental=False)
+
+        totals = ResultCache(str(isolated_result_cache)).totals()
+        assert (totals["hits"], totals["misses"]) == (1, 1)
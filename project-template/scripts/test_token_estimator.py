@@ -0,0 +1,86 @@
+"""
+Token estimator test suite
+
+Covers:
+- Heuristic parity with the original two-regex estimate
+- Chunk additivity of incremental counters
+- LRU cache and batch API
+
+Version: 1.0.0
+"""
+
+import re
+
+import pytest
+
+from token_estimator import (
+    HeuristicBackend,
+    TokenEstimator,
+    count_char_classes,
+    estimate_tokens,
+    estimate_tokens_many,
+)
+
+
+def _reference_estimate(text):
+    """Original compress_context.estimate_tokens implementation"""
+    if not text:
+        return 0
+    cjk_chars = len(re.findall(r'[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff]', text))
+    code_symbols = len(re.findall(r'[{}()\[\];:,.<>]', text))
+    other_chars = len(text) - cjk_chars - code_symbols
+    return int(cjk_chars / 2.0 + code_symbols / 2.5 + other_chars / 4.0)
+
+
+SAMPLES = [
+    "",
+    "plain english sentence without symbols",
+    "def compress(conversation): return {'a': [1, 2, 3]}",
+    "使用 pytest fixture 可提高測試複用性 (TDD)",
+    "カタカナとひらがな; mixed with code: x = f(y)",
+    "emoji 🚀 and accents café <tag/>",
+]
+
+
+class TestHeuristic:
+    """Heuristic backend parity"""
+
+    @pytest.mark.parametrize("text", SAMPLES)
+    def test_matches_reference(self, text):
+        assert estimate_tokens(text) == _reference_estimate(text)
+
+    def test_counts_are_additive(self):
+        text = "".join(SAMPLES) * 3
+        counter = HeuristicBackend().counter()
+        for i in range(0, len(text), 7):
+            counter.add(text[i:i + 7])
+
+        assert counter.total() == _reference_estimate(text)
+
+    def test_ascii_fast_path(self):
+        assert count_char_classes("a{b}c;") == (0, 3, 6)
+
+
+class TestTokenEstimator:
+    """Cache and batch API"""
+
+    def test_cache_hit(self):
+        estimator = TokenEstimator(min_cached_chars=1)
+        text = "cached text " * 10
+
+        first = estimator.estimate(text)
+        second = estimator.estimate(text)
+
+        assert first == second
+        assert estimator.cache_info()["hits"] == 1
+
+    def test_cache_eviction(self):
+        estimator = TokenEstimator(cache_size=2, min_cached_chars=1)
+        for text in ["one", "two", "three"]:
+            estimator.estimate(text)
+
+        assert estimator.cache_info()["size"] == 2
+
+    def test_estimate_many_matches_single(self):
+        texts = SAMPLES + SAMPLES
+        assert estimate_tokens_many(texts) == [estimate_tokens(t) for t in texts]
@@ -0,0 +1,95 @@
+"""
+Transcript reader test suite
+
+iter_file_lines must yield exactly what text-mode open() yields, for any
+chunk size, without retrying the read on encoding errors.
+
+Version: 1.0.0
+"""
+
+import pytest
+
+import json
+
+from transcript_reader import detect_encoding, iter_file_lines, render_transcript_lines
+
+
+CONTENTS = [
+    "",
+    "single line without newline",
+    "User: hello\nAssistant: hi\n",
+    "Windows\r\nline endings\r\nmixed\rold mac\n\n\r\n",
+    "中文內容與 English 混合\n請確認 token 估算\n" * 50,
+    "x" * 5000 + "\nshort\n" + "y" * 3000,
+]
+
+
+def _reference_lines(path, encoding):
+    with open(path, "r", encoding=encoding) as f:
+        return list(f)
+
+
+class TestIterFileLines:
+    """Line-by-line parity with text-mode open()"""
+
+    @pytest.mark.parametrize("content", CONTENTS)
+    @pytest.mark.parametrize("chunk_bytes", [1, 3, 17, 1 << 20])
+    def test_matches_text_mode_open(self, tmp_path, content, chunk_bytes):
+        path = tmp_path / "conversation.txt"
+        path.write_bytes(content.encode("utf-8"))
+
+        assert list(iter_file_lines(str(path), chunk_bytes=chunk_bytes)) == \
+            _reference_lines(path, "utf-8")
+
+    def test_non_utf8_file_is_detected_from_sample(self, tmp_path):
+        path = tmp_path / "legacy.txt"
+        path.write_bytes("café résumé\nnaïve\n".encode("latin-1"))
+
+        encoding = detect_encoding(path.read_bytes())
+        assert encoding != "utf-8"
+        assert list(iter_file_lines(str(path))) == _reference_lines(path, encoding)
+
+    def test_utf8_bom(self, tmp_path):
+        path = tmp_path / "bom.txt"
+        path.write_bytes("\ufeffUser: hi\n".encode("utf-8"))
+
+        assert detect_encoding(path.read_bytes()) == "utf-8-sig"
+        assert list(iter_file_lines(str(path))) == ["User: hi\n"]
+
+    def test_sample_starting_mid_character_is_utf8(self):
+        data = ("中" * 40000).encode("utf-8")  # middle sample starts mid-character
+
+        assert detect_encoding(data, sample_bytes=1000) == "utf-8"
+
+
+class TestRenderTranscript:
+    """JSONL session logs become User:/Assistant: transcript lines"""
+
+    def test_jsonl_records(self):
+        records = [
+            {"type": "summary", "summary": "Earlier work on the codec"},
+            {"type": "user", "message": {"role": "user", "content": "請實作串流 handoff"}},
+            {"type": "assistant", "message": {"role": "assistant", "content": [
+                {"type": "thinking", "thinking": "hidden"},
+                {"type": "text", "text": "Created: a.py\nModified: b.py"},
+                {"type": "tool_use", "name": "Read", "input": {"file_path": "c.py"}},
+            ]}},
+            {"type": "user", "message": {"role": "user", "content": [
+                {"type": "tool_result", "content": "file contents"},
+            ]}},
+        ]
+        lines = [json.dumps(r, ensure_ascii=False) + "\n" for r in records] + ["not json\n"]
+
+        assert list(render_transcript_lines(lines)) == [
+            "Summary: Earlier work on the codec\n",
+            "User: 請實作串流 handoff\n",
+            "Assistant: Created: a.py\n",
+            "Modified: b.py\n",
+            'Tool: Read {"file_path": "c.py"}\n',
+            "  file contents\n",
+        ]
+
+    def test_plain_text_passes_through(self):
+        lines = ["\n", "User: hi\n", "{not json}\n"]
+
+        assert list(render_transcript_lines(lines)) == lines
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Token Estimator - shared high-throughput token counting
+
+Purpose: Single implementation of token estimation for compression,
+validation, trigger checks and the Lambda handler.
+
+Features:
+  - Heuristic backend: character-class weighting (CJK / code symbols / other)
+    with an ASCII fast path that counts symbols in one C-level byte pass
+  - Exact backend (optional): tiktoken, same interface
+  - LRU cache keyed by (hash, length) - cached strings are never retained
+  - Batch API: estimate_tokens_many()
+  - Incremental counters for streaming callers (sum of chunks == whole text)
+
+Backend selection:
+  TOKEN_ESTIMATOR_BACKEND=heuristic|tiktoken   (default: heuristic)
+  TOKEN_ESTIMATOR_ENCODING=cl100k_base         (tiktoken encoding name)
+
+Usage:
+  from token_estimator import estimate_tokens, estimate_tokens_many
+  estimate_tokens("def main(): pass")
+  estimate_tokens_many(["a", "b"])
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Optional exact tokenizer
+try:
+    import tiktoken
+
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+
+# ============================================================
+# Heuristic character-class counting
+# ============================================================
+# CJK characters (Chinese, Japanese, Korean) - runs, so findall stays small
+CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff]+')
+
+# Code symbols (more compact tokenization) - all ASCII, so they can be
+# deleted from the UTF-8 bytes without touching multi-byte characters
+CODE_SYMBOL_BYTES = b'{}()[];:,.<>'
+
+
+def count_char_classes(text: str) -> Tuple[int, int, int]:
+    """
+    Count character classes used by the heuristic
+
+    Returns:
+        (cjk_chars, code_symbols, total_chars) - additive across chunks,
+        so streaming callers can sum per-chunk counts
+    """
+    if not text:
+        return 0, 0, 0
+
+    if text.isascii():
+        # Fast path: no CJK possible, one translate pass over the bytes
+        data = text.encode('ascii')
+        return 0, len(data) - len(data.translate(None, CODE_SYMBOL_BYTES)), len(text)
+
+    data = text.encode('utf-8', 'surrogatepass')
+    cjk_chars = sum(map(len, CJK_RUN_PATTERN.findall(text)))
+    code_symbols = len(data) - len(data.translate(None, CODE_SYMBOL_BYTES))
+    return cjk_chars, code_symbols, len(text)
+
+
+def tokens_from_counts(cjk_chars: int, code_symbols: int, total_chars: int) -> int:
+    """Convert character class counts into an estimated token count"""
+    other_chars = total_chars - cjk_chars - code_symbols
+
+    # Weighted token estimation
+    estimated_tokens = (
+        cjk_chars / 2.0 +          # CJK: ~2 chars/token
+        code_symbols / 2.5 +        # Code symbols: ~2.5 chars/token
+        other_chars / 4.0           # English/other: ~4 chars/token
+    )
+
+    return int(estimated_tokens)
+
+
+# ============================================================
+# Backends
+# ============================================================
+class TokenCounter:
+    """Incremental counter: add() chunks, total() at any time"""
+
+    def add(self, text: str) -> None:
+        raise NotImplementedError
+
+    def total(self) -> int:
+        raise NotImplementedError
+
+    def get_state(self) -> Dict:
+        """JSON-serializable state (for incremental compression)"""
+        raise NotImplementedError
+
+    def load_state(self, state: Dict) -> None:
+        """Restore get_state() output (ValueError if from another backend)"""
+        raise NotImplementedError
+
+
+class HeuristicCounter(TokenCounter):
+    """Accumulates class counts, so the total equals the whole-text estimate"""
+
+    def __init__(self, counts: Tuple[int, int, int] = (0, 0, 0)):
+        self.counts = list(counts)
+
+    def add(self, text: str) -> None:
+        cjk_chars, code_symbols, total_chars = count_char_classes(text)
+        self.counts[0] += cjk_chars
+        self.counts[1] += code_symbols
+        self.counts[2] += total_chars
+
+    def total(self) -> int:
+        return tokens_from_counts(*self.counts)
+
+    def get_state(self) -> Dict:
+        return {"backend": HeuristicBackend.name, "counts": list(self.counts)}
+
+    def load_state(self, state: Dict) -> None:
+        if state.get("backend") != HeuristicBackend.name:
+            raise ValueError(f"Token state from backend {state.get('backend')!r}, expected 'heuristic'")
+        self.counts = [int(value) for value in state["counts"]]
+
+
+class SumCounter(TokenCounter):
+    """Sums per-chunk token counts (exact backends)"""
+
+    def __init__(self, backend: "TokenBackend", tokens: int = 0):
+        self.backend = backend
+        self.tokens = tokens
+
+    def add(self, text: str) -> None:
+        self.tokens += self.backend.count(text)
+
+    def total(self) -> int:
+        return self.tokens
+
+    def get_state(self) -> Dict:
+        return {"backend": self.backend.name, "tokens": self.tokens}
+
+    def load_state(self, state: Dict) -> None:
+        if state.get("backend") != self.backend.name:
+            raise ValueError(f"Token state from backend {state.get('backend')!r}, "
+                             f"expected {self.backend.name!r}")
+        self.tokens = int(state["tokens"])
+
+
+class TokenBackend:
+    """Token counting backend interface"""
+
+    name = "base"
+    exact = False
+
+    def count(self, text: str) -> int:
+        raise NotImplementedError
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        return [self.count(text) for text in texts]
+
+    def counter(self) -> TokenCounter:
+        return SumCounter(self)
+
+
+class HeuristicBackend(TokenBackend):
+    """
+    Character-class heuristic
+
+    Strategy:
+    - English: ~4 chars per token
+    - Chinese: ~2 chars per token (CJK characters)
+    - Code: ~3.5 chars per token (more symbols)
+    - Mixed content: weighted average
+
+    Accuracy: ±10%
+    """
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        return tokens_from_counts(*count_char_classes(text))
+
+    def counter(self) -> TokenCounter:
+        return HeuristicCounter()
+
+
+class TiktokenBackend(TokenBackend):
+    """Exact token counts via tiktoken (optional dependency)"""
+
+    name = "tiktoken"
+    exact = True
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        if not TIKTOKEN_AVAILABLE:
+            raise ImportError("tiktoken not installed. Install with: pip install tiktoken")
+        self.encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+
+def create_backend(name: Optional[str] = None, encoding: Optional[str] = None) -> TokenBackend:
+    """
+    Create a backend by name (falls back to heuristic when unavailable)
+
+    Args:
+        name: "heuristic" | "tiktoken" (default: $TOKEN_ESTIMATOR_BACKEND)
+        encoding: tiktoken encoding (default: $TOKEN_ESTIMATOR_ENCODING)
+    """
+    name = (name or os.environ.get("TOKEN_ESTIMATOR_BACKEND") or "heuristic").lower()
+
+    if name == "heuristic":
+        return HeuristicBackend()
+
+    if name == "tiktoken":
+        try:
+            return TiktokenBackend(encoding or os.environ.get("TOKEN_ESTIMATOR_ENCODING", "cl100k_base"))
+        except Exception as e:
+            print(f"[WARNING] tiktoken backend unavailable, using heuristic: {e}")
+            return HeuristicBackend()
+
+    raise ValueError(f"Unknown token estimator backend: {name}")
+
+
+# ============================================================
+# Estimator (backend + LRU)
+# ============================================================
+class TokenEstimator:
+    """
+    Token estimator with an LRU cache
+
+    The cache is keyed by (hash(text), len(text)): str hashes are cached on
+    the string object, so repeated lookups are O(1) and cached texts are
+    not kept alive. Texts shorter than min_cached_chars skip the cache.
+    """
+
+    def __init__(self, backend: Optional[TokenBackend] = None,
+                 cache_size: int = 4096, min_cached_chars: int = 64):
+        self.backend = backend or HeuristicBackend()
+        self.cache_size = cache_size
+        self.min_cached_chars = min_cached_chars
+        self._cache: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def estimate(self, text: str) -> int:
+        """Estimate tokens for one text"""
+        if not text:
+            return 0
+        if self.cache_size <= 0 or len(text) < self.min_cached_chars:
+            return self.backend.count(text)
+
+        key = (hash(text), len(text))
+        with self._lock:
+            tokens = self._cache.get(key)
+            if tokens is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return tokens
+
+        tokens = self.backend.count(text)
+        self._remember(key, tokens)
+        return tokens
+
+    def estimate_many(self, texts: Iterable[str]) -> List[int]:
+        """Estimate tokens for many texts (cache-aware, batched backend call)"""
+        texts = list(texts)
+        results: List[Optional[int]] = [None] * len(texts)
+        missing: Dict[int, List[int]] = {}
+        missing_texts: List[str] = []
+
+        for i, text in enumerate(texts):
+            if not text:
+                results[i] = 0
+                continue
+            if self.cache_size > 0 and len(text) >= self.min_cached_chars:
+                key = (hash(text), len(text))
+                with self._lock:
+                    tokens = self._cache.get(key)
+                    if tokens is not None:
+                        self._cache.move_to_end(key)
+                        self._stats["hits"] += 1
+                        results[i] = tokens
+                        continue
+            missing.setdefault(len(missing_texts), []).append(i)
+            missing_texts.append(text)
+
+        if missing_texts:
+            for slot, tokens in enumerate(self.backend.count_many(missing_texts)):
+                for i in missing[slot]:
+                    results[i] = tokens
+                text = missing_texts[slot]
+                if self.cache_size > 0 and len(text) >= self.min_cached_chars:
+                    self._remember((hash(text), len(text)), tokens)
+
+        return results
+
+    def counter(self) -> TokenCounter:
+        """Incremental counter for streaming input"""
+        return self.backend.counter()
+
+    def cache_info(self) -> Dict[str, int]:
+        """Cache statistics"""
+        with self._lock:
+            return {**self._stats, "size": len(self._cache), "max_size": self.cache_size}
+
+    def clear_cache(self) -> None:
+        """Drop all cached estimates"""
+        with self._lock:
+            self._cache.clear()
+            self._stats = {"hits": 0, "misses": 0}
+
+    def _remember(self, key: Tuple[int, int], tokens: int) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+            self._cache[key] = tokens
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+# ============================================================
+# Module-level API
+# ============================================================
+_default_estimator: Optional[TokenEstimator] = None
+
+
+def get_estimator() -> TokenEstimator:
+    """Return the shared estimator (created on first use)"""
+    global _default_estimator
+    if _default_estimator is None:
+        _default_estimator = TokenEstimator(create_backend())
+    return _default_estimator
+
+
+def set_backend(name: str, encoding: Optional[str] = None) -> TokenEstimator:
+    """Switch the shared estimator to another backend (clears the cache)"""
+    global _default_estimator
+    _default_estimator = TokenEstimator(create_backend(name, encoding))
+    return _default_estimator
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count of text with the shared estimator"""
+    return get_estimator().estimate(text)
+
+
+def estimate_tokens_many(texts: Iterable[str]) -> List[int]:
+    """Estimate token counts of many texts with the shared estimator"""
+    return get_estimator().estimate_many(texts)
+
+
+def token_counter() -> TokenCounter:
+    """Incremental counter from the shared estimator's backend"""
+    return get_estimator().counter()
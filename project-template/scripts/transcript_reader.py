@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Transcript Reader - constant-memory input layer for large transcripts
+
+Purpose: Feed multi-GB transcript files to the streaming compressor without
+ever holding the whole file (or a second decoded copy) in memory.
+
+Features:
+  - Memory-mapped input, cut into chunks that end on a line boundary;
+    decoded pages are released (madvise) so resident memory stays flat
+  - Incremental decoding per chunk (multi-byte sequences may span chunks)
+  - Encoding detected once from head/middle/tail samples (BOM, UTF-8,
+    then the system encoding) instead of re-reading the file on failure
+  - Universal newlines, like text-mode open(): \r\n and \r become \n
+  - JSONL session logs: record_text() pulls the text a record adds to the
+    context (message text, thinking, tool calls and tool results);
+    iter_transcript_lines() renders them as "User: ..." / "Assistant: ..."
+    lines for the compressor (plain-text transcripts pass through)
+
+Usage:
+  from transcript_reader import iter_file_lines
+  compressor.compress_stream(iter_file_lines("conversation.txt"))
+
+Version: 1.0
+Author: Claude Code + zycaskevin
+"""
+
+import codecs
+import json
+import locale
+import mmap
+import os
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Chunk size handed to the decoder (extended to the next newline)
+DEFAULT_CHUNK_BYTES = 1 << 20
+
+# Bytes sampled at the head, middle and tail for encoding detection
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+BOM_ENCODINGS: List[Tuple[bytes, str]] = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _sample_decodes(samples: List[bytes], encoding: str) -> bool:
+    """True if every sample decodes (a sample may start/end mid-character)"""
+    for i, sample in enumerate(samples):
+        if i > 0 and encoding.replace('_', '-').lower() in ('utf-8', 'utf8'):
+            # Skip continuation bytes: the sample may start mid-character
+            start = 0
+            while start < min(3, len(sample)) and 0x80 <= sample[start] < 0xC0:
+                start += 1
+            sample = sample[start:]
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+def detect_encoding(data, sample_bytes: int = ENCODING_SAMPLE_BYTES) -> str:
+    """
+    Detect the encoding of a byte buffer from samples
+
+    Args:
+        data: bytes or mmap
+        sample_bytes: Bytes per sample (head, middle, tail)
+
+    Returns:
+        Codec name: BOM codec, 'utf-8', or the first system encoding that
+        decodes the samples ('latin-1' as the last resort)
+    """
+    head = data[:sample_bytes]
+    for bom, encoding in BOM_ENCODINGS:
+        if head.startswith(bom):
+            return encoding
+
+    size = len(data)
+    samples = [head]
+    if size > sample_bytes:
+        middle = size // 2
+        samples.append(data[middle:middle + sample_bytes])
+        samples.append(data[max(sample_bytes, size - sample_bytes):size])
+
+    for encoding in ('utf-8', locale.getpreferredencoding(False), 'latin-1'):
+        if encoding and _sample_decodes(samples, encoding):
+            return encoding
+    return 'latin-1'
+
+
+def _iter_chunk_bounds(data, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) byte ranges of about chunk_bytes ending after b'\\n'"""
+    size = len(data)
+    start = 0
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        if end < size:
+            newline = data.rfind(b'\n', start, end)
+            if newline == -1:
+                # One very long line: extend to its end
+                newline = data.find(b'\n', end)
+            end = size if newline == -1 else newline + 1
+        yield start, end
+        start = end
+
+
+def _release_pages(data: mmap.mmap, released: int, end: int) -> int:
+    """Drop decoded pages in [released, end) so resident memory stays flat"""
+    aligned = end - end % mmap.PAGESIZE
+    if aligned > released and hasattr(data, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+        data.madvise(mmap.MADV_DONTNEED, released, aligned - released)
+        return aligned
+    return released
+
+
+def iter_file_lines(path: str, encoding: Optional[str] = None,
+                    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                    errors: str = 'replace') -> Iterator[str]:
+    """
+    Yield decoded lines (terminators kept) of a file in constant memory
+
+    Args:
+        path: Input file path
+        encoding: Codec name (default: detect_encoding() on the mapped file)
+        chunk_bytes: Approximate bytes decoded per chunk
+        errors: Decoder error handler for bytes the samples did not cover
+
+    Yields:
+        Lines ending in '\\n' (the last line may have no terminator)
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            encoding = encoding or detect_encoding(data)
+            decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+            carry = ''
+            released = 0
+            if hasattr(data, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+
+            for start, end in _iter_chunk_bounds(data, chunk_bytes):
+                text = carry + decoder.decode(data[start:end], final=end == len(data))
+                released = _release_pages(data, released, end)
+
+                # Hold back a trailing \r: its \n may start the next chunk
+                if text.endswith('\r') and end < len(data):
+                    text, carry = text[:-1], '\r'
+                else:
+                    carry = ''
+
+                if '\r' in text:
+                    text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+                # Chunks end on b'\n', so only the last piece can be partial
+                cut = text.rfind('\n') + 1
+                if cut < len(text) and end < len(data):
+                    text, carry = text[:cut], text[cut:] + carry
+
+                start_pos = 0
+                while True:
+                    newline = text.find('\n', start_pos)
+                    if newline == -1:
+                        break
+                    yield text[start_pos:newline + 1]
+                    start_pos = newline + 1
+                if start_pos < len(text):
+                    yield text[start_pos:]
+
+
+# ============================================================
+# JSONL session logs
+# ============================================================
+# Records marking that earlier context was summarized away
+COMPACT_BOUNDARY_SUBTYPES = {"compact_boundary"}
+
+
+def _block_text(block: Any) -> str:
+    """Text of one message content block"""
+    if isinstance(block, str):
+        return block
+    if not isinstance(block, dict):
+        return ""
+    kind = block.get("type")
+    if kind == "text":
+        return block.get("text", "")
+    if kind == "thinking":
+        return block.get("thinking", "")
+    if kind == "tool_use":
+        return json.dumps(block.get("input", {}), ensure_ascii=False)
+    if kind == "tool_result":
+        return _content_text(block.get("content", ""))
+    return ""
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, list):
+        return "\n".join(text for text in map(_block_text, content) if text)
+    return _block_text(content)
+
+
+def record_role(record: Dict) -> Optional[str]:
+    """"user" / "assistant" for message records, else None"""
+    message = record.get("message")
+    if isinstance(message, dict) and message.get("role"):
+        return message["role"]
+    if record.get("type") in ("user", "assistant"):
+        return record["type"]
+    return None
+
+
+def record_text(record: Dict) -> str:
+    """
+    Text a JSONL transcript record adds to the context
+
+    Accepts session-log records ({"type": ..., "message": {"role",
+    "content"}}) and bare messages ({"role", "content"}); content may be a
+    string or a list of text / thinking / tool_use / tool_result blocks.
+    Summary records contribute their summary text.
+    """
+    message = record.get("message", record)
+    if isinstance(message, dict) and "content" in message:
+        return _content_text(message["content"])
+    if record.get("type") == "summary":
+        return record.get("summary", "")
+    return ""
+
+
+def is_compact_boundary(record: Dict) -> bool:
+    """True for records after which earlier messages left the context"""
+    return record.get("type") == "system" and record.get("subtype") in COMPACT_BOUNDARY_SUBTYPES
+
+
+# Line prefixes the extractors recognize, by message role
+ROLE_PREFIXES = {"user": "User: ", "assistant": "Assistant: "}
+TOOL_RESULT_INDENT = "  "
+
+
+def _render_block(block: Any, prefix: str) -> str:
+    """One content block as transcript text (tool results get no role prefix)"""
+    if isinstance(block, str):
+        return prefix + block if block else ""
+    if not isinstance(block, dict):
+        return ""
+    kind = block.get("type")
+    if kind == "text":
+        text = block.get("text", "")
+        return prefix + text if text else ""
+    if kind == "tool_use":
+        return f"Tool: {block.get('name', '')} {json.dumps(block.get('input', {}), ensure_ascii=False)}"
+    if kind == "tool_result":
+        # Indented so tool output can never pass for a User:/Assistant: line
+        text = _content_text(block.get("content", ""))
+        return "\n".join(TOOL_RESULT_INDENT + line for line in text.split("\n")) if text else ""
+    return ""  # thinking, images: not part of the handoff
+
+
+def render_record(record: Dict) -> str:
+    """
+    A JSONL record as plain transcript text
+
+    User and assistant text become "User: ..." / "Assistant: ..." lines,
+    tool calls "Tool: <name> <input>", tool results their output indented
+    by two spaces and summary records "Summary: ...".
+    """
+    if record.get("type") == "summary":
+        return "Summary: " + record.get("summary", "")
+    message = record.get("message", record)
+    if not isinstance(message, dict):
+        return ""
+    prefix = ROLE_PREFIXES.get(record_role(record) or "", "")
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "\n".join(text for text in (_render_block(b, prefix) for b in content) if text)
+    return _render_block(content, prefix)
+
+
+def _parse_record(line: str) -> Optional[Dict]:
+    if not line.lstrip().startswith('{'):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def render_transcript_lines(lines: Iterable[str], jsonl: Optional[bool] = None) -> Iterator[str]:
+    """
+    Render JSONL records as transcript lines; pass other text through
+
+    The format is decided by the first non-blank line unless jsonl is
+    given (resumed reads start mid-file). In JSONL mode lines that are not
+    JSON objects are skipped.
+    """
+    lines = iter(lines)
+    if jsonl is None:
+        head: List[str] = []
+        for line in lines:
+            head.append(line)
+            if line.strip():
+                break
+        jsonl = bool(head) and _parse_record(head[-1]) is not None
+        lines = chain(head, lines)
+    if not jsonl:
+        yield from lines
+        return
+
+    for line in lines:
+        record = _parse_record(line)
+        if record is None:
+            continue
+        text = render_record(record)
+        if text:
+            yield from (part + '\n' for part in text.split('\n'))
+
+
+def is_jsonl_transcript(path: str, encoding: Optional[str] = None) -> bool:
+    """True when the first non-blank line of path is a JSON object (a session log)"""
+    for line in iter_file_lines(path, encoding=encoding):
+        if line.strip():
+            return _parse_record(line) is not None
+    return False
+
+
+def iter_transcript_lines(path: str, encoding: Optional[str] = None) -> Iterator[str]:
+    """iter_file_lines() with JSONL session logs rendered as transcript text"""
+    return render_transcript_lines(iter_file_lines(path, encoding=encoding))
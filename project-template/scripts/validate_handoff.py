@@ -26,6 +26,12 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Any, Tuple
 
+# Shared token estimator (same heuristic as compress_context.py)
+from token_estimator import estimate_tokens, estimate_tokens_many
+
+# Handoffs may be JSON, MessagePack, gzip or zstd (auto-detected)
+from context_codec import dump as dump_handoff, load_with_format
+
 # Schema version
 SCHEMA_VERSION = "2.0.0"
 
@@ -42,11 +48,6 @@ TOKEN_LIMITS = {
 }
 
 
-def estimate_tokens(text: str) -> int:
-    """Estimate token count (rough approximation: 4 chars = 1 token)"""
-    return len(text) // 4
-
-
 def calculate_hash(content: str) -> str:
     """Calculate SHA-256 hash for content"""
     return hashlib.sha256(content.encode()).hexdigest()[:16]
@@ -166,14 +167,15 @@ def validate_token_limits(data: Dict) -> List[str]:
 
     # Check memoryChain total
     if "memoryChain" in data:
-        total_tokens = 0
-        for i, stage in enumerate(data["memoryChain"]):
-            if "cumulativeSummary" in stage:
-                tokens = estimate_tokens(stage["cumulativeSummary"])
-                total_tokens += tokens
-                limit = TOKEN_LIMITS["memoryChain[].cumulativeSummary"]
-                if tokens > limit:
-                    warnings.append(f"memoryChain[{i}].cumulativeSummary exceeds limit: {tokens} > {limit}")
+        stages = [(i, stage["cumulativeSummary"])
+                  for i, stage in enumerate(data["memoryChain"]) if "cumulativeSummary" in stage]
+        stage_tokens = estimate_tokens_many(summary for _, summary in stages)
+        total_tokens = sum(stage_tokens)
+
+        limit = TOKEN_LIMITS["memoryChain[].cumulativeSummary"]
+        for (i, _), tokens in zip(stages, stage_tokens):
+            if tokens > limit:
+                warnings.append(f"memoryChain[{i}].cumulativeSummary exceeds limit: {tokens} > {limit}")
 
         limit = TOKEN_LIMITS["memoryChain"]
         if total_tokens > limit:
@@ -254,9 +256,8 @@ def validate_handoff_file(file_path: str, auto_fix: bool = False, strict: bool =
         True if validation passes, False otherwise
     """
     try:
-        # Read JSON file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Read handoff file (format auto-detected)
+        data, file_format = load_with_format(file_path)
 
         print(f"\n🔍 Validating: {file_path}")
         print(f"Schema Version: {data.get('schemaVersion', 'MISSING')}\n")
@@ -270,9 +271,8 @@ def validate_handoff_file(file_path: str, auto_fix: bool = False, strict: bool =
                     print(f"  - {fix}")
                 print()
 
-                # Write back fixed data
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
+                # Write back fixed data (same format as read)
+                dump_handoff(data, file_path, file_format)
                 print(f"✅ Updated: {file_path}\n")
 
         # Validate schema structure